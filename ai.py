@@ -0,0 +1,219 @@
+# ai.py
+"""Search-based CPU opponent: time-budgeted expectiminimax over attacks, Potion, Shield and Power Boost.
+
+The planner works on a compact tuple model of the battle rather than on engine objects, treats the
+damage roll as a chance node (three buckets of randint(5, 20)), caches positions in a transposition
+table and deepens iteratively until its wall-clock budget runs out. Each side is assumed to attack
+with its best move against the other (highest expected multiplier from the type chart), and a miss
+is one more chance outcome.
+
+The budget is a per-call wall-clock deadline, counted from the call. Searches are pure Python, so
+concurrent ones would only share the GIL and overrun their deadlines while waiting for it; instead
+one search runs at a time per process (SEARCH_SLOTS) and the others wait for the slot without holding
+the GIL. A call that doesn't get the slot within its budget decides from a one-ply look-ahead, which
+takes microseconds (it gets half the budget). So with many sessions in one process a decision still takes about budget_ms
+(plus whatever the rest of the process holds the GIL for), at the price of shallower play under load.
+
+    battle.cpu_policy = Planner(budget_ms=20).policy
+"""
+import threading
+import time
+
+from engine import POTION_HEAL, POWER_BOOST, SHIELD_FACTOR, random_cpu_policy
+from moves import hit_chance, multiplier
+
+# damage roll randint(5, 20) in three buckets: (mean roll, probability)
+ROLLS = ((7.5, 6 / 16), (13.0, 5 / 16), (18.0, 5 / 16))
+
+# state tuple layout: hp, potions, shields, boosts, shield up, power up -- for side 0 then side 1
+HP, POT, SHD, PWB, SHIELDED, POWERED = range(6)
+SIDE = 6
+
+
+# one search at a time per process; see the module docstring
+SEARCH_SLOTS = threading.Semaphore(1)
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _damage(base, roll, power, shield, move_mod=1.0):
+    if move_mod == 0:
+        return 0
+    dmg = max(5, int((base + roll) * (POWER_BOOST if power else 1.0) * move_mod))
+    return int(dmg * SHIELD_FACTOR) if shield else dmg
+
+
+def _scored_moves(attacker, defender):
+    return [(multiplier(m, attacker.types, defender.types), hit_chance(m), name)
+            for name, m in zip(attacker.moves, attacker.move_stats)]
+
+
+def best_move(attacker, defender):
+    """(move name, multiplier, hit chance) of the attacker's move with the best expected multiplier."""
+    mod, hit, name = max(_scored_moves(attacker, defender), key=lambda s: s[0] * s[1])
+    return name, mod, hit
+
+
+class _Search:
+    """State of one decision (model constants, transposition table, deadline); one per call, so a
+    shared Planner is safe to use from many Streamlit sessions at once."""
+
+    def __init__(self, battle, slot, deadline, tt_size):
+        self.deadline = deadline
+        self.tt_size = tt_size
+        self.tt = {}
+        self.nodes = 0
+        self.root = self._setup(battle, slot)
+
+    # -----------------------
+    # Model
+    # -----------------------
+    def _setup(self, battle, slot):
+        me, opp = battle.party[slot], battle.party[battle.other(slot)]
+        self.max_hp = (me.max_hp, opp.max_hp)
+        self.base = (me.attack - 0.28 * opp.defense, opp.attack - 0.28 * me.defense)
+        (_, mod_me, hit_me), (_, mod_opp, hit_opp) = best_move(me, opp), best_move(opp, me)
+        self.move_mod, self.hit = (mod_me, mod_opp), (hit_me, hit_opp)
+        # a CPU slot uses an item *and* attacks in one turn; everyone else spends the turn on the item
+        self.combo = (slot == battle.cpu_slot, battle.other(slot) == battle.cpu_slot)
+        state = []
+        for p in (me, opp):
+            state += [p.hp, p.item_count("Potion"), p.item_count("Shield"), p.item_count("Power Boost"),
+                      int(p.shield), int(p.power)]
+        return tuple(state)
+
+    def options(self, state, side):
+        o = side * SIDE
+        options = [None]
+        if state[o + POT] and state[o + HP] < self.max_hp[side]:
+            options.append("Potion")
+        if state[o + SHD] and not state[o + SHIELDED]:
+            options.append("Shield")
+        if state[o + PWB] and not state[o + POWERED]:
+            options.append("Power Boost")
+        return options
+
+    def _use_item(self, state, side, item):
+        s = list(state)
+        o = side * SIDE
+        if item == "Potion":
+            s[o + POT] -= 1
+            s[o + HP] = min(self.max_hp[side], s[o + HP] + int(self.max_hp[side] * POTION_HEAL))
+        elif item == "Shield":
+            s[o + SHD] -= 1
+            s[o + SHIELDED] = 1
+        else:
+            s[o + PWB] -= 1
+            s[o + POWERED] = 1
+        return s
+
+    def _evaluate(self, state):
+        """Heuristic in (-1, 1) from side 0's point of view: HP share difference plus a little for items."""
+        hp = state[HP] / self.max_hp[0] - state[SIDE + HP] / self.max_hp[1]
+        items = (state[POT] + state[SHD] + state[PWB]) - (state[SIDE + POT] + state[SIDE + SHD] + state[SIDE + PWB])
+        return max(-0.99, min(0.99, 0.8 * hp + 0.03 * items))
+
+    # -----------------------
+    # Search
+    # -----------------------
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes & 63 == 0 and time.perf_counter() > self.deadline:
+            raise _Timeout
+
+    def option_value(self, state, side, item, depth):
+        s = list(state) if item is None else self._use_item(state, side, item)
+        if item is not None and not self.combo[side]:
+            return self._search(tuple(s), 1 - side, depth - 1)
+        # attack: chance node over hit / miss and the damage roll
+        o, t = side * SIDE, (1 - side) * SIDE
+        power, shield = s[o + POWERED], s[t + SHIELDED]
+        s[o + POWERED] = 0
+        s[t + SHIELDED] = 0
+        hit = self.hit[side]
+        value = 0.0 if hit == 1.0 else (1 - hit) * self._search(tuple(s), 1 - side, depth - 1)
+        target_hp = s[t + HP]
+        for roll, p in ROLLS:
+            hp = target_hp - _damage(self.base[side], roll, power, shield, self.move_mod[side])
+            if hp <= 0:
+                value += hit * p * (1.0 if side == 0 else -1.0)
+            else:
+                s[t + HP] = hp
+                value += hit * p * self._search(tuple(s), 1 - side, depth - 1)
+        return value
+
+    def _search(self, state, side, depth):
+        if depth == 0:
+            return self._evaluate(state)
+        self._tick()
+        key = (state, side, depth)
+        cached = self.tt.get(key)
+        if cached is not None:
+            return cached
+        values = [self.option_value(state, side, item, depth) for item in self.options(state, side)]
+        value = max(values) if side == 0 else min(values)
+        if len(self.tt) < self.tt_size:
+            self.tt[key] = value
+        return value
+
+
+class Planner:
+    """Expectiminimax CPU. `policy(battle, slot)` has the same contract as engine.random_cpu_policy."""
+
+    def __init__(self, budget_ms=20, max_depth=12, tt_size=200_000):
+        self.budget_ms = budget_ms
+        self.max_depth = max_depth
+        self.tt_size = tt_size
+        self.last_depth = 0  # deepest fully searched depth of the last decision (for tuning/debugging)
+
+    def choose_item(self, battle, slot):
+        """Best item to use this turn (None = just attack) within the time budget."""
+        budget_s = self.budget_ms / 1000.0
+        deadline = time.perf_counter() + budget_s
+        if not SEARCH_SLOTS.acquire(timeout=budget_s / 2):
+            # busy process: a one-ply look-ahead instead of queueing past the budget (half of it is left
+            # for this, since everyone who gave up is now competing for the GIL)
+            search = _Search(battle, slot, float("inf"), self.tt_size)
+            scored = [(search.option_value(search.root, 0, item, 1), item) for item in search.options(search.root, 0)]
+            self.last_depth = 1
+            return max(scored, key=lambda vi: vi[0])[1]
+        try:
+            return self._deepen(_Search(battle, slot, deadline, self.tt_size), deadline)
+        finally:
+            SEARCH_SLOTS.release()
+
+    def _deepen(self, search, deadline):
+        options = search.options(search.root, 0)
+        best, depth_done = None, 0
+        for depth in range(1, self.max_depth + 1):
+            started = time.perf_counter()
+            try:
+                scored = [(search.option_value(search.root, 0, item, depth), item) for item in options]
+            except _Timeout:
+                break
+            best, depth_done = max(scored, key=lambda vi: vi[0])[1], depth
+            # search the previous best first next time round
+            options.sort(key=lambda item: item != best)
+            # the next depth costs at least as much again; don't start what can't finish
+            now = time.perf_counter()
+            if now + (now - started) > deadline:
+                break
+        self.last_depth = depth_done
+        return best
+
+    def policy(self, battle, slot):
+        if battle.over:
+            return random_cpu_policy(battle, slot)
+        item = self.choose_item(battle, slot)
+        scored = _scored_moves(battle.party[slot], battle.party[battle.other(slot)])
+        best = max(mod * hit for mod, hit, _ in scored)
+        return item, battle.cpu_rng.choice([name for mod, hit, name in scored if mod * hit == best])
+
+
+# Difficulty levels offered by the UI
+DIFFICULTIES = {
+    "Easy": random_cpu_policy,
+    "Hard": Planner(budget_ms=20).policy,
+}
@@ -1,560 +1,784 @@
 # app.py
 import streamlit as st
-import requests
+import atexit
+import functools
+import io
 import random
+import os
+import threading
 import time
-from PIL import Image
-from io import BytesIO
+import uuid
+
+import effects
+import metrics
+import pokeapi
+from pokeapi import PokeAPIError
+from prefetch import prefetch_all
+from manifest import load_manifest
+from records import project_records
+from roster import NameIndex, dex_limit, filter_entries, page, parse_generations
+from shared_cache import SharedCache
+from snapshot import open_snapshot
+from sprites import sprite_bytes
+from ai import DIFFICULTIES
+from battlelog import EventLog
+from matchserver import DEFAULT_URL as MATCH_SERVER_URL, MatchClient
+from progress import ProgressStore, restore
+from engine import (
+    MULTIPLAYER_ITEMS,
+    STARTING_ITEMS,
+    Battle,
+    LOGGED_EVENTS,
+    Combatant,
+    format_event,
+    xp_threshold,
+)
+
+# start of the first render; the imports above take ~10 ms since nothing heavy is imported at load
+RUN_STARTED = time.perf_counter()
 
 st.set_page_config(page_title="Pokémon Battle — Deluxe", layout="wide", page_icon="🧩")
 
 # -----------------------
 # Constants & Audio URLs
 # -----------------------
-POKEAPI_BASE = "https://pokeapi.co/api/v2"
-GEN1_LIMIT = 151
-
-# NOTE: These are example public audio URLs. If one fails you can replace with other hosted audio files.
-AUDIO_ATTACK = "https://freesound.org/data/previews/341/341695_6266573-lq.mp3"
-AUDIO_HIT = "https://freesound.org/data/previews/66/66073_931655-lq.mp3"
-AUDIO_FAINT = "https://freesound.org/data/previews/331/331912_3248244-lq.mp3"
-AUDIO_WIN = "https://freesound.org/data/previews/331/331912_3248244-lq.mp3"
+# Playable generations, e.g. "1", "1-3" or "all" (see roster.py)
+ROSTER_GENERATIONS = parse_generations()
+# Species warmed per batch by "Prefetch all" and the boot warm-up; raw documents are dropped after each batch
+PREFETCH_PAGE = 100
+# Warm the whole roster into the shared cache on a background thread when the server starts (0 = don't)
+WARM_ON_BOOT = os.environ.get("POKEMON_WARM", "1") != "0"
+# Seconds between background snapshot refreshes (unset = never refresh, serve the snapshot as built)
+SNAPSHOT_REFRESH_S = float(os.environ.get("POKEMON_SNAPSHOT_REFRESH", 0)) or None
+# Memory budget for the process-wide pokemon cache shared by all sessions
+POKEMON_CACHE_MB = float(os.environ.get("POKEMON_CACHE_MB", 64))
+# Battle log records kept in memory per session; older ones spill to POKEMON_EVENT_LOG_DIR if set, else are dropped
+EVENT_LOG_CAPACITY = int(os.environ.get("POKEMON_EVENT_LOG_CAPACITY", 256))
+EVENT_LOG_DIR = os.environ.get("POKEMON_EVENT_LOG_DIR")
+# Online mode: match server (POKEMON_MATCH_SERVER, see matchserver.py) and how often the battle panel polls it
+ONLINE_POLL_S = 1.0
+# With POKEMON_METRICS=1 (see metrics.py): serve Prometheus text on this port and/or rewrite this file periodically
+METRICS_PORT = int(os.environ.get("POKEMON_METRICS_PORT", 0)) or None
+METRICS_FILE = os.environ.get("POKEMON_METRICS_FILE")
+
+# Sound effect URLs live in effects.SOUNDS
 BATTLE_MUSIC = "https://cdn.simplecast.com/audio/episodes/places-holder.mp3"  # placeholder: replace with preferred music URL
 
 # -----------------------
 # Helpers: Data Fetching
 # -----------------------
-@st.cache_data(show_spinner=False)
-def fetch_gen1_list():
-    """Fetch first 151 pokemon results from PokeAPI (name + url)."""
-    resp = requests.get(f"{POKEAPI_BASE}/pokemon?limit={GEN1_LIMIT}")
-    resp.raise_for_status()
-    return resp.json()["results"]
+@st.cache_resource(show_spinner=False)
+def get_snapshot():
+    """Shared offline store built by `python snapshot.py build` (None if there isn't one)."""
+    return open_snapshot(refresh_interval=SNAPSHOT_REFRESH_S)
+
+@st.cache_resource(show_spinner=False)
+def get_manifest():
+    """Bundled roster manifest (see manifest.py), or None."""
+    return load_manifest()
+
+@st.cache_resource(show_spinner=False)
+def fetch_roster_list():
+    """List entries (name + url) of the configured generations: manifest, then snapshot, then PokeAPI."""
+    limit = dex_limit(ROSTER_GENERATIONS)
+    manifest = get_manifest()
+    if manifest is not None and manifest.covers(limit):
+        return filter_entries(manifest.entries(pokeapi.POKEAPI_BASE, limit), ROSTER_GENERATIONS)
+    store = get_snapshot()
+    entries = store.list_pokemon(limit) if store is not None else []
+    if len(entries) < limit:
+        entries = pokeapi.fetch_pokemon_list(limit)
+    return filter_entries(entries, ROSTER_GENERATIONS)
+
+@st.cache_resource(show_spinner=False)
+def get_name_index():
+    """Search index over the roster's names, built once per process and shared by all pickers."""
+    return NameIndex([e["name"] for e in fetch_roster_list()])
 
 @st.cache_data(show_spinner=False)
 def fetch_pokemon_details(url):
     """Fetch a single pokemon's details by url."""
-    resp = requests.get(url)
-    resp.raise_for_status()
-    return resp.json()
+    return pokeapi.fetch_url(url)
 
 def load_pokemon_by_name(name):
-    resp = requests.get(f"{POKEAPI_BASE}/pokemon/{name.lower()}")
-    resp.raise_for_status()
-    return resp.json()
-
-def image_from_sprite(url):
-    if not url:
-        return None
+    """Serve details from the local snapshot; only go to PokeAPI for species it doesn't have."""
+    store = get_snapshot()
+    if store is not None:
+        data = store.get(name)
+        if data is not None:
+            return data
+    return pokeapi.fetch_pokemon(name)
+
+@st.cache_resource(show_spinner=False)
+def get_pokemon_cache():
+    """One LRU of pokemon records for the whole server process, bounded by POKEMON_CACHE_MB."""
+    return SharedCache(max_bytes=int(POKEMON_CACHE_MB * 1024 * 1024), sizeof=lambda rec: rec.nbytes(), name="pokemon")
+
+def load_record(name):
+    """Record for `name`: bundled in the manifest, else projected from its snapshot / PokeAPI document."""
+    manifest = get_manifest()
+    record = manifest.record(name) if manifest is not None else None
+    if record is None:
+        record = project_records([load_pokemon_by_name(name)], get_snapshot())[0]
+    if record is None:
+        # not cached, so the next pick of this species tries its moves again
+        raise PokeAPIError("connection", name, f"Couldn't load the moves of {name}; try again in a moment.")
+    return record
+
+def get_pokemon(name):
+    """Compact record for `name` from the shared cache; raw documents are projected once on a miss."""
+    return get_pokemon_cache().get_or_load(name.lower(), load_record)
+
+def warm_roster(entries, cache, store, manifest, progress=None):
+    """Load the records of `entries` into `cache` a page at a time: from the manifest, the snapshot, then
+    PokeAPI. Plain arguments, so it can run off the script thread. Returns (loaded, failed)."""
+    loaded, failed = 0, 0
+    for start in range(0, len(entries), PREFETCH_PAGE):
+        docs, missing = {}, []
+        for e in entries[start:start + PREFETCH_PAGE]:
+            name = e["name"]
+            if name in cache:
+                loaded += 1
+                continue
+            record = manifest.record(name) if manifest is not None else None
+            if record is not None:
+                cache.put(name, record)
+                loaded += 1
+                continue
+            doc = store.get(name) if store is not None else None
+            if doc is None:
+                missing.append(e)
+            else:
+                docs[name] = doc
+        if missing:
+            warmed = prefetch_all(missing)
+            docs.update(warmed["details"])
+            failed += len(warmed["errors"])
+        # one page at a time: only the compact records are kept, never the whole roster's raw documents
+        for name, record in zip(docs, project_records(list(docs.values()), store)):
+            if record is None:
+                failed += 1  # moves didn't load; left out, so get_pokemon tries again on demand
+                continue
+            cache.put(name, record)
+            loaded += 1
+        if progress:
+            progress(min(start + PREFETCH_PAGE, len(entries)), len(entries))
+    return loaded, failed
+
+@st.cache_resource(show_spinner=False)
+def startup_stats():
+    """Process-wide startup figures: the first script run's duration and what the warm-up loaded."""
+    return {"first_render_s": None, "warmed": None, "warm_error": None}
+
+def _warm_in_background(stats, *args):
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-        img = Image.open(BytesIO(r.content)).convert("RGBA")
-        return img
-    except Exception:
+        stats["warmed"] = warm_roster(*args)
+    except Exception as e:  # best effort: whatever isn't warm is loaded when a session asks for it
+        stats["warm_error"] = repr(e)
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    """Warm the roster on a daemon thread, once per server process; no session waits for it."""
+    args = (startup_stats(), fetch_roster_list(), get_pokemon_cache(), get_snapshot(), get_manifest())
+    thread = threading.Thread(target=_warm_in_background, args=args, name="roster-warmup", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource(show_spinner=False)
+def get_matchups():
+    """Prebuilt win-probability matrix from `python matchups.py build` (None if not built)."""
+    try:
+        from matchups import load_matchups
+    except ImportError:  # numpy is optional
         return None
+    return load_matchups()
+
+@st.cache_resource(show_spinner=False)
+def get_progress_store():
+    """Trainer progression database shared by all sessions; queued saves are flushed on shutdown."""
+    store = ProgressStore()
+    atexit.register(store.close)
+    return store
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_exporters():
+    """Start the process-wide Prometheus endpoint / file writer once per server process."""
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    if METRICS_FILE:
+        metrics.start_file_writer(METRICS_FILE)
+    return True
+
+def show_fetch_error(what, err):
+    """Render a failed load; PokeAPIError carries kind/status/retryable, so say what the player can do."""
+    if isinstance(err, PokeAPIError):
+        status = f" {err.status}" if err.status else ""
+        hint = "PokeAPI is having trouble, try again in a moment" if err.retryable else "it isn't available"
+        st.error(f"Couldn't load {what} ({err.kind}{status}): {hint}.")
+        with st.expander("Error details"):
+            st.json(err.to_dict())
+    else:
+        st.error(f"Failed to fetch {what}: {err}")
 
 # -----------------------
-# Game Engine Functions
+# View models (module level, so the memo outlives the rerun and is shared by every session)
 # -----------------------
-
-def compute_base_stats(poke):
-    """Return simplified stats dict: attack, defense, max_hp, moves, sprite."""
-    # We'll compute attack as attack + special-attack averaged with some weighting
-    stats = {s['stat']['name']: s['base_stat'] for s in poke['stats']}
-    atk = stats.get('attack', 50)
-    spatk = stats.get('special-attack', 50)
-    defense = stats.get('defense', 50)
-    hp = stats.get('hp', 100)
-    # get up to 4 moves that have a power value when possible
-    moves = []
-    for m in poke['moves']:
-        move_name = m['move']['name']
-        # prefer moves learned by level-up or default; rely on PokeAPI move details lazily if needed
-        if len(moves) < 4:
-            moves.append(move_name.replace('-', ' ').title())
-    sprite = poke['sprites']['other']['official-artwork']['front_default'] or poke['sprites']['front_default']
-    return {
-        "attack": int((atk + spatk) / 2),
-        "defense": int(defense),
-        "max_hp": int(hp * 1.5),  # scale HP visually for gameplay
-        "moves": moves[:4] if moves else ["Tackle", "Quick Attack"],
-        "sprite": sprite
-    }
-
-def calculate_damage(attacker_stats, defender_stats, power_mod=1.0, shield=False):
-    """Damage formula: base = atk - defense*0.3 + random + power_mod"""
-    base = attacker_stats["attack"] - (defender_stats["defense"] * 0.28)
-    random_part = random.randint(5, 20)
-    dmg = max(5, int((base + random_part) * power_mod))
-    if shield:
-        dmg = int(dmg * 0.6)  # shield reduces damage by 40%
-    return dmg
-
-def play_sound(url):
-    """Insert a small st.audio to play a sound. Works per action."""
-    if url:
-        st.audio(url)
+@functools.lru_cache(maxsize=256)
+def stats_markdown(slot, name, level, hp, max_hp, attack, defense, xp, items):
+    """Inventory / stats block for one slot as a single markdown element."""
+    lines = [
+        f"**{slot.upper()}: {name} (Lv {level})**",
+        f"HP: {hp} / {max_hp}",
+        f"Attack: {attack}  Defense: {defense}",
+        f"XP: {xp} / {xp_threshold(level)}",
+        "Items:",
+    ]
+    lines += [f"- {itnm}: {qty}" for itnm, qty in items]
+    return "  \n".join(lines)
 
 # -----------------------
 # Session State Init
 # -----------------------
 def init_session():
-    if "pokelist" not in st.session_state:
-        st.session_state.pokelist = fetch_gen1_list()  # list of dicts with name & url
-    if "cache_pokemon" not in st.session_state:
-        st.session_state.cache_pokemon = {}  # name -> details cached
     if "mode" not in st.session_state:
         st.session_state.mode = "Singleplayer"
     if "player_slots" not in st.session_state:
         st.session_state.player_slots = {"player1": None, "player2": None}
     if "party" not in st.session_state:
-        # store selected pokemons with stats, hp, xp, level, items
+        # slot name -> engine.Combatant (stats, hp, xp, level, items)
         st.session_state.party = {}
-    if "turn" not in st.session_state:
-        st.session_state.turn = "player1"
+    if "rng" not in st.session_state:
+        # per-session battle RNG; the engine never touches the global `random` state
+        st.session_state.rng = random.Random()
     if "battle_log" not in st.session_state:
-        st.session_state.battle_log = []
+        # structured, bounded record of every match (see battlelog.py); the panel shows its tail
+        spill = os.path.join(EVENT_LOG_DIR, f"{uuid.uuid4().hex}.ndjson") if EVENT_LOG_DIR else None
+        st.session_state.battle_log = EventLog(EVENT_LOG_CAPACITY, spill_path=spill)
+        st.session_state.log_since = 0
+    if "sfx_on" not in st.session_state:
+        st.session_state.sfx_on = True
     if "bgm_on" not in st.session_state:
         st.session_state.bgm_on = False
     if "music_widget_key" not in st.session_state:
         st.session_state.music_widget_key = 0
     if "multiplayer" not in st.session_state:
         st.session_state.multiplayer = False
+    if "online" not in st.session_state:
+        st.session_state.online = False
+    if metrics.ENABLED and "metrics" not in st.session_state:
+        # this session's own span histograms, next to the process-wide ones in metrics.PROCESS
+        st.session_state.metrics = metrics.Registry()
 
-init_session()
-
-# -----------------------
-# UI: Sidebar Controls
-# -----------------------
-st.sidebar.title("Pokémon Deluxe — Controls")
-mode = st.sidebar.radio("Mode", ["Singleplayer", "Local Multiplayer"])
-st.session_state.mode = mode
-st.session_state.multiplayer = (mode == "Local Multiplayer")
-
-st.sidebar.markdown("### Background Music")
-bgm_toggle = st.sidebar.checkbox("Play battle music", value=st.session_state.bgm_on)
-st.session_state.bgm_on = bgm_toggle
+def bind_metrics():
+    # every script run (full or fragment) starts in a fresh context, so spans need the session's registry rebound
+    if metrics.ENABLED:
+        metrics.bind_session(st.session_state.metrics)
 
-if st.session_state.bgm_on:
-    # Provide an audio widget (user can stop via media controls)
-    # Changing key forces widget to refresh if toggled
-    st.sidebar.audio(BATTLE_MUSIC, format="audio/mp3", start_time=0, key=f"bgm_{st.session_state.music_widget_key}")
-
-# -----------------------
-# Main Layout
-# -----------------------
-st.title("🧩 Pokémon Battle — Deluxe Edition")
-st.markdown(
-    "First 151 Gen Pokémon loaded from **PokeAPI**. Turn-based combat, XP, items, sounds, music, and multiplayer!"
-)
-
-col_main, col_help = st.columns([3, 1])
-with col_help:
-    st.info(
-        """
-        **How to play**
-        - Pick Pokémon (player1, player2 or CPU).
-        - Use moves and items.
-        - Gain XP on victory and level up.
-        - Toggle background music in sidebar.
-        """
+init_session()
+bind_metrics()
+if metrics.ENABLED:
+    start_metrics_exporters()
+if WARM_ON_BOOT:
+    start_warmup()
+def main():
+    """The page itself, run once per script run inside the "app.rerun" span below."""
+    # -----------------------
+    # UI: Sidebar Controls
+    # -----------------------
+    st.sidebar.title("Pokémon Deluxe — Controls")
+    mode = st.sidebar.radio("Mode", ["Singleplayer", "Local Multiplayer", "Online Multiplayer"])
+    st.session_state.mode = mode
+    st.session_state.multiplayer = (mode == "Local Multiplayer")
+    st.session_state.online = (mode == "Online Multiplayer")
+    if not st.session_state.online and "match_client" in st.session_state:
+        # leaving online mode ends the session's connection (a dropped session's client closes when collected)
+        st.session_state.pop("match_client").close()
+    if mode == "Singleplayer":
+        cpu_difficulty = st.sidebar.selectbox("CPU difficulty", list(DIFFICULTIES), key="cpu_difficulty")
+
+    st.sidebar.markdown("### Trainer")
+    # progress (level, XP, stats, items) is saved per trainer name and species; leave empty to play as a guest
+    st.sidebar.text_input("Trainer name", key="trainer_player1")
+    if st.session_state.multiplayer:
+        st.sidebar.text_input("Player 2 trainer name", key="trainer_player2")
+
+    def trainer_for(slot):
+        """Profile key whose progress `slot` loads and saves, or None for guests and the CPU."""
+        name = st.session_state.get(f"trainer_{slot}", "").strip().lower()
+        return name or None
+
+    st.sidebar.markdown("### Sound")
+    st.session_state.sfx_on = st.sidebar.checkbox("Sound effects", value=st.session_state.sfx_on)
+    bgm_toggle = st.sidebar.checkbox("Play battle music", value=st.session_state.bgm_on)
+    st.session_state.bgm_on = bgm_toggle
+
+    if st.session_state.bgm_on:
+        # Provide an audio widget (user can stop via media controls)
+        # Changing key forces widget to refresh if toggled
+        st.sidebar.audio(BATTLE_MUSIC, format="audio/mp3", start_time=0, key=f"bgm_{st.session_state.music_widget_key}")
+
+    st.sidebar.markdown("### Data")
+    if st.sidebar.button("Prefetch all Pokémon"):
+        bar = st.sidebar.progress(0.0)
+        loaded, failed = warm_roster(fetch_roster_list(), get_pokemon_cache(), get_snapshot(), get_manifest(),
+                                     progress=lambda done, total: bar.progress(done / total))
+        if failed:
+            st.sidebar.warning(f"{failed} Pokémon failed to load.")
+        else:
+            st.sidebar.success(f"Loaded {loaded} Pokémon.")
+    cache_stats = get_pokemon_cache().stats()
+    st.sidebar.caption(
+        f"Shared cache: {cache_stats['entries']} Pokémon, {cache_stats['bytes_used'] / 1e6:.1f} / "
+        f"{cache_stats['max_bytes'] / 1e6:.0f} MB, hit rate {cache_stats['hit_rate']:.0%}"
+    )
+    health = pokeapi.health()
+    breaker = health["breaker"]
+    if health["consecutive_failures"]:
+        breaker += f" after {health['consecutive_failures']} failures"
+    down = [host for host, state in health["other_hosts"].items() if state != "closed"]
+    st.sidebar.caption(
+        f"PokeAPI: {breaker}, {health['coalesced']} requests coalesced, "
+        f"{health['stale']['hits']} served from the last good copy"
+        + (f"; sprites unavailable from {', '.join(down)}" if down else "")
+    )
+    startup = startup_stats()
+    if startup["first_render_s"] is not None:
+        warm = "warming up…" if startup["warmed"] is None else f"{startup['warmed'][0]} Pokémon warmed at startup"
+        if startup["warm_error"]:
+            warm = f"warm-up failed: {startup['warm_error']}"
+        st.sidebar.caption(f"Server's first render: {startup['first_render_s'] * 1000:.0f} ms, {warm}")
+
+    # -----------------------
+    # Main Layout
+    # -----------------------
+    st.title("🧩 Pokémon Battle — Deluxe Edition")
+    st.markdown(
+        f"{len(get_name_index())} Pokémon loaded from **PokeAPI**. Turn-based combat, XP, items, sounds, music, and multiplayer!"
     )
 
-# -----------------------
-# Pokémon Selection Area
-# -----------------------
-with col_main:
-    st.header("1) Select Pokémon / Load from PokeAPI")
-
-    poke_names = [p['name'].title() for p in st.session_state.pokelist]
-    # Selection UI depends on mode
-    if st.session_state.multiplayer:
-        st.subheader("Local Multiplayer: Select both players")
-        p1 = st.selectbox("Player 1 Pokémon", poke_names, key="p1_select")
-        p2 = st.selectbox("Player 2 Pokémon", poke_names, key="p2_select")
-        if p1 and p2:
-            # load details if not cached
-            for pname in (p1, p2):
-                lname = pname.lower()
-                if lname not in st.session_state.cache_pokemon:
-                    try:
-                        data = load_pokemon_by_name(lname)
-                        st.session_state.cache_pokemon[lname] = data
-                    except Exception as e:
-                        st.error(f"Failed to fetch {pname}: {e}")
-            # initialize party entries
-            def ensure_init_slot(slot_name, pname):
-                lname = pname.lower()
-                if slot_name not in st.session_state.party or st.session_state.party[slot_name] is None or st.session_state.party[slot_name]["name"] != pname:
-                    details = st.session_state.cache_pokemon[lname]
-                    base = compute_base_stats(details)
-                    st.session_state.party[slot_name] = {
-                        "name": pname,
-                        "level": 5,
-                        "xp": 0,
-                        "attack": base["attack"],
-                        "defense": base["defense"],
-                        "max_hp": base["max_hp"],
-                        "hp": base["max_hp"],
-                        "moves": base["moves"],
-                        "sprite": base["sprite"],
-                        "items": {"Potion": 2, "Shield": 1, "Power Boost": 1}
-                    }
-            ensure_init_slot("player1", p1)
-            ensure_init_slot("player2", p2)
-    else:
-        st.subheader("Singleplayer: Choose your Pokémon (you vs CPU)")
-        p1 = st.selectbox("Choose your Pokémon", poke_names, key="single_p_select")
-        if p1:
-            lname = p1.lower()
-            if lname not in st.session_state.cache_pokemon:
+    col_main, col_help = st.columns([3, 1])
+    with col_help:
+        st.info(
+            """
+            **How to play**
+            - Pick Pokémon (player1, player2 or CPU).
+            - Use moves and items.
+            - Gain XP on victory and level up.
+            - Toggle background music in sidebar.
+            """
+        )
+
+    # -----------------------
+    # Pokémon Selection Area
+    # -----------------------
+    with col_main, metrics.span("render", section="selection"):
+        st.header("1) Select Pokémon / Load from PokeAPI")
+
+        name_index = get_name_index()
+
+        def pokemon_picker(label, key):
+            """Search box + one page of matches instead of a selectbox over the whole roster."""
+            query = st.text_input(f"Search {label}", key=f"{key}_query", placeholder="Name (typos are fine)")
+            if query.strip():
+                options = name_index.search(query)
+            else:
+                pages = page(name_index.names, 1)[1]
+                number = st.number_input("Page", min_value=1, max_value=pages, key=f"{key}_page") if pages > 1 else 1
+                options = page(name_index.names, number)[0]
+            # keep the current pick selectable while searching, so typing doesn't swap the pokemon
+            current = st.session_state.get(key)
+            if current and current not in options:
+                options = [current] + options
+            # nothing is picked (or loaded) until the player chooses, so the first page view loads no pokemon
+            choice = st.selectbox(label, options, key=key, index=None, format_func=str.title,
+                                  placeholder="Choose a Pokémon")
+            return choice.title() if choice else None
+
+        def ensure_init_slot(slot_name, pname, items):
+            """(Re)create the slot's combatant when the pick or the trainer changed, with saved progress."""
+            current = st.session_state.party.get(slot_name)
+            profiles = st.session_state.setdefault("slot_profiles", {})
+            profile = trainer_for(slot_name)
+            if current is not None and current.name == pname and profiles.get(slot_name) == profile:
+                return
+            base = None
+            try:
+                base = get_pokemon(pname)
+            except Exception as e:
+                show_fetch_error(pname, e)
+            if base is None:
+                return
+            combatant = Combatant.from_record(base, name=pname, items=items)
+            saved = get_progress_store().get(profile, pname) if profile else None
+            if saved is not None:
+                restore(combatant, saved)
+            st.session_state.party[slot_name] = combatant
+            profiles[slot_name] = profile
+
+        def on_find_match(pname):
+            client = st.session_state.get("match_client")
+            if client is not None and client.closed_reason == "disconnected":
+                client.close()
+                client = None
+            if client is None:
+                try:
+                    client = st.session_state.match_client = MatchClient(MATCH_SERVER_URL)
+                except (OSError, TimeoutError) as e:
+                    st.session_state.online_error = f"Couldn't reach the match server at {MATCH_SERVER_URL}: {e}"
+                    return
+            st.session_state.pop("online_error", None)
+            if client.status == "queued":
+                client.leave()  # the server takes one queue entry per connection; this one replaces it
+            client.queue(pname.lower())
+
+        def on_leave_match():
+            client = st.session_state.get("match_client")
+            if client is not None and client.closed_reason != "disconnected":
+                client.leave()
+
+        # Selection UI depends on mode
+        if st.session_state.online:
+            st.subheader("Online Multiplayer: Choose your Pokémon and find an opponent")
+            p1 = pokemon_picker("Your Pokémon", "online_select")
+            find_col, leave_col = st.columns(2)
+            find_col.button("Find match", on_click=on_find_match, args=(p1,), disabled=not p1)
+            leave_col.button("Leave match", on_click=on_leave_match)
+            if "online_error" in st.session_state:
+                st.error(st.session_state.online_error)
+        elif st.session_state.multiplayer:
+            st.subheader("Local Multiplayer: Select both players")
+            p1 = pokemon_picker("Player 1 Pokémon", "p1_select")
+            p2 = pokemon_picker("Player 2 Pokémon", "p2_select")
+            if p1 and p2:
+                # initialize party entries
+                ensure_init_slot("player1", p1, MULTIPLAYER_ITEMS)
+                ensure_init_slot("player2", p2, MULTIPLAYER_ITEMS)
+        else:
+            st.subheader("Singleplayer: Choose your Pokémon (you vs CPU)")
+            p1 = pokemon_picker("Choose your Pokémon", "single_p_select")
+            # only (re)initialize the player slot when the selection changed; nothing to recompute otherwise
+            if p1:
+                ensure_init_slot("player1", p1, STARTING_ITEMS)
+            # choose CPU opponent randomly if not set, once the player has picked
+            if p1 and ("cpu_choice" not in st.session_state or st.session_state.party.get("opponent") is None):
+                cpu_choice = random.choice(name_index.names).title()
+                cbase = None
                 try:
-                    data = load_pokemon_by_name(lname)
-                    st.session_state.cache_pokemon[lname] = data
+                    cbase = get_pokemon(cpu_choice)
                 except Exception as e:
-                    st.error(f"Failed to fetch {p1}: {e}")
-            details = st.session_state.cache_pokemon.get(lname)
-            base = compute_base_stats(details)
-            # initialize player slot
-            if "player1" not in st.session_state.party or st.session_state.party.get("player1", {}).get("name") != p1:
-                st.session_state.party["player1"] = {
-                    "name": p1,
-                    "level": 5,
-                    "xp": 0,
-                    "attack": base["attack"],
-                    "defense": base["defense"],
-                    "max_hp": base["max_hp"],
-                    "hp": base["max_hp"],
-                    "moves": base["moves"],
-                    "sprite": base["sprite"],
-                    "items": {"Potion": 3, "Shield": 1, "Power Boost": 1}
-                }
-        # choose CPU opponent randomly if not set
-        if "cpu_choice" not in st.session_state or st.session_state.party.get("opponent") is None:
-            cpu_choice = random.choice(poke_names)
-            clower = cpu_choice.lower()
-            if clower not in st.session_state.cache_pokemon:
-                st.session_state.cache_pokemon[clower] = load_pokemon_by_name(clower)
-            cdetails = st.session_state.cache_pokemon[clower]
-            cbase = compute_base_stats(cdetails)
-            st.session_state.party["opponent"] = {
-                "name": cpu_choice,
-                "level": random.randint(4, 8),
-                "xp": 0,
-                "attack": cbase["attack"],
-                "defense": cbase["defense"],
-                "max_hp": cbase["max_hp"],
-                "hp": cbase["max_hp"],
-                "moves": cbase["moves"],
-                "sprite": cbase["sprite"],
-                "items": {}
-            }
-
-# -----------------------
-# Battle UI & Controls
-# -----------------------
-st.markdown("---")
-st.header("2) Battle Arena")
-
-arena_col1, arena_col2, arena_col3 = st.columns([2, 2, 1])
-
-# Determine active players
-player1 = st.session_state.party.get("player1")
-if st.session_state.multiplayer:
-    player2 = st.session_state.party.get("player2")
-    opponent = player2
-    player_slot_names = ("player1", "player2")
-else:
-    player2 = st.session_state.party.get("opponent")
-    opponent = player2
-    player_slot_names = ("player1", "opponent")
-
-# Show both combatants
-with arena_col1:
-    if player1:
-        st.subheader(f"Player 1 — {player1['name']} (Lv {player1['level']})")
-        if player1["sprite"]:
-            st.image(player1["sprite"], width=220)
-        st.text(f"HP: {player1['hp']} / {player1['max_hp']}")
-        # HP progress bar (animated via key update)
-        pct1 = max(0.0, player1["hp"] / player1["max_hp"])
-        st.progress(pct1)
-with arena_col2:
-    if opponent:
-        title = "Player 2" if st.session_state.multiplayer else "CPU Opponent"
-        st.subheader(f"{title} — {opponent['name']} (Lv {opponent['level']})")
-        if opponent["sprite"]:
-            st.image(opponent["sprite"], width=220)
-        st.text(f"HP: {opponent['hp']} / {opponent['max_hp']}")
-        pct2 = max(0.0, opponent["hp"] / opponent["max_hp"])
-        st.progress(pct2)
-
-# Battle controls (center)
-with arena_col3:
-    st.write("**Turn**")
-    current_turn = st.session_state.turn
-    st.info(f"Now: {current_turn}")
-
-st.markdown("### Actions")
-
-action_col1, action_col2 = st.columns(2)
-
-# Actions for Player whose turn it is
-def reset_battle_log():
-    st.session_state.battle_log = []
-
-def add_log(msg):
-    st.session_state.battle_log.append(msg)
-
-def end_turn():
+                    show_fetch_error(f"CPU opponent {cpu_choice}", e)
+                if cbase is not None:
+                    st.session_state.cpu_choice = cpu_choice
+                    st.session_state.party["opponent"] = Combatant.from_record(
+                        cbase, name=cpu_choice, level=random.randint(4, 8), items={}
+                    )
+
+    # -----------------------
+    # Battle UI & Controls
+    # -----------------------
+    # The battle panels live in one fragment: a move, an item or a forfeit reruns only the fragment, not the
+    # sidebar, the selection widgets and the rest of the page. (Arena, log and stats all change on every
+    # action, so they share the fragment of the buttons that change them.)
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+    st.markdown("---")
+    st.header("2) Battle Arena")
+
+    # Determine active players
+    player1 = st.session_state.party.get("player1")
     if st.session_state.multiplayer:
-        st.session_state.turn = "player2" if st.session_state.turn == "player1" else "player1"
+        player2 = st.session_state.party.get("player2")
+        opponent = player2
+        player_slot_names = ("player1", "player2")
     else:
-        st.session_state.turn = "opponent" if st.session_state.turn == "player1" else "player1"
-
-def try_level_up(slot):
-    p = st.session_state.party.get(slot)
-    if not p:
-        return
-    # simple xp threshold
-    threshold = 100 + (p["level"] - 1) * 40
-    if p["xp"] >= threshold:
-        p["xp"] -= threshold
-        p["level"] += 1
-        # upgrade stats modestly
-        p["attack"] = int(p["attack"] * 1.08)
-        p["defense"] = int(p["defense"] * 1.07)
-        p["max_hp"] = int(p["max_hp"] * 1.12)
-        p["hp"] = p["max_hp"]
-        add_log(f"✨ {p['name']} leveled up to {p['level']}! Stats increased.")
-
-def perform_attack(attacker_slot, defender_slot, move_name, use_power_boost=False):
-    attacker = st.session_state.party.get(attacker_slot)
-    defender = st.session_state.party.get(defender_slot)
-    if not attacker or not defender:
-        return
-
-    # shield active?
-    defender_shield = False
-    # Check if defender has Shield active flag (we won't implement lasting shields, just item used on defender's previous turn)
-    # Items simple: immediate effect at use time, not persistent unless we implement statuses.
-
-    # power boost
-    power_mod = 1.5 if use_power_boost else 1.0
-
-    # Calculate damage
-    dmg = calculate_damage(attacker, defender, power_mod=power_mod, shield=defender_shield)
-    defender["hp"] -= dmg
-    if defender["hp"] < 0:
-        defender["hp"] = 0
-
-    add_log(f"⚔️ {attacker['name']} used **{move_name}** and dealt **{dmg}** damage to {defender['name']}.")
-
-    # play sounds
-    play_sound(AUDIO_ATTACK)
-    time.sleep(0.15)
-    play_sound(AUDIO_HIT)
-
-    # check faint
-    if defender["hp"] == 0:
-        add_log(f"💀 {defender['name']} fainted!")
-        play_sound(AUDIO_FAINT)
-        # winner XP
-        winner_xp = 60 + defender.get("level", 5) * 8
-        attacker["xp"] += winner_xp
-        add_log(f"🏆 {attacker['name']} gains {winner_xp} XP.")
-        try_level_up(attacker_slot)
-
-def use_item(slot, item_name, target_slot=None):
-    p = st.session_state.party.get(slot)
-    if not p:
-        return
-    items = p.get("items", {})
-    if items.get(item_name, 0) <= 0:
-        add_log(f"❌ {p['name']} has no {item_name}s left.")
-        return
-    # consume
-    items[item_name] -= 1
-    add_log(f"🧪 {p['name']} used {item_name}!")
-    if item_name == "Potion":
-        heal_amount = int(p["max_hp"] * 0.35)
-        p["hp"] = min(p["max_hp"], p["hp"] + heal_amount)
-        add_log(f"❤️ {p['name']} healed {heal_amount} HP.")
-    elif item_name == "Shield":
-        # apply to target if provided otherwise to self
-        target = st.session_state.party.get(target_slot) if target_slot else p
-        # simple immediate effect: next incoming damage is reduced in calculation by flag set (we implement as temp field)
-        target["_temp_shield"] = True
-        add_log(f"🛡 {target['name']} will take reduced damage next hit.")
-    elif item_name == "Power Boost":
-        # give attacker a temporary attack boost for next attack
-        p["_temp_power"] = 1.5
-        add_log(f"⚡ {p['name']}'s next attack will deal increased damage.")
-
-# UI: show moves + items for player whose turn it is
-active_slot = st.session_state.turn
-inactive_slot = "player2" if active_slot == "player1" else "player1"
-if not st.session_state.multiplayer:
-    inactive_slot = "opponent" if active_slot == "player1" else "player1"
-
-active_player = st.session_state.party.get(active_slot)
-inactive_player = st.session_state.party.get(inactive_slot)
-
-if active_player is None or inactive_player is None:
-    st.warning("Select Pokémon first to start battle.")
-else:
-    # show moves
-    st.subheader(f"Actions — {active_player['name']} (Turn)")
-
-    cols = st.columns([1, 1, 1])
-    with cols[0]:
-        st.markdown("**Moves**")
-        move_choice = st.selectbox("Choose move", active_player["moves"], key=f"move_{active_slot}")
-        if st.button("Use Move", key=f"use_move_{active_slot}"):
-            # check temp power
-            use_power = False
-            if active_player.get("_temp_power"):
-                use_power = True
-                del active_player["_temp_power"]
-            # check target shield on defender
-            def_shield = bool(inactive_player.get("_temp_shield"))
-            if def_shield:
-                # consume shield flag and mark a local effect
-                inactive_player["_temp_shield"] = False
-            # perform attack using modified defender shield flag
-            # To support shield we pass shield flag
-            if def_shield:
-                # calculate damage with shield True
-                dmg = calculate_damage(active_player, inactive_player, power_mod=1.5 if use_power else 1.0, shield=True)
-                inactive_player["hp"] = max(0, inactive_player["hp"] - dmg)
-                add_log(f"⚔️ {active_player['name']} used **{move_choice}** and dealt **{dmg}** damage (reduced by Shield) to {inactive_player['name']}.")
+        player2 = st.session_state.party.get("opponent")
+        opponent = player2
+        player_slot_names = ("player1", "opponent")
+
+    def current_battle():
+        """The session's engine Battle over the selected combatants; a new one starts when a pick changes."""
+        party = {s: st.session_state.party.get(s) for s in player_slot_names}
+        if any(p is None for p in party.values()):
+            return None
+        battle = st.session_state.get("battle")
+        if (battle is None or battle.slots != player_slot_names
+                or any(battle.party[s] is not p for s, p in party.items())):
+            # every battle gets its own seed so the log can replay it
+            battle = Battle(party, cpu_slot=None if st.session_state.multiplayer else "opponent",
+                            seed=st.session_state.rng.getrandbits(32))
+            st.session_state.battle = battle
+            st.session_state.battle_log.start_match(battle)
+        if not st.session_state.multiplayer:
+            battle.cpu_policy = DIFFICULTIES[cpu_difficulty]
+        return battle
+
+    # Actions for Player whose turn it is. These run as button callbacks, before the fragment renders,
+    # so the arena, log and stats drawn in the same run already show the result.
+    def reset_battle_log():
+        # the records stay in the log (and its export); the panel just starts over
+        st.session_state.log_since = len(st.session_state.battle_log)
+
+    def play(action):
+        """Step the battle, log the action and its events, and queue their sound cues for the browser."""
+        bind_metrics()  # callbacks run before the script, so before its own bind_metrics()
+        battle = st.session_state.battle
+        slot = battle.turn
+        with metrics.span("engine.step"):
+            events = battle.step(action)
+        st.session_state.battle_log.record(slot, action, events)
+        # write-behind: this only queues the rows, the store batches the disk writes
+        for s in battle.slots:
+            profile = trainer_for(s) if s != battle.cpu_slot else None
+            if profile:
+                get_progress_store().save(profile, battle.party[s])
+        if st.session_state.sfx_on:
+            st.session_state.effect_seq = st.session_state.get("effect_seq", 0) + 1
+            st.session_state.pending_cues = effects.schedule(events)
+
+    def on_use_move(slot):
+        play(("move", st.session_state[f"move_{slot}"]))
+
+    def on_use_item(slot):
+        play(("item", st.session_state[f"item_{slot}"]))
+
+    def on_forfeit():
+        # reset hp to max for both, replenish items and clear log
+        play(("forfeit",))
+        reset_battle_log()
+        st.session_state.flash = "Match reset."
+
+    def export_log(log):
+        buf = io.StringIO()
+        log.export(buf)
+        return buf.getvalue()
+
+    # -----------------------
+    # View models
+    # -----------------------
+    def stats_view(slot, p):
+        return stats_markdown(slot, p.name, p.level, p.hp, p.max_hp, p.attack, p.defense, p.xp, tuple(p.items.items()))
+
+    # -----------------------
+    # Battle panels
+    # -----------------------
+    def arena_panel(battle):
+        arena_col1, arena_col2, arena_col3 = st.columns([2, 2, 1])
+        # Show both combatants
+        with arena_col1:
+            if player1:
+                st.subheader(f"Player 1 — {player1.name} (Lv {player1.level})")
+                if player1.sprite:
+                    st.image(sprite_bytes(player1.sprite, 220) or player1.sprite, width=220)
+                st.text(f"HP: {player1.hp} / {player1.max_hp}")
+                # HP progress bar (animated via key update)
+                st.progress(max(0.0, player1.hp / player1.max_hp))
+        with arena_col2:
+            if opponent:
+                title = "Player 2" if st.session_state.multiplayer else "CPU Opponent"
+                st.subheader(f"{title} — {opponent.name} (Lv {opponent.level})")
+                if opponent.sprite:
+                    st.image(sprite_bytes(opponent.sprite, 220) or opponent.sprite, width=220)
+                st.text(f"HP: {opponent.hp} / {opponent.max_hp}")
+                st.progress(max(0.0, opponent.hp / opponent.max_hp))
+        # Battle controls (center)
+        with arena_col3:
+            st.write("**Turn**")
+            st.info(f"Now: {battle.turn if battle else 'player1'}")
+            # only with both picked: loading the matrix imports numpy, which the first page view doesn't need
+            matchups = get_matchups() if player1 and opponent else None
+            if matchups is not None:
+                win_p = matchups.win_probability(player1.name, opponent.name)
+                if win_p is not None:
+                    st.metric("Player 1 win chance", f"{win_p:.0%}")
+
+    def actions_panel(battle):
+        st.markdown("### Actions")
+        if battle is None:
+            st.warning("Select Pokémon first to start battle.")
+            return
+        active_slot = battle.turn
+        active_player = battle.party[active_slot]
+        # show moves
+        st.subheader(f"Actions — {active_player.name} (Turn)")
+        flash = st.session_state.pop("flash", None)
+        if flash:
+            st.success(flash)
+        elif battle.over:
+            st.success(f"{battle.party[battle.winner].name} won! Forfeit / Restart to play again.")
+
+        cols = st.columns([1, 1, 1])
+        with cols[0]:
+            st.markdown("**Moves**")
+            st.selectbox("Choose move", active_player.moves, key=f"move_{active_slot}")
+            st.button("Use Move", key=f"use_move_{active_slot}", disabled=battle.over,
+                      on_click=on_use_move, args=(active_slot,))
+        with cols[1]:
+            st.markdown("**Items**")
+            it_choice = st.selectbox("Choose item", list(active_player.items), key=f"item_{active_slot}")
+            st.button("Use Item", key=f"use_item_{active_slot}", disabled=battle.over or it_choice is None,
+                      on_click=on_use_item, args=(active_slot,))
+        with cols[2]:
+            st.markdown("**Utility**")
+            st.button("Forfeit / Restart Match", on_click=on_forfeit)
+
+        cues = st.session_state.pop("pending_cues", None)
+        if cues:
+            effects.render(cues, seq=st.session_state.effect_seq)
+
+    def log_panel():
+        st.subheader("Battle Log")
+        log = st.session_state.battle_log
+        entries = [format_event(r) for r in log.tail(30, types=LOGGED_EVENTS) if r["seq"] > st.session_state.log_since]
+        if entries:
+            st.markdown("  \n".join(entries))
+        st.download_button("Export log (NDJSON)", data=lambda: export_log(log), file_name="battle_log.ndjson",
+                           mime="application/x-ndjson", on_click="ignore")
+
+    def stats_panel():
+        st.subheader("Player Stats & Inventory")
+        for slot in player_slot_names:
+            p = st.session_state.party.get(slot)
+            if not p:
+                continue
+            st.markdown(stats_view(slot, p))
+            st.progress(max(0.0, p.hp / p.max_hp))
+
+    # -----------------------
+    # Battle Log & XP Panels
+    # -----------------------
+    @fragment
+    def battle_panel():
+        bind_metrics()
+        with metrics.span("render", section="battle"):
+            battle = current_battle()
+            with metrics.span("render", section="arena"):
+                arena_panel(battle)
+            with metrics.span("render", section="actions"):
+                actions_panel(battle)
+            st.markdown("---")
+            left_col, right_col = st.columns([2, 1])
+            with left_col, metrics.span("render", section="log"):
+                log_panel()
+            with right_col, metrics.span("render", section="stats"):
+                stats_panel()
+
+    # -----------------------
+    # Online battle (state lives on the match server)
+    # -----------------------
+    def polling_fragment(f):
+        # reruns on a timer to pick up the opponent's moves, pushed to the session's MatchClient
+        if getattr(st, "fragment", None) is None:
+            return f
+        return st.fragment(run_every=ONLINE_POLL_S)(f)
+
+    def on_online_action(kind):
+        action = ("forfeit",) if kind == "forfeit" else (kind, st.session_state[f"online_{kind}"])
+        st.session_state.match_client.act(action)
+
+    def online_stats(slot, p):
+        return stats_markdown(slot, p["name"], p["level"], p["hp"], p["max_hp"], p["attack"], p["defense"], p["xp"],
+                              tuple(p["items"].items()))
+
+    @polling_fragment
+    def online_panel():
+        bind_metrics()
+        with metrics.span("render", section="online"):
+            online_view()
+
+    def online_view():
+        client = st.session_state.get("match_client")
+        view = client.view() if client is not None else None
+        if view is None or view["status"] == "idle":
+            st.info("Choose a Pokémon and press **Find match** to play someone on the match server.")
+            return
+        if view["error"]:
+            st.warning(view["error"])
+        if view["status"] == "queued":
+            st.info("Waiting for an opponent…")
+            return
+        if view["state"] is None:
+            st.warning(f"Disconnected from the match server ({view['closed_reason']}).")
+            return
+        state, me = view["state"], view["slot"]
+        them = next(s for s in state["party"] if s != me)
+        columns = st.columns(2)
+        for col, slot, title in ((columns[0], me, "You"), (columns[1], them, "Opponent")):
+            p = state["party"][slot]
+            with col:
+                st.subheader(f"{title} — {p['name']} (Lv {p['level']})")
+                if p["sprite"]:
+                    st.image(sprite_bytes(p["sprite"], 220) or p["sprite"], width=220)
+                st.text(f"HP: {p['hp']} / {p['max_hp']}")
+                st.progress(max(0.0, p["hp"] / p["max_hp"]))
+
+        st.markdown("### Actions")
+        if view["status"] == "closed":
+            if view["closed_reason"] == "forfeit":
+                outcome = "You won" if view["closed_winner"] == me else "You lost"
+                st.warning(f"{outcome}: the match was forfeited. Press Find match to play again.")
             else:
-                perform_attack(active_slot, inactive_slot, move_choice, use_power_boost=use_power)
-            # after action check faint and end turn (with CPU auto actions)
-            if inactive_player["hp"] == 0:
-                # victory handling
-                add_log(f"🎉 {active_player['name']} won the battle!")
-                play_sound(AUDIO_WIN)
-                # Reward xp already applied by perform_attack/logic
-            else:
-                # if singleplayer and opponent, do auto counter
-                if not st.session_state.multiplayer and inactive_slot == "opponent":
-                    time.sleep(0.6)
-                    # CPU selects move and may use item randomly
-                    cpu_use_item = random.random() < 0.18
-                    if cpu_use_item and inactive_player.get("items"):
-                        # try potion if hp low
-                        if inactive_player["hp"] < inactive_player["max_hp"] * 0.45 and inactive_player.get("items", {}).get("Potion", 0) > 0:
-                            use_item(inactive_slot, "Potion")
-                        else:
-                            # else 20% chance to use power boost
-                            if inactive_player.get("items", {}).get("Power Boost", 0) > 0 and random.random() < 0.4:
-                                use_item(inactive_slot, "Power Boost")
-                    # CPU attack
-                    cpu_move = random.choice(inactive_player["moves"])
-                    # check temp power/shield
-                    cpu_power = False
-                    if inactive_player.get("_temp_power"):
-                        cpu_power = True
-                        del inactive_player["_temp_power"]
-                    target_shield = bool(active_player.get("_temp_shield"))
-                    if target_shield:
-                        active_player["_temp_shield"] = False
-                        dmg = calculate_damage(inactive_player, active_player, power_mod=1.5 if cpu_power else 1.0, shield=True)
-                        active_player["hp"] = max(0, active_player["hp"] - dmg)
-                        add_log(f"💥 CPU {inactive_player['name']} used **{cpu_move}** and dealt **{dmg}** (reduced by Shield) to {active_player['name']}.")
-                    else:
-                        perform_attack(inactive_slot, active_slot, cpu_move, use_power_boost=cpu_power)
-                else:
-                    # just change turn
-                    end_turn()
-    with cols[1]:
-        st.markdown("**Items**")
-        it_choice = st.selectbox("Choose item", list(active_player.get("items", {}).keys()), key=f"item_{active_slot}")
-        if st.button("Use Item", key=f"use_item_{active_slot}"):
-            # for Shield item, ask target if multiplayer
-            tgt = None
-            if it_choice == "Shield" and st.session_state.multiplayer:
-                # offer choice to use on self or ally (for simplicity only self or the other)
-                # here we'll just apply to self in this simple flow
-                tgt = active_slot
-            use_item(active_slot, it_choice, target_slot=tgt)
-            # end turn after using item
-            if not st.session_state.multiplayer and active_slot == "player1":
-                # CPU might act immediately if singleplayer
-                time.sleep(0.5)
-                # CPU randomly act
-                cpu_move = random.choice(inactive_player["moves"])
-                perform_attack(inactive_slot, active_slot, cpu_move)
-            else:
-                end_turn()
-    with cols[2]:
-        st.markdown("**Utility**")
-        if st.button("Forfeit / Restart Match"):
-            # reset hp to max for both and clear log
-            for s in player_slot_names:
-                if st.session_state.party.get(s):
-                    st.session_state.party[s]["hp"] = st.session_state.party[s]["max_hp"]
-                    # replenish some items moderately
-                    st.session_state.party[s]["items"] = {"Potion": 2, "Shield": 1, "Power Boost": 1}
-            reset_battle_log()
-            st.success("Match reset.")
-            st.experimental_rerun()
-
-# -----------------------
-# Battle Log & XP Panels
-# -----------------------
-st.markdown("---")
-left_col, right_col = st.columns([2, 1])
-
-with left_col:
-    st.subheader("Battle Log")
-    for entry in st.session_state.battle_log[-30:]:
-        st.write(entry)
-
-with right_col:
-    st.subheader("Player Stats & Inventory")
-    for slot in player_slot_names:
-        p = st.session_state.party.get(slot)
-        if not p:
-            continue
-        st.markdown(f"**{slot.upper()}: {p['name']} (Lv {p['level']})**")
-        st.write(f"HP: {p['hp']} / {p['max_hp']}")
-        st.progress(max(0.0, p['hp'] / p['max_hp']))
-        st.write(f"Attack: {p['attack']}  Defense: {p['defense']}")
-        st.write(f"XP: {p['xp']} / {100 + (p['level']-1)*40}")
-        st.write("Items:")
-        for itnm, qty in p.get("items", {}).items():
-            st.write(f"- {itnm}: {qty}")
-
-# -----------------------
-# Endgame detection & rewards
-# -----------------------
-def detect_and_handle_victory():
-    # check if any side has all fainted (for simplicity we consider single-mon battles)
-    p1_dead = st.session_state.party["player1"]["hp"] <= 0
-    opp_dead = st.session_state.party[player_slot_names[1]]["hp"] <= 0
-    if p1_dead and opp_dead:
-        add_log("It's a double KO!")
-    elif opp_dead:
-        add_log("🏆 Player 1 wins the match!")
-        # apply reward xp already applied earlier; give bonus
-        st.session_state.party["player1"]["xp"] += 30
-        try_level_up("player1")
-    elif p1_dead:
-        add_log("🏆 Opponent wins the match!")
-        if st.session_state.multiplayer:
-            st.session_state.party["player2"]["xp"] += 30
-            try_level_up("player2")
-
-detect_and_handle_victory()
+                st.warning(f"Match closed ({view['closed_reason']}). Press Find match to play again.")
+        else:
+            if state["winner"] is not None:
+                st.success(f"{state['party'][state['winner']]['name']} won! Forfeit / Restart to play again.")
+            elif state["turn"] != me:
+                st.info("Opponent's turn…")
+            mine = state["party"][me]
+            can_act = state["turn"] == me and state["winner"] is None
+            cols = st.columns([1, 1, 1])
+            with cols[0]:
+                st.selectbox("Choose move", mine["moves"], key="online_move")
+                st.button("Use Move", key="online_use_move", disabled=not can_act, on_click=on_online_action,
+                          args=("move",))
+            with cols[1]:
+                it_choice = st.selectbox("Choose item", list(mine["items"]), key="online_item")
+                st.button("Use Item", key="online_use_item", disabled=not can_act or it_choice is None,
+                          on_click=on_online_action, args=("item",))
+            with cols[2]:
+                st.button("Forfeit / Restart Match", key="online_forfeit", on_click=on_online_action, args=("forfeit",))
+
+        st.markdown("---")
+        left_col, right_col = st.columns([2, 1])
+        with left_col:
+            st.subheader("Battle Log")
+            entries = [format_event(e) for e in view["events"] if e["type"] in LOGGED_EVENTS]
+            if entries:
+                st.markdown("  \n".join(entries[-30:]))
+        with right_col:
+            st.subheader("Player Stats & Inventory")
+            for slot in (me, them):
+                st.markdown(online_stats(slot, state["party"][slot]))
+
+    if st.session_state.online:
+        online_panel()
+    else:
+        battle_panel()
+
+    # -----------------------
+    # Final controls & tips
+    # -----------------------
+    st.markdown("---")
+    st.caption("Tips: Use Potions when low HP, Shields to reduce big hits, and Power Boost before a big attack.")
+
+    st.write("If you want me to export this to a packaged app with hosted audio and custom images, say `package` and I’ll prepare a deployment guide.")
+
+# the whole page is one "app.rerun" span; the with block closes it however the run ends (an exception,
+# or Streamlit stopping the script for a rerun)
+with metrics.span("app.rerun"):
+    main()
+startup = startup_stats()
+if startup["first_render_s"] is None:
+    # time to first render: from this process's first script run starting to its first page being built
+    startup["first_render_s"] = time.perf_counter() - RUN_STARTED
+    metrics.observe("app.first_render", startup["first_render_s"])
 
 # -----------------------
-# Final controls & tips
+# Debug: timings (POKEMON_METRICS=1)
 # -----------------------
-st.markdown("---")
-st.caption("Tips: Use Potions when low HP, Shields to reduce big hits, and Power Boost before a big attack.")
-
-st.write("If you want me to export this to a packaged app with hosted audio and custom images, say `package` and I’ll prepare a deployment guide.")
-
+if metrics.ENABLED:
+    st.sidebar.markdown("### Metrics")
+    if st.sidebar.checkbox("Show timings", key="show_metrics"):
+        st.sidebar.caption("This session (fragment reruns included)")
+        st.sidebar.dataframe(st.session_state.metrics.summary(), hide_index=True)
+        st.sidebar.caption("Whole process")
+        st.sidebar.dataframe(metrics.PROCESS.summary(), hide_index=True)
@@ -0,0 +1,229 @@
+# battlelog.py
+"""Bounded, structured battle log: engine events in a ring buffer that spills to NDJSON on disk.
+
+The log holds plain JSON records, one per line when exported:
+
+    {"type": "match", "match": 1, "seed": 123, "cpu_slot": "opponent", "growth": [...], "party": {...}}
+    {"type": "action", "match": 1, "slot": "player1", "action": ["move", "Tackle"]}
+    {"type": "attack", "match": 1, "seq": 3, ...}        <- engine events, as returned by Battle.step
+
+Only the newest `capacity` records stay in memory; older ones are appended to `spill_path` (or dropped
+when there is none), so a session's memory stays flat however long it plays. The spill file is deleted
+when its EventLog is garbage collected (its session ended) or at interpreter exit. A match header carries
+the seed and the starting party, and the CPU's decisions are in its `cpu_turn` events, so any match
+in an export can be replayed exactly:
+
+    python battlelog.py replay session.ndjson     # re-run every match and check the events agree
+    python battlelog.py summary session.ndjson    # event counts, damage and win totals
+"""
+import argparse
+import collections
+import json
+import os
+import weakref
+
+from engine import Battle, Combatant
+
+DEFAULT_CAPACITY = 256
+
+
+class EventLog:
+    """Ring buffer of log records with optional spill-to-disk. Not thread-safe (one per session)."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, spill_path=None):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.spilled = 0  # records moved to disk
+        self.dropped = 0  # records discarded because there was nowhere to spill them
+        self.match = 0
+        self._seq = 0
+        self._records = collections.deque()
+        if spill_path is not None:
+            # session_state holds the only reference, so this runs once Streamlit drops the session
+            weakref.finalize(self, _remove_spill, spill_path)
+
+    def __len__(self):
+        """Records logged so far, including spilled and dropped ones."""
+        return self._seq
+
+    def _append(self, record):
+        self._seq += 1
+        record["seq"] = self._seq
+        self._records.append(record)
+        if len(self._records) > self.capacity:
+            # evict half the buffer at once so disk writes are batched
+            self._evict(max(1, self.capacity // 2))
+
+    def _evict(self, n):
+        old = [self._records.popleft() for _ in range(min(n, len(self._records)))]
+        if self.spill_path is None:
+            self.dropped += len(old)
+            return
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, separators=(",", ":")) + "\n" for r in old)
+        self.spilled += len(old)
+
+    # -----------------------
+    # Recording
+    # -----------------------
+    def start_match(self, battle):
+        """Header record for a new Battle: seed, CPU slot and starting party, taken before any step."""
+        self.match += 1
+        self._append({
+            "type": "match",
+            "match": self.match,
+            "seed": battle.seed,
+            "cpu_slot": battle.cpu_slot,
+            "growth": list(battle.growth),
+            "party": {slot: p.to_dict() for slot, p in battle.party.items()},
+        })
+
+    def record(self, slot, action, events):
+        """Log one Battle.step call: the action taken by `slot` and the events it produced."""
+        self._append({"type": "action", "match": self.match, "slot": slot, "action": list(action)})
+        for event in events:
+            self._append(dict(event, match=self.match))
+
+    # -----------------------
+    # Reading
+    # -----------------------
+    def tail(self, n=30, types=None):
+        """The newest `n` in-memory records (optionally only those whose type is in `types`)."""
+        out = []
+        for r in reversed(self._records):
+            if types is None or r["type"] in types:
+                out.append(r)
+                if len(out) == n:
+                    break
+        out.reverse()
+        return out
+
+    def __iter__(self):
+        """Every retained record in order: spilled ones from disk first, then the buffer."""
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            with open(self.spill_path, encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        yield from list(self._records)
+
+    def export(self, fp):
+        """Stream the whole log to the text file `fp` as NDJSON. Returns the number of records written."""
+        n = 0
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            with open(self.spill_path, encoding="utf-8") as f:
+                for line in f:
+                    fp.write(line)
+                    n += 1
+        for r in list(self._records):
+            fp.write(json.dumps(r, separators=(",", ":")) + "\n")
+            n += 1
+        return n
+
+
+def _remove_spill(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def read_ndjson(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# -----------------------
+# Replay
+# -----------------------
+def iter_matches(records):
+    """Group a record stream into (header, actions, events) per match. Matches whose header was
+    dropped from the log are skipped."""
+    current = None
+    for r in records:
+        if r["type"] == "match":
+            if current is not None:
+                yield current
+            current = (r, [], [])
+        elif current is not None and r.get("match") == current[0]["match"]:
+            if r["type"] == "action":
+                current[1].append(r)
+            else:
+                current[2].append(r)
+    if current is not None:
+        yield current
+
+
+def _scripted_policy(decisions):
+    """CPU policy that replays recorded (item, move) decisions in order."""
+    queue = collections.deque(decisions)
+
+    def policy(battle, slot):
+        return queue.popleft()
+
+    return policy
+
+
+def replay_match(header, actions, cpu_decisions):
+    """Re-run a match from its header, its actions and the CPU's recorded decisions.
+
+    Returns the finished Battle and the events it produced, in the same form as they were logged.
+    """
+    party = {slot: Combatant.from_dict(state) for slot, state in header["party"].items()}
+    battle = Battle(party, cpu_slot=header["cpu_slot"], seed=header["seed"],
+                    cpu_policy=_scripted_policy(cpu_decisions), growth=tuple(header["growth"]))
+    events = []
+    for a in actions:
+        events += battle.step(tuple(a["action"]))
+    return battle, events
+
+
+def verify_match(header, actions, events):
+    """True when replaying the match reproduces its logged events exactly."""
+    decisions = [(e["item"], e["move"]) for e in events if e["type"] == "cpu_turn"]
+    _, replayed = replay_match(header, actions, decisions)
+    strip = lambda e: {k: v for k, v in e.items() if k not in ("match", "seq")}  # noqa: E731
+    return [strip(e) for e in events] == [json.loads(json.dumps(e)) for e in replayed]
+
+
+def summarize(records):
+    """Batch analytics over a record stream: counts by type, damage dealt and wins per species."""
+    counts = collections.Counter()
+    damage = collections.Counter()
+    wins = collections.Counter()
+    for r in records:
+        counts[r["type"]] += 1
+        if r["type"] == "attack":
+            damage[r["name"]] += r["damage"]
+        elif r["type"] == "win":
+            wins[r["name"]] += 1
+    return {"counts": dict(counts), "damage": dict(damage), "wins": dict(wins)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay or summarize an exported battle log.")
+    parser.add_argument("command", choices=["replay", "summary"])
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        ok = bad = skipped = 0
+        for header, actions, events in iter_matches(read_ndjson(args.path)):
+            if header["seed"] is None:
+                skipped += 1
+            elif verify_match(header, actions, events):
+                ok += 1
+            else:
+                bad += 1
+                print(f"match {header['match']}: replay diverged")
+        print(f"{ok} matches replayed identically, {bad} diverged, {skipped} without a seed")
+        return 1 if bad else 0
+    summary = summarize(read_ndjson(args.path))
+    print(json.dumps(summary["counts"], indent=2))
+    for name, n in sorted(summary["wins"].items(), key=lambda kv: -kv[1])[:10]:
+        print(f"{name:>15}  {n} wins  {summary['damage'].get(name, 0)} damage")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+# benchmarks/bench_cold.py
+"""Cold start: a fresh Python process up to the app's first complete render.
+
+    python benchmarks/bench_cold.py --repeat 5
+
+Each run starts a new interpreter that imports Streamlit's AppTest and renders app.py once against a
+synthetic offline snapshot and roster manifest, so nothing is cached in memory. Reports the whole
+process wall time and the part spent in the first script run (imports of the app's own modules
+included), best and median.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_rerun import offline_env
+from fixtures import ROOT, report
+
+_CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+imported = time.perf_counter()
+at.run()
+if at.exception:
+    raise SystemExit(at.exception[0].message)
+print(json.dumps({"first_run_s": time.perf_counter() - imported}))
+"""
+
+
+def bench(repeat=5):
+    """Call after offline_env(): the children inherit its environment."""
+    walls, first_runs = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", _CHILD, os.path.join(ROOT, "app.py")], cwd=ROOT,
+                              capture_output=True, text=True, check=True)
+        walls.append(time.perf_counter() - start)
+        first_runs.append(json.loads(proc.stdout.strip().splitlines()[-1])["first_run_s"])
+    return {
+        "process_best_ms": min(walls) * 1000,
+        "process_median_ms": statistics.median(walls) * 1000,
+        "first_render_best_ms": min(first_runs) * 1000,
+        "first_render_median_ms": statistics.median(first_runs) * 1000,
+        "repeat": repeat,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        offline_env(tmp)
+        result = bench(args.repeat)
+    report(result, args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# benchmarks/bench_load.py
+"""N concurrent app sessions against a local fixture server standing in for pokeapi.co.
+
+    python benchmarks/bench_load.py --sessions 20 --actions 10
+    python benchmarks/bench_load.py --sessions 50 --latency-ms 80    # a slower upstream
+
+There is no snapshot, manifest or warm-up, so every species and move the sessions pick is fetched from
+the fixture server on demand through the app's fetch layer (coalescing, retries, the shared cache).
+Each session runs in its own thread through AppTest: open the page, pick a pokemon, then `--actions`
+moves and items. Action latencies include waiting for the other sessions' reruns (see QueuedSession);
+rerun_* are the reruns alone. All sessions stay alive until the end, so the process's resident memory
+growth divided by the number of sessions approximates the memory cost of one session.
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from bench_rerun import PICKS, AppSession
+from fixtures import report, write_synthetic_fixtures
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class QueuedSession(AppSession):
+    """AppTest installs a process-global Runtime around every run, so runs of different sessions can't
+    overlap: they queue for their turn, much as script threads queue for the GIL on a real server.
+    Methods return the response time (queueing included); `service` collects the run times alone."""
+
+    turn = threading.Lock()
+
+    def __init__(self):
+        super().__init__()
+        self.service = []
+
+    def _run(self, widget=None):
+        start = time.perf_counter()
+        with self.turn:
+            self.service.append(super()._run(widget))
+        return time.perf_counter() - start
+
+
+def _play(index, actions, barrier, out):
+    session = QueuedSession()
+    barrier.wait()
+    timings = {"open": session.open(), "select": session.select(PICKS[index % len(PICKS)]), "actions": []}
+    for step in range(actions):
+        if session.battle_over:
+            session.forfeit()
+        elapsed = session.item() if step % 3 == 2 else None
+        timings["actions"].append(elapsed if elapsed is not None else session.move())
+    out[index] = (session, timings)
+
+
+def bench(server, sessions=20, actions=10):
+    # one warm-up session first, so the baseline includes the modules and caches every session shares
+    warm = AppSession()
+    warm.open()
+    gc.collect()
+    baseline = rss_bytes()
+    requests_before = server.requests
+    barrier = threading.Barrier(sessions)
+    out = [None] * sessions
+    errors = []
+
+    def run(i):
+        try:
+            _play(i, actions, barrier, out)
+        except Exception as e:  # reported below; a failed session shouldn't hang the others
+            errors.append(repr(e))
+            barrier.abort()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"{len(errors)} sessions failed, e.g. {errors[0]}")
+    gc.collect()
+    per_session = (rss_bytes() - baseline) / sessions
+    opens = sorted(t["open"] for _, t in out)
+    acts = sorted(a for _, t in out for a in t["actions"])
+    service = sorted(x for session, _ in out for x in session.service)
+    return {
+        "sessions": sessions,
+        "wall_s": wall,
+        "open_median_ms": statistics.median(opens) * 1000,
+        "open_max_ms": opens[-1] * 1000,
+        "action_p50_ms": _percentile(acts, 0.50) * 1000,
+        "action_p95_ms": _percentile(acts, 0.95) * 1000,
+        "action_p99_ms": _percentile(acts, 0.99) * 1000,
+        "rerun_p50_ms": _percentile(service, 0.50) * 1000,
+        "rerun_p95_ms": _percentile(service, 0.95) * 1000,
+        "reruns_per_s": len(service) / wall,
+        "upstream_requests": server.requests - requests_before,
+        "memory_per_session_kb": per_session / 1024,
+    }
+
+
+def fixture_env(tmp, latency_ms=0.0):
+    """Synthetic fixtures in `tmp` behind a started FixtureServer, with the app pointed at it (no snapshot)."""
+    import pokeapi
+    from fixture_server import FixtureServer
+
+    server = FixtureServer(write_synthetic_fixtures(os.path.join(tmp, "fixtures")), latency_s=latency_ms / 1000)
+    server.start()
+    # pokeapi is already imported (by fixture_server); the others read these when the app first imports them
+    pokeapi.POKEAPI_BASE = server.base_url
+    os.environ["POKEMON_SNAPSHOT"] = os.path.join(tmp, "no-snapshot.sqlite3")
+    os.environ["POKEMON_MANIFEST"] = ""
+    os.environ["POKEMON_WARM"] = "0"
+    os.environ["POKEMON_SPRITE_CACHE"] = os.path.join(tmp, "sprites")
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--actions", type=int, default=10, help="moves and items per session")
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every fixture server response")
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        server = fixture_env(tmp, args.latency_ms)
+        try:
+            result = bench(server, args.sessions, args.actions)
+        finally:
+            server.stop()
+    report(result, args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
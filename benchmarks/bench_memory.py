@@ -0,0 +1,83 @@
+# benchmarks/bench_memory.py
+"""Memory held per session by the battle state, at 1,000 and 10,000 live sessions.
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --sessions 1000 10000 50000
+
+Builds the engine state a singleplayer session keeps in st.session_state (its RNG, the party of two
+Combatants and the Battle over them, a few turns in) for N sessions at once, over a shared pool of
+records as the app's shared cache provides them, and measures what they allocate with tracemalloc.
+Also reports one Combatant on its own. Most of a battle is its two Mersenne Twister RNGs (about 2.5 KB
+each), which replays depend on; the Combatants are what the session representation controls. Run it on
+two commits (or through run_benchmarks.py) to compare.
+"""
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+
+from fixtures import MOVE_IDS, report, synthetic_move, synthetic_pokemon
+
+
+def _records(count=20):
+    from moves import move_key, move_stats, project_move
+    from records import compute_base_stats
+
+    rng = random.Random(0)
+    movebook = {move_key(m["name"]): move_stats(project_move(m)) for m in (synthetic_move(i, rng) for i in MOVE_IDS)}
+    return [compute_base_stats(synthetic_pokemon(i, rng), movebook) for i in range(1, count + 1)]
+
+
+def _session(records, rng, turns=4):
+    """What app.py keeps for one singleplayer session with a battle in progress."""
+    from engine import Battle, Combatant, auto_action
+
+    session_rng = random.Random(rng.getrandbits(32))
+    mine, cpu = rng.sample(records, 2)
+    party = {"player1": Combatant.from_record(mine),
+             "opponent": Combatant.from_record(cpu, level=rng.randint(4, 8), items={})}
+    battle = Battle(party, cpu_slot="opponent", seed=session_rng.getrandbits(32))
+    for _ in range(turns):
+        if battle.over:
+            break
+        battle.step(auto_action(battle))
+    return {"rng": session_rng, "party": party, "battle": battle}
+
+
+def _allocated(build, n):
+    """Bytes still allocated per object after building `n` of them with build(i)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(n)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / n
+
+
+def bench(counts=(1000, 10000)):
+    from engine import Combatant
+
+    records = _records()
+    rng = random.Random(1)
+    result = {"combatant_bytes": _allocated(lambda i: Combatant.from_record(records[i % len(records)]), 10000)}
+    for n in counts:
+        per_session = _allocated(lambda i: _session(records, rng), n)
+        result[f"sessions_{n}_bytes_per_session"] = per_session
+        result[f"sessions_{n}_total_mb"] = per_session * n / 2 ** 20
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args(argv)
+    report(bench(args.sessions), args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# benchmarks/bench_micro.py
+"""Micro-benchmarks of the engine's hot functions, on synthetic pokemon (no network, no Streamlit).
+
+    python benchmarks/bench_micro.py
+    python benchmarks/bench_micro.py --repeat 7 --number 20000
+
+Reports the best of `--repeat` runs of `--number` calls each, in microseconds per call, for
+compute_base_stats (projecting a raw document with ~80 moves), calculate_damage, one engine attack
+(Battle.step of a move, which replaced perform_attack) and try_level_up.
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from fixtures import MOVE_IDS, report, synthetic_move, synthetic_pokemon
+
+
+def _documents():
+    """Two raw pokemon documents and a movebook with stats for every move they can have."""
+    from moves import move_key, move_stats, project_move
+
+    rng = random.Random(0)
+    docs = [synthetic_pokemon(i, rng) for i in (1, 2)]
+    movebook = {move_key(m["name"]): move_stats(project_move(m)) for m in (synthetic_move(i, rng) for i in MOVE_IDS)}
+    return docs, movebook
+
+
+def bench(number=10_000, repeat=5):
+    from engine import Battle, Combatant, calculate_damage, try_level_up
+    from records import compute_base_stats
+
+    docs, movebook = _documents()
+    records = [compute_base_stats(d, movebook) for d in docs]
+    a, b = (Combatant.from_record(r, level=5) for r in records)
+    rng = random.Random(1)
+    move = a.move_stats[0]
+
+    def fresh_battle():
+        # huge HP so the battle never ends inside a timing run
+        party = {"player1": a.copy(), "player2": b.copy()}
+        for p in party.values():
+            p.hp = p.max_hp = 10 ** 9
+        return Battle(party, seed=2)
+
+    battle = fresh_battle()
+    moves = {slot: battle.party[slot].moves[0] for slot in battle.slots}
+
+    def attack():
+        battle.step(("move", moves[battle.turn]))
+
+    leveler = a.copy()
+
+    def level_up():
+        leveler.xp = 10 ** 6
+        try_level_up(leveler)
+        leveler.attack, leveler.defense, leveler.max_hp = a.attack, a.defense, a.max_hp
+
+    cases = {
+        "compute_base_stats": lambda: compute_base_stats(docs[0], movebook),
+        "calculate_damage": lambda: calculate_damage(a, b, rng=rng, move=move),
+        "engine_attack": attack,
+        "try_level_up": level_up,
+    }
+    return {f"{name}_us": min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+            for name, fn in cases.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args(argv)
+    report(bench(args.number, args.repeat), args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
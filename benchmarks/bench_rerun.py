@@ -0,0 +1,160 @@
+# benchmarks/bench_rerun.py
+"""Per-action rerun time of app.py, driven headless through Streamlit's AppTest.
+
+    python benchmarks/bench_rerun.py --actions 40
+
+Serves the app from a synthetic offline snapshot and plays a scripted session: pick a pokemon through
+the search box, then click "Use Move" and "Use Item" (forfeiting whenever a battle ends, and picking a
+different pokemon every few battles). Each kind of action is timed separately. Run it on two commits
+to compare, or through run_benchmarks.py to keep the results as JSON.
+
+AppTest always reruns the whole script, even for a widget inside a fragment, so <kind>_median_ms is
+the full-page rerun a battle action cost before the battle panel became a fragment. What a browser
+session reruns now is the fragment: <kind>_fragment_median_ms is the time spent in the battle
+fragment's body plus the engine step of the button's callback, read from the app's metrics spans in the
+same runs (this benchmark turns metrics on). Streamlit's own per-run overhead, which a fragment rerun
+also pays, is in neither.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT, build_fixture_manifest, build_fixture_snapshot, report
+
+PICKS = ("mon1", "mon25", "mon7", "mon150", "mon42")
+
+
+def _button(at, key=None, label=None):
+    for b in at.button:
+        if (key is not None and b.key == key) or (label is not None and b.label == label):
+            return b
+    return None
+
+
+# spans covering what a battle action reruns in a browser: the fragment body and the callback's engine step
+FRAGMENT_SPANS = (("render", {"section": "battle"}), ("engine.step", {}))
+
+
+def _fragment_seconds():
+    import metrics
+
+    return sum(metrics.PROCESS.total(name, **labels) for name, labels in FRAGMENT_SPANS)
+
+
+class AppSession:
+    """One singleplayer browser session: each method performs a UI action and returns its rerun time.
+
+    With metrics on, `fragment_s` is the time the last run spent in the battle fragment (see FRAGMENT_SPANS);
+    it is only meaningful when one session runs at a time.
+    """
+
+    def __init__(self, timeout=120):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=timeout)
+        self.fragment_s = 0.0
+
+    def _run(self, widget=None):
+        fragment = _fragment_seconds()
+        start = time.perf_counter()
+        (widget or self.at).run()
+        elapsed = time.perf_counter() - start
+        self.fragment_s = _fragment_seconds() - fragment
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+        return elapsed
+
+    def open(self):
+        return self._run()
+
+    def select(self, query):
+        """Search for `query` and pick the best match (two reruns, as in a browser)."""
+        elapsed = self._run(self.at.text_input(key="single_p_select_query").input(query))
+        options = self.at.selectbox(key="single_p_select").options
+        return elapsed + self._run(self.at.selectbox(key="single_p_select").select_index(1 if len(options) > 1 else 0))
+
+    @property
+    def battle_over(self):
+        move = _button(self.at, key="use_move_player1")
+        return move is None or move.disabled
+
+    def move(self):
+        return self._run(_button(self.at, key="use_move_player1").click())
+
+    def item(self):
+        """Use the first item left, or None when there is none (or the battle is over)."""
+        use = _button(self.at, key="use_item_player1")
+        if use is None or use.disabled:
+            return None
+        return self._run(use.click())
+
+    def forfeit(self):
+        return self._run(_button(self.at, label="Forfeit / Restart Match").click())
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    if not timings:
+        return {}
+    return {"median_ms": statistics.median(timings) * 1000,
+            "p95_ms": timings[max(0, int(len(timings) * 0.95) - 1)] * 1000, "n": len(timings)}
+
+
+def bench(actions=40, repick_every=3):
+    session = AppSession()
+    cold = session.open()
+    timings = {"select": [session.select(PICKS[0])], "move": [], "item": [], "forfeit": []}
+    timings.update({f"{kind}_fragment": [] for kind in ("move", "item", "forfeit")})
+    battles = steps = 0
+    while steps < actions:
+        if session.battle_over:
+            timings["forfeit"].append(session.forfeit())
+            timings["forfeit_fragment"].append(session.fragment_s)
+            battles += 1
+            if battles % repick_every == 0:
+                timings["select"].append(session.select(PICKS[battles // repick_every % len(PICKS)]))
+            continue
+        # an item every third action while there are items left, moves otherwise
+        elapsed = session.item() if steps % 3 == 2 else None
+        kind = "move" if elapsed is None else "item"
+        timings[kind].append(session.move() if elapsed is None else elapsed)
+        timings[f"{kind}_fragment"].append(session.fragment_s)
+        steps += 1
+    result = {"cold_start_ms": cold * 1000, "actions": actions}
+    for kind, values in timings.items():
+        for key, value in _summary(values).items():
+            result[f"{kind}_{key}"] = value
+    # kept under their old names so earlier results stay comparable
+    result["rerun_median_ms"], result["rerun_p95_ms"] = result["move_median_ms"], result["move_p95_ms"]
+    return result
+
+
+def offline_env(tmp):
+    """Point the app at a fresh synthetic snapshot and a manifest of it in `tmp`, as a deployment ships;
+    call before the app's modules are imported."""
+    # they read these at import time
+    os.environ["POKEMON_SNAPSHOT"] = os.path.join(tmp, "snapshot.sqlite3")
+    os.environ["POKEMON_SPRITE_CACHE"] = os.path.join(tmp, "sprites")
+    os.environ["POKEMON_MANIFEST"] = os.path.join(tmp, "roster_manifest.json")
+    build_fixture_snapshot(tmp)
+    build_fixture_manifest(tmp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=int, default=40)
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args(argv)
+    # for the fragment timings; read when metrics is first imported, which offline_env does
+    os.environ["POKEMON_METRICS"] = "1"
+    with tempfile.TemporaryDirectory() as tmp:
+        offline_env(tmp)
+        result = bench(args.actions)
+    report(result, args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
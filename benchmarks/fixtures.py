@@ -0,0 +1,106 @@
+# benchmarks/fixtures.py
+"""Synthetic, deterministic PokeAPI fixtures so benchmarks run anywhere (no network, no recorded data).
+
+Documents have the same shape as real /pokemon/{name} responses, including a long `moves` array, and
+every move they reference has a /move/{name} document with a type, power and accuracy. `report` prints
+a benchmark's result and optionally saves it for run_benchmarks.py.
+"""
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+UPSTREAM = "https://pokeapi.co/api/v2"
+STATS = ("hp", "attack", "defense", "special-attack", "special-defense", "speed")
+TYPES = ("normal", "fire", "water", "grass", "electric", "ice", "fighting", "poison", "ground",
+         "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy")
+MOVE_IDS = range(1, 400)
+
+
+def synthetic_pokemon(i, rng, moves=80):
+    name = f"mon{i}"
+    return {
+        "id": i,
+        "name": name,
+        "stats": [{"base_stat": rng.randint(20, 150), "effort": 0, "stat": {"name": s, "url": ""}} for s in STATS],
+        "types": [{"slot": 1, "type": {"name": rng.choice(TYPES), "url": ""}}],
+        "moves": [
+            {"move": {"name": f"move-{m}", "url": f"{UPSTREAM}/move/{m}/"}, "version_group_details": []}
+            for m in rng.sample(MOVE_IDS, moves)
+        ],
+        "sprites": {"front_default": None, "other": {"official-artwork": {"front_default": None}}},
+    }
+
+
+def synthetic_move(m, rng):
+    status = rng.random() < 0.15  # status moves have no power, like Growl
+    return {
+        "id": m,
+        "name": f"move-{m}",
+        "type": {"name": rng.choice(TYPES), "url": ""},
+        "power": None if status else rng.choice((20, 40, 50, 60, 70, 80, 90, 100, 120)),
+        "accuracy": None if status else rng.choice((70, 80, 85, 90, 95, 100, 100, 100)),
+        "damage_class": {"name": "status" if status else "physical", "url": ""},
+    }
+
+
+def write_synthetic_fixtures(directory, count=151, seed=0):
+    """Write `count` synthetic species (and their moves) in fixture_server's layout. Returns `directory`."""
+    rng = random.Random(seed)
+    for sub in ("pokemon", "move"):
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+    move_rng = random.Random(seed + 1)
+    for m in MOVE_IDS:
+        doc = synthetic_move(m, move_rng)
+        for key in (doc["name"], str(m)):
+            with open(os.path.join(directory, "move", f"{key}.json"), "w") as f:
+                json.dump(doc, f, separators=(",", ":"))
+    entries = []
+    for i in range(1, count + 1):
+        doc = synthetic_pokemon(i, rng)
+        entries.append({"name": doc["name"], "url": f"{UPSTREAM}/pokemon/{i}/"})
+        for key in (doc["name"], str(i)):
+            with open(os.path.join(directory, "pokemon", f"{key}.json"), "w") as f:
+                json.dump(doc, f, separators=(",", ":"))
+    with open(os.path.join(directory, "list.json"), "w") as f:
+        json.dump(entries, f)
+    return directory
+
+
+def build_fixture_snapshot(workdir, count=151):
+    """Synthetic fixtures -> local fixture server -> snapshot file. Returns the snapshot path."""
+    import pokeapi
+    import snapshot
+    from fixture_server import FixtureServer
+
+    fixtures = write_synthetic_fixtures(os.path.join(workdir, "fixtures"), count)
+    path = os.path.join(workdir, "snapshot.sqlite3")
+    with FixtureServer(fixtures) as server:
+        old_base, pokeapi.POKEAPI_BASE = pokeapi.POKEAPI_BASE, server.base_url
+        try:
+            snapshot.build_snapshot(path, limit=count)
+        finally:
+            pokeapi.POKEAPI_BASE = old_base
+    return path
+
+
+def build_fixture_manifest(workdir, count=151):
+    """Roster manifest, records included, of the snapshot POKEMON_SNAPSHOT points at. Returns its path."""
+    import manifest
+
+    path = os.path.join(workdir, "roster_manifest.json")
+    manifest.save_manifest(manifest.build_manifest(count), path)
+    return path
+
+
+def report(result, json_path=None):
+    """Print a benchmark result dict; also write it to `json_path` as JSON when given."""
+    for key, value in result.items():
+        print(f"{key:>24}: {value:.2f}" if isinstance(value, float) else f"{key:>24}: {value}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(result, f, indent=2)
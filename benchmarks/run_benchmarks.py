@@ -0,0 +1,111 @@
+# benchmarks/run_benchmarks.py
+"""Run the benchmark suites and keep their results as JSON, to compare commits.
+
+    python benchmarks/run_benchmarks.py                      # all suites -> benchmarks/results/<commit>.json
+    python benchmarks/run_benchmarks.py --suites micro rerun --out before.json
+    python benchmarks/run_benchmarks.py compare before.json after.json
+
+Every suite runs in its own interpreter (the app's modules read their configuration at import time, and
+the suites configure them differently): micro (bench_micro), rerun (bench_rerun), load (bench_load),
+cold (bench_cold) and memory (bench_memory). `compare` prints each metric of both files with the relative
+change and marks the ones that got worse by more than --threshold; lower is better for everything except
+throughput.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import ROOT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SUITES = {
+    "micro": ["bench_micro.py"],
+    "rerun": ["bench_rerun.py", "--actions", "40"],
+    "load": ["bench_load.py", "--sessions", "20", "--actions", "10"],
+    "cold": ["bench_cold.py", "--repeat", "5"],
+    "memory": ["bench_memory.py"],
+}
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def run_suites(names):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            path = os.path.join(tmp, f"{name}.json")
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(HERE, SUITES[name][0]), *SUITES[name][1:], "--json", path],
+                           cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            with open(path) as f:
+                results[name] = json.load(f)
+            print(f"{name}: {time.perf_counter() - start:.0f}s", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=0.10):
+    """Rows of (suite.metric, old, new, relative change, regressed) for the metrics both runs have."""
+    rows = []
+    for suite, metrics in new["results"].items():
+        for key, value in metrics.items():
+            before = old["results"].get(suite, {}).get(key)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+                continue
+            change = (value - before) / before
+            worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+            rows.append((f"{suite}.{key}", before, value, change, worse > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "compare"])
+    parser.add_argument("files", nargs="*", help="compare: the old and the new result file")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="compare: relative change that counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs two result files")
+        with open(args.files[0]) as f:
+            old = json.load(f)
+        with open(args.files[1]) as f:
+            new = json.load(f)
+        print(f"{old['commit']} -> {new['commit']}")
+        rows = compare(old, new, args.threshold)
+        for name, before, after, change, regressed in rows:
+            print(f"{name:>40}  {before:>12.2f}  {after:>12.2f}  {change:>+7.1%}{'  REGRESSED' if regressed else ''}")
+        return 1 if any(r[4] for r in rows) else 0
+
+    result = run_suites(args.suites)
+    out = args.out or os.path.join(HERE, "results", f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# effects.py
+"""Client-side effects for engine events: sounds are scheduled in the browser, never on the server.
+
+The server turns a batch of engine events into a timeline of cues (`schedule`) and hands it to one
+invisible st.html block (`render`), which plays the preloaded sounds with setTimeout. The script thread
+never sleeps and no st.audio widgets pile up, so a turn finishes as soon as the engine is done.
+"""
+import json
+
+import streamlit as st
+
+# NOTE: These are example public audio URLs. If one fails you can replace with other hosted audio files.
+SOUNDS = {
+    "attack": "https://freesound.org/data/previews/341/341695_6266573-lq.mp3",
+    "hit": "https://freesound.org/data/previews/66/66073_931655-lq.mp3",
+    "faint": "https://freesound.org/data/previews/331/331912_3248244-lq.mp3",
+    "win": "https://freesound.org/data/previews/331/331912_3248244-lq.mp3",
+}
+
+# event type -> [(offset ms, sound)], and how long the event holds the timeline before the next one
+EVENT_CUES = {
+    "attack": ([(0, "attack"), (150, "hit")], 350),
+    "faint": ([(0, "faint")], 400),
+    "win": ([(0, "win")], 0),
+}
+CPU_THINK_MS = 600  # pause before the CPU's reply, as the old blocking sleep did
+
+
+def schedule(events):
+    """Timeline of {"at": ms, "sound": name} cues for a batch of engine events."""
+    cues, t = [], 0
+    for event in events:
+        if event["type"] == "cpu_turn":
+            t += CPU_THINK_MS
+            continue
+        spec = EVENT_CUES.get(event["type"])
+        if spec is None:
+            continue
+        offsets, hold = spec
+        cues += [{"at": t + dt, "sound": sound} for dt, sound in offsets]
+        t += hold
+    return cues
+
+
+_PLAYER = """
+<script>
+(function () {
+  const sounds = %(sounds)s, cues = %(cues)s;
+  // keep one preloaded Audio per sound on the page so reruns don't download them again
+  const bank = window.__pokemonSounds = window.__pokemonSounds || {};
+  for (const [name, url] of Object.entries(sounds)) {
+    if (!bank[name]) { bank[name] = new Audio(url); bank[name].preload = "auto"; }
+  }
+  for (const cue of cues) {
+    setTimeout(() => {
+      const a = bank[cue.sound].cloneNode();
+      a.play().catch(() => {});
+    }, cue.at);
+  }
+})();
+</script>
+<!-- %(seq)s -->
+"""
+
+
+def render(cues, seq=0):
+    """Emit the (invisible) player for `cues`; `seq` makes an identical cue list play again."""
+    # st.html runs the script on the page itself (no iframe per call, unlike components.html)
+    st.html(_PLAYER % {"sounds": json.dumps(SOUNDS), "cues": json.dumps(cues), "seq": seq},
+            unsafe_allow_javascript=True)
@@ -0,0 +1,407 @@
+# engine.py
+"""Headless battle engine: the game rules from the Streamlit app with no UI, sleeps or global state.
+
+    battle = Battle({"player1": Combatant.from_record(a), "opponent": Combatant.from_record(b, items={})},
+                    cpu_slot="opponent", seed=42)
+    events = battle.step(("move", "Tackle"))
+
+Actions are tuples: ("move", move_name), ("item", item_name) or ("forfeit",). `step` applies the action
+for the slot whose turn it is (plus the CPU's reply when the other slot is CPU controlled) and returns
+the events that happened, which the UI turns into log lines, sounds and animations.
+
+Each move hits with its own power, type and accuracy (moves.py): the multiplier is a lookup in the
+precomputed type chart, and a miss is decided by a separate roll before the damage roll.
+"""
+import random
+
+from moves import NEUTRAL_MOVE, hit_chance, multiplier, type_effectiveness
+
+STARTING_ITEMS = {"Potion": 3, "Shield": 1, "Power Boost": 1}
+MULTIPLAYER_ITEMS = {"Potion": 2, "Shield": 1, "Power Boost": 1}
+RESTART_ITEMS = {"Potion": 2, "Shield": 1, "Power Boost": 1}
+
+POWER_BOOST = 1.5
+SHIELD_FACTOR = 0.6  # shield reduces damage by 40%
+POTION_HEAL = 0.35
+VICTORY_BONUS_XP = 30
+# stat multipliers per level up: (attack, defense, max_hp)
+LEVEL_UP_GROWTH = (1.08, 1.07, 1.12)
+
+# every item there is, in the order Combatant.item_counts stores them
+ITEMS = ("Potion", "Shield", "Power Boost")
+ITEM_INDEX = {it: i for i, it in enumerate(ITEMS)}
+# Combatant.status bits (the same bits replay.py stores)
+SHIELDED = 1
+POWERED = 2
+# items that set a one-shot status: item -> (status bit, event type)
+STATUS_ITEMS = {"Shield": (SHIELDED, "shield"), "Power Boost": (POWERED, "power")}
+
+
+class InvalidAction(ValueError):
+    """Raised by Battle.step for actions that can't be taken right now."""
+
+
+def xp_threshold(level):
+    """XP needed to go from `level` to the next one."""
+    return 100 + (level - 1) * 40
+
+
+def calculate_damage(attacker, defender, power_mod=1.0, shield=False, rng=random, move=NEUTRAL_MOVE):
+    """Damage formula: base = atk - defense*0.28 + random(5..20), scaled by power_mod and the move's
+    multiplier (power, same-type bonus, type chart); floor 5, or 0 when the defender is immune."""
+    base = attacker.attack - (defender.defense * 0.28)
+    random_part = rng.randint(5, 20)
+    move_mod = multiplier(move, attacker.types, defender.types)
+    if move_mod == 0:
+        return 0
+    dmg = max(5, int((base + random_part) * power_mod * move_mod))
+    if shield:
+        dmg = int(dmg * SHIELD_FACTOR)
+    return dmg
+
+
+class Combatant:
+    """Mutable in-battle state of one pokemon.
+
+    `types` are moves.TYPES ids and `move_stats` the (type_id, power, accuracy) of each of `moves`;
+    both default to neutral, which plays exactly like the move-less rules.
+
+    A session keeps one of these per slot for as long as it lives, so the state is kept small: Shield /
+    Power Boost are one-shot bits of `status` (SHIELDED, POWERED) and the item counts one byte each in
+    ITEMS order. `items` is a dict view of the items it still has; `shield` and `power` read the bits.
+    """
+
+    __slots__ = ("name", "level", "xp", "attack", "defense", "max_hp", "hp", "moves", "sprite", "status",
+                 "item_counts", "types", "move_stats")
+
+    def __init__(self, name, level, xp, attack, defense, max_hp, hp, moves, sprite, items, types=(),
+                 move_stats=None):
+        self.name = name
+        self.level = level
+        self.xp = xp
+        self.attack = attack
+        self.defense = defense
+        self.max_hp = max_hp
+        self.hp = hp
+        self.moves = tuple(moves)
+        self.sprite = sprite
+        self.status = 0
+        self.items = items
+        self.types = tuple(types)
+        self.move_stats = tuple(tuple(m) for m in move_stats) if move_stats else (NEUTRAL_MOVE,) * len(self.moves)
+
+    @classmethod
+    def from_record(cls, record, name=None, level=5, items=STARTING_ITEMS):
+        """Fresh full-HP combatant from a records.PokemonRecord."""
+        return cls(name or record.name, level, 0, record.attack, record.defense, record.max_hp, record.max_hp,
+                   record.moves, record.sprite, items, record.types, record.move_stats)
+
+    @property
+    def items(self):
+        return {it: n for it, n in zip(ITEMS, self.item_counts) if n}
+
+    @items.setter
+    def items(self, items):
+        counts = bytearray(len(ITEMS))
+        for it, n in items.items():
+            if it not in ITEM_INDEX:
+                raise ValueError(f"Unknown item {it!r}; the items are {', '.join(ITEMS)}.")
+            counts[ITEM_INDEX[it]] = n
+        self.item_counts = counts
+
+    def item_count(self, item_name):
+        i = ITEM_INDEX.get(item_name)
+        return 0 if i is None else self.item_counts[i]
+
+    def take_item(self, item_name):
+        """Use up one `item_name`; False when there is none left."""
+        i = ITEM_INDEX.get(item_name)
+        if i is None or not self.item_counts[i]:
+            return False
+        self.item_counts[i] -= 1
+        return True
+
+    @property
+    def shield(self):
+        return bool(self.status & SHIELDED)  # next incoming hit is reduced
+
+    @property
+    def power(self):
+        return bool(self.status & POWERED)  # next outgoing hit is boosted
+
+    def to_dict(self):
+        """Snapshot of the current state (copies, so later turns don't change it)."""
+        return {"name": self.name, "level": self.level, "xp": self.xp, "attack": self.attack,
+                "defense": self.defense, "max_hp": self.max_hp, "hp": self.hp, "moves": list(self.moves),
+                "sprite": self.sprite, "items": self.items, "shield": self.shield, "power": self.power,
+                "types": list(self.types), "move_stats": [list(m) for m in self.move_stats]}
+
+    @classmethod
+    def from_dict(cls, d):
+        # logs written before moves had stats have no types / move_stats: neutral, as they were played
+        c = cls(d["name"], d["level"], d["xp"], d["attack"], d["defense"], d["max_hp"], d["hp"], d["moves"],
+                d["sprite"], d["items"], d.get("types", ()), d.get("move_stats"))
+        c.status = (SHIELDED if d["shield"] else 0) | (POWERED if d["power"] else 0)
+        return c
+
+    def copy(self):
+        c = Combatant(self.name, self.level, self.xp, self.attack, self.defense, self.max_hp, self.hp,
+                      self.moves, self.sprite, {}, self.types, self.move_stats)
+        c.status, c.item_counts = self.status, bytearray(self.item_counts)
+        return c
+
+    def move(self, move_name):
+        """(type_id, power, accuracy) of one of this pokemon's moves."""
+        return self.move_stats[self.moves.index(move_name)]
+
+    @property
+    def fainted(self):
+        return self.hp <= 0
+
+
+def hit_modifiers(attacker, defender):
+    """(power_mod, shielded) for a hit, consuming the attacker's Power Boost and the defender's Shield."""
+    power_mod = POWER_BOOST if attacker.status & POWERED else 1.0
+    shielded = bool(defender.status & SHIELDED)
+    attacker.status &= ~POWERED
+    defender.status &= ~SHIELDED
+    return power_mod, shielded
+
+
+def try_level_up(p, growth=LEVEL_UP_GROWTH):
+    """Level `p` up once if it has enough XP. Returns the level_up event or None."""
+    threshold = xp_threshold(p.level)
+    if p.xp < threshold:
+        return None
+    p.xp -= threshold
+    p.level += 1
+    # upgrade stats modestly
+    p.attack = int(p.attack * growth[0])
+    p.defense = int(p.defense * growth[1])
+    p.max_hp = int(p.max_hp * growth[2])
+    p.hp = p.max_hp
+    return {"type": "level_up", "name": p.name, "level": p.level}
+
+
+def auto_action(battle, policy=None):
+    """One engine action for the slot to move, chosen by a CPU policy (item use takes the turn)."""
+    item, move = (policy or battle.cpu_policy)(battle, battle.turn)
+    return ("item", item) if item else ("move", move)
+
+
+def random_cpu_policy(battle, slot):
+    """The classic CPU: sometimes use an item (18%), then a random move. Returns (item or None, move)."""
+    rng = battle.cpu_rng
+    me = battle.party[slot]
+    item = None
+    if rng.random() < 0.18 and any(me.item_counts):
+        # try potion if hp low, else 40% chance to use power boost
+        if me.hp < me.max_hp * 0.45 and me.item_count("Potion"):
+            item = "Potion"
+        elif me.item_count("Power Boost") and rng.random() < 0.4:
+            item = "Power Boost"
+    return item, rng.choice(me.moves)
+
+
+class Battle:
+    """One single-pokemon battle between two slots.
+
+    `party` maps the two slot names (turn order) to Combatants, which are mutated in place, so XP and
+    levels carry over when the UI starts a new battle with the same objects. `cpu_slot` names the slot
+    driven by `cpu_policy`; it replies immediately after every action of the other slot. `growth`
+    overrides the level-up stat multipliers (for balancing runs).
+
+    Damage rolls come from `rng`; CPU policies draw from `cpu_rng`, a separate stream derived from it,
+    so a battle can be replayed from its seed with the recorded CPU decisions in place of the policy.
+    Its seed is drawn up front but the generator (2.5 KB of state) is only made when a policy first asks,
+    so battles between two humans never hold one.
+    """
+
+    __slots__ = ("party", "slots", "cpu_slot", "cpu_policy", "growth", "seed", "rng", "turn", "winner", "_cpu_seed",
+                 "_cpu_rng", "_events")
+
+    def __init__(self, party, cpu_slot=None, seed=None, rng=None, cpu_policy=random_cpu_policy,
+                 growth=LEVEL_UP_GROWTH):
+        self.party = party
+        self.slots = tuple(party)
+        self.cpu_slot = cpu_slot
+        self.cpu_policy = cpu_policy
+        self.growth = growth
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+        self._cpu_seed = self.rng.getrandbits(64)
+        self._cpu_rng = None
+        self.turn = self.slots[0]
+        self.winner = None
+        self._events = None
+
+    @property
+    def cpu_rng(self):
+        if self._cpu_rng is None:
+            self._cpu_rng = random.Random(self._cpu_seed)
+        return self._cpu_rng
+
+    @property
+    def over(self):
+        return self.winner is not None
+
+    def other(self, slot):
+        return self.slots[1] if slot == self.slots[0] else self.slots[0]
+
+    def legal_actions(self, slot=None):
+        """Actions the slot to move (or `slot`) may take now."""
+        p = self.party[slot or self.turn]
+        actions = [("forfeit",)]
+        if not self.over:
+            actions += [("move", m) for m in p.moves]
+            actions += [("item", it) for it in p.items]
+        return actions
+
+    # -----------------------
+    # Rules
+    # -----------------------
+    def _emit(self, event):
+        self._events.append(event)
+
+    def _attack(self, attacker_slot, move_name, cpu=False):
+        attacker = self.party[attacker_slot]
+        defender_slot = self.other(attacker_slot)
+        defender = self.party[defender_slot]
+        power_mod, shielded = hit_modifiers(attacker, defender)
+
+        move = attacker.move(move_name)
+        # neutral moves never miss and skip the roll, so they consume the RNG exactly as before
+        missed = move[2] != 0 and self.rng.random() >= hit_chance(move)
+        dmg = 0 if missed else calculate_damage(attacker, defender, power_mod=power_mod, shield=shielded,
+                                                rng=self.rng, move=move)
+        defender.hp = max(0, defender.hp - dmg)
+        self._emit({"type": "attack", "slot": attacker_slot, "name": attacker.name, "target": defender.name,
+                    "move": move_name, "damage": dmg, "shielded": shielded, "cpu": cpu, "missed": missed,
+                    "effectiveness": type_effectiveness(move[0], defender.types)})
+
+        if defender.hp == 0:
+            self._emit({"type": "faint", "slot": defender_slot, "name": defender.name})
+            # winner XP
+            self._award_xp(attacker, 60 + defender.level * 8)
+            self._finish(attacker_slot)
+
+    def _award_xp(self, p, amount):
+        p.xp += amount
+        self._emit({"type": "xp", "name": p.name, "amount": amount})
+        event = try_level_up(p, self.growth)
+        if event:
+            self._emit(event)
+
+    def _finish(self, winner_slot):
+        self.winner = winner_slot
+        winner = self.party[winner_slot]
+        self._emit({"type": "win", "slot": winner_slot, "name": winner.name})
+        # match bonus for human players only
+        if winner_slot != self.cpu_slot:
+            self._award_xp(winner, VICTORY_BONUS_XP)
+
+    def _use_item(self, slot, item_name):
+        p = self.party[slot]
+        if not p.take_item(item_name):
+            self._emit({"type": "no_item", "name": p.name, "item": item_name})
+            return False
+        self._emit({"type": "item", "name": p.name, "item": item_name})
+        if item_name == "Potion":
+            heal_amount = int(p.max_hp * POTION_HEAL)
+            p.hp = min(p.max_hp, p.hp + heal_amount)
+            self._emit({"type": "heal", "name": p.name, "amount": heal_amount})
+        else:
+            bit, event = STATUS_ITEMS[item_name]
+            p.status |= bit
+            self._emit({"type": event, "name": p.name})
+        return True
+
+    def _cpu_turn(self):
+        item, move = self.cpu_policy(self, self.cpu_slot)
+        self._emit({"type": "cpu_turn", "slot": self.cpu_slot, "item": item, "move": move})
+        if item:
+            self._use_item(self.cpu_slot, item)
+        self._attack(self.cpu_slot, move, cpu=True)
+
+    def _reset(self):
+        for p in self.party.values():
+            p.hp = p.max_hp
+            p.items = RESTART_ITEMS
+            p.status = 0
+        self.winner = None
+        self._emit({"type": "reset"})
+
+    # -----------------------
+    # API
+    # -----------------------
+    def step(self, action):
+        """Apply `action` for the slot whose turn it is and return the resulting events."""
+        self._events = []
+        kind = action[0]
+        slot = self.turn
+        if kind == "forfeit":
+            self._reset()
+        elif self.over:
+            raise InvalidAction("The battle is over; forfeit to start a new match.")
+        elif kind == "move":
+            if action[1] not in self.party[slot].moves:
+                raise InvalidAction(f"{self.party[slot].name} doesn't know {action[1]}.")
+            self._attack(slot, action[1])
+            self._after_action(slot)
+        elif kind == "item":
+            self._use_item(slot, action[1])
+            self._after_action(slot)
+        else:
+            raise InvalidAction(f"Unknown action {action!r}.")
+        events, self._events = self._events, None
+        return events
+
+    def _after_action(self, slot):
+        if self.over:
+            return
+        if self.cpu_slot is not None and self.other(slot) == self.cpu_slot:
+            self._cpu_turn()
+        else:
+            self.turn = self.other(slot)
+
+
+# event types that format_event turns into a log line
+LOGGED_EVENTS = frozenset(("attack", "faint", "xp", "level_up", "win", "no_item", "item", "heal", "shield", "power"))
+
+
+def format_event(event):
+    """Battle-log line (markdown) for an engine event, or None for events that aren't logged."""
+    t = event["type"]
+    if t == "attack":
+        if event["cpu"]:
+            prefix = f"💥 CPU {event['name']}"
+        else:
+            prefix = f"⚔️ {event['name']}"
+        if event.get("missed"):
+            return f"{prefix} used **{event['move']}**, but it missed {event['target']}."
+        shield = " (reduced by Shield)" if event["shielded"] else ""
+        factor = event.get("effectiveness", 1.0)
+        if factor == 0:
+            return f"{prefix} used **{event['move']}**. It doesn't affect {event['target']}..."
+        note = " It's super effective!" if factor > 1 else " It's not very effective..." if factor < 1 else ""
+        return (f"{prefix} used **{event['move']}** and dealt **{event['damage']}** damage{shield} to "
+                f"{event['target']}.{note}")
+    if t == "faint":
+        return f"💀 {event['name']} fainted!"
+    if t == "xp":
+        return f"🏆 {event['name']} gains {event['amount']} XP."
+    if t == "level_up":
+        return f"✨ {event['name']} leveled up to {event['level']}! Stats increased."
+    if t == "win":
+        return f"🎉 {event['name']} won the battle!"
+    if t == "no_item":
+        return f"❌ {event['name']} has no {event['item']}s left."
+    if t == "item":
+        return f"🧪 {event['name']} used {event['item']}!"
+    if t == "heal":
+        return f"❤️ {event['name']} healed {event['amount']} HP."
+    if t == "shield":
+        return f"🛡 {event['name']} will take reduced damage next hit."
+    if t == "power":
+        return f"⚡ {event['name']}'s next attack will deal increased damage."
+    return None
@@ -0,0 +1,150 @@
+# fixture_server.py
+"""Local stand-in for pokeapi.co that serves recorded JSON fixtures.
+
+    python fixture_server.py record --dir fixtures --limit 151   # one-time, needs network
+    python fixture_server.py serve --dir fixtures --port 8765
+    POKEAPI_BASE=http://127.0.0.1:8765/api/v2 streamlit run app.py
+
+Fixtures are stored as `<dir>/list.json`, `<dir>/pokemon/<name>.json` and `<dir>/move/<name>.json`
+(only the moves the game uses). Upstream urls inside them are rewritten to point back at this server
+while serving.
+"""
+import argparse
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pokeapi
+import prefetch
+from records import move_keys
+
+UPSTREAM_BASE = "https://pokeapi.co/api/v2"
+
+
+def record_fixtures(directory, limit=pokeapi.GEN1_LIMIT, offset=0, workers=prefetch.DEFAULT_WORKERS):
+    """Save the list, every pokemon's details and the moves they use from the live API under `directory`."""
+    for sub in ("pokemon", "move"):
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+    entries = pokeapi.fetch_pokemon_list(limit, offset)
+    with open(os.path.join(directory, "list.json"), "w") as f:
+        json.dump(entries, f)
+    used_moves = set()
+    for entry, details in prefetch.iter_details(entries, workers=workers):
+        with open(os.path.join(directory, "pokemon", f"{entry['name']}.json"), "w") as f:
+            json.dump(details, f, separators=(",", ":"))
+        used_moves.update(move_keys(details))
+    move_entries = [{"name": m, "url": f"{pokeapi.POKEAPI_BASE}/move/{m}/"} for m in sorted(used_moves)]
+    for entry, details in prefetch.iter_details(move_entries, workers=workers):
+        with open(os.path.join(directory, "move", f"{entry['name']}.json"), "w") as f:
+            json.dump(details, f, separators=(",", ":"))
+    return len(entries)
+
+
+class FixtureServer:
+    """Threaded HTTP server over a fixture directory. `latency_s` adds a fixed delay per request."""
+
+    def __init__(self, directory, host="127.0.0.1", port=0, latency_s=0.0):
+        self.directory = directory
+        self.latency_s = latency_s
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v2"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency_s:
+                    threading.Event().wait(server.latency_s)
+                body = server.resolve(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = body.replace(UPSTREAM_BASE, server.base_url).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def resolve(self, path):
+        """JSON text for a request path, or None for a 404."""
+        url = urlparse(path)
+        parts = [p for p in url.path.split("/") if p]
+        if parts[:3] == ["api", "v2", "pokemon"]:
+            if len(parts) == 3:
+                query = parse_qs(url.query)
+                limit = int(query.get("limit", [20])[0])
+                offset = int(query.get("offset", [0])[0])
+                with open(os.path.join(self.directory, "list.json")) as f:
+                    entries = json.load(f)
+                return json.dumps({"count": len(entries), "results": entries[offset:offset + limit]})
+            if len(parts) == 4:
+                return self._document("pokemon", parts[3])
+        if parts[:3] == ["api", "v2", "move"] and len(parts) == 4:
+            return self._document("move", parts[3])
+        return None
+
+    def _document(self, kind, key):
+        fname = os.path.join(self.directory, kind, f"{os.path.basename(key.lower())}.json")
+        if os.path.exists(fname):
+            with open(fname) as f:
+                return f.read()
+        return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or serve PokeAPI fixtures.")
+    parser.add_argument("command", choices=["record", "serve"])
+    parser.add_argument("--dir", default="fixtures")
+    parser.add_argument("--limit", type=int, default=pokeapi.GEN1_LIMIT)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial per-request delay in seconds")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        print(f"recorded {record_fixtures(args.dir, args.limit)} pokemon into {args.dir}")
+    else:
+        server = FixtureServer(args.dir, port=args.port, latency_s=args.latency)
+        print(f"serving {args.dir} at {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
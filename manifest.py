@@ -0,0 +1,112 @@
+# manifest.py
+"""Roster manifest: the playable species list (and optionally their compact records) in one small file.
+
+The app reads the roster from the manifest before anything else, so the first page renders without
+opening the snapshot or calling PokeAPI. The bundled roster_manifest.json lists the first generation
+by name only; a manifest built with records lets the app warm its pokemon cache with no requests:
+
+    python manifest.py build                     # from the snapshot (or PokeAPI), records included
+    python manifest.py build --generations 1-3 --names-only
+    python manifest.py info
+
+POKEMON_MANIFEST selects another file; set it to an empty string to go without one.
+"""
+import argparse
+import json
+import os
+
+from records import PokemonRecord
+
+DEFAULT_PATH = os.environ.get("POKEMON_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "roster_manifest.json"))
+VERSION = 1
+
+
+class RosterManifest:
+    """Species as (dex id, name) in dex order, plus name -> PokemonRecord for the ones it has records of."""
+
+    def __init__(self, pokemon, records=None):
+        self.pokemon = [(int(i), name) for i, name in pokemon]
+        self.records = dict(records or {})
+
+    def covers(self, limit):
+        """Whether the manifest lists every species up to national dex number `limit`."""
+        return len(self.pokemon) >= limit and self.pokemon[limit - 1][0] == limit
+
+    def entries(self, base_url, limit=None):
+        """List entries shaped like the PokeAPI list `results` (name + url), the first `limit` of them."""
+        return [{"name": name, "url": f"{base_url}/pokemon/{i}/"} for i, name in self.pokemon[:limit]]
+
+    def record(self, name):
+        """The bundled record for `name`, or None."""
+        return self.records.get(name.lower())
+
+    def to_dict(self):
+        return {"version": VERSION, "pokemon": [list(p) for p in self.pokemon],
+                "records": {name: r.to_dict() for name, r in self.records.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["pokemon"], {name: PokemonRecord.from_dict(r) for name, r in d.get("records", {}).items()})
+
+
+def load_manifest(path=DEFAULT_PATH):
+    """The manifest at `path`, or None when there is none (or it can't be read)."""
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != VERSION:
+        return None
+    return RosterManifest.from_dict(data)
+
+
+def save_manifest(manifest, path=DEFAULT_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest.to_dict(), f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def build_manifest(limit, with_records=True):
+    """Manifest of the first `limit` species, from the offline snapshot when there is one, else PokeAPI."""
+    from records import load_roster_records
+    from roster import dex_id
+    from snapshot import open_snapshot
+
+    store = open_snapshot()
+    entries = store.list_pokemon(limit) if store is not None else []
+    if len(entries) < limit:
+        import pokeapi
+
+        entries = pokeapi.fetch_pokemon_list(limit)
+    records = {r.name: r for r in load_roster_records(limit)} if with_records else {}
+    return RosterManifest([(dex_id(e), e["name"]) for e in entries], records)
+
+
+def main(argv=None):
+    from roster import DEFAULT_GENERATIONS, dex_limit, parse_generations
+
+    parser = argparse.ArgumentParser(description="Build or inspect the roster manifest.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--generations", default=DEFAULT_GENERATIONS)
+    parser.add_argument("--names-only", action="store_true", help="leave out the records")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        manifest = build_manifest(dex_limit(parse_generations(args.generations)), not args.names_only)
+        save_manifest(manifest, args.path)
+    else:
+        manifest = load_manifest(args.path)
+        if manifest is None:
+            parser.error(f"no manifest at {args.path}")
+    print(f"{args.path}: {len(manifest.pokemon)} species, {len(manifest.records)} records, "
+          f"{os.path.getsize(args.path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
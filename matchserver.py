@@ -0,0 +1,719 @@
+# matchserver.py
+"""Server-authoritative online battles: an asyncio WebSocket server that owns every Battle.
+
+Clients only send intents; the server validates them against the engine (whose turn it is, legal
+moves and items), steps the battle and pushes the resulting state diff and events to both players.
+Players wait in named matchmaking queues and are paired first come, first served. A player who drops
+can resume with the match token until the match has been idle for `idle_timeout_s`, after which it
+is evicted (and stored in the replay archive when one is configured).
+
+    python matchserver.py serve --port 8766 --replays online.pkr
+    POKEMON_MATCH_SERVER=ws://127.0.0.1:8766 streamlit run app.py       # "Online Multiplayer" mode
+    python matchserver.py load --matches 2000 --turns 20 --think-ms 1000  # throughput and p99 turn latency
+
+Protocol (JSON text frames):
+
+    -> {"op": "roster"}                                   <- {"op": "roster", "names": [...]}
+    -> {"op": "queue", "pokemon": "pikachu", "queue": "default"}
+                                                          <- {"op": "queued"}, later
+                                                          <- {"op": "matched", "match", "slot", "token", "state"}
+    -> {"op": "action", "action": ["move", "Thunder Shock"]}
+                                                          <- {"op": "update", "rev", "by", "diff", "events"} (both)
+    -> {"op": "resume", "match": id, "token": token}      <- {"op": "matched", ...} with the current state
+    -> {"op": "leave"}                                    <- {"op": "closed", "reason"} (both)
+    <- {"op": "error", "message": "..."} for anything rejected
+
+A socket plays one match at a time: it can't queue while queued or seated, nor resume into a second
+match. ["forfeit"] during a battle concedes it (the match closes with reason "forfeit" and the other
+slot as "winner"); once the battle is over it restarts it.
+
+`state` is {"turn", "winner", "party": {slot: combatant fields}} and a diff carries only the fields
+that changed, in the same shape.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import random
+import secrets
+import statistics
+import threading
+import time
+import weakref
+
+import metrics
+from engine import MULTIPLAYER_ITEMS, Battle, Combatant, InvalidAction
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+DEFAULT_URL = os.environ.get("POKEMON_MATCH_SERVER", f"ws://{DEFAULT_HOST}:{DEFAULT_PORT}")
+IDLE_TIMEOUT_S = 300.0
+SWEEP_INTERVAL_S = 5.0
+SLOTS = ("player1", "player2")
+# combatant fields clients see; stats are included so the UI can show them, but only the server changes them
+PUBLIC_FIELDS = ("name", "level", "xp", "attack", "defense", "max_hp", "hp", "moves", "sprite", "items", "shield",
+                 "power")
+
+
+def _dumps(msg):
+    return json.dumps(msg, separators=(",", ":"))
+
+
+def match_state(battle):
+    """Client-visible state of a battle (plain JSON types)."""
+    party = {}
+    for slot, p in battle.party.items():
+        d = {f: getattr(p, f) for f in PUBLIC_FIELDS}
+        d["moves"] = list(p.moves)
+        party[slot] = d
+    return {"turn": battle.turn, "winner": battle.winner, "party": party}
+
+
+def state_diff(old, new):
+    """The parts of `new` that differ from `old`, in the same nested shape (see apply_diff)."""
+    diff = {k: new[k] for k in ("turn", "winner") if old[k] != new[k]}
+    party = {}
+    for slot, fields in new["party"].items():
+        changed = {f: v for f, v in fields.items() if old["party"][slot][f] != v}
+        if changed:
+            party[slot] = changed
+    if party:
+        diff["party"] = party
+    return diff
+
+
+def apply_diff(state, diff):
+    """Update a client-side `state` in place with a server diff."""
+    for k in ("turn", "winner"):
+        if k in diff:
+            state[k] = diff[k]
+    for slot, fields in diff.get("party", {}).items():
+        state["party"][slot].update(fields)
+    return state
+
+
+# -----------------------
+# Server
+# -----------------------
+class Match:
+    """One live battle and the two connections playing it."""
+
+    __slots__ = ("id", "battle", "conns", "tokens", "rev", "state", "last_active", "start", "actions")
+
+    def __init__(self, match_id, battle):
+        self.id = match_id
+        self.battle = battle
+        self.conns = dict.fromkeys(SLOTS)
+        self.tokens = {slot: secrets.token_hex(8) for slot in SLOTS}
+        self.rev = 0
+        self.state = match_state(battle)
+        self.last_active = time.monotonic()
+        self.start = {slot: p.to_dict() for slot, p in battle.party.items()}  # for the replay archive
+        self.actions = []
+
+    def connected(self):
+        return [ws for ws in self.conns.values() if ws is not None]
+
+
+class MatchServer:
+    """Matchmaking, validation and state fan-out for many concurrent matches on one event loop.
+
+    `load_record(name)` returns a records.PokemonRecord (blocking calls run in a worker thread) and
+    `roster` is the list of species players may pick; both default to the snapshot / PokeAPI roster.
+    """
+
+    def __init__(self, load_record=None, roster=None, idle_timeout_s=IDLE_TIMEOUT_S,
+                 sweep_interval_s=SWEEP_INTERVAL_S, replays=None, seed=None, items=MULTIPLAYER_ITEMS):
+        self._load_record = load_record or default_record_loader()
+        self._roster = roster
+        self.idle_timeout_s = idle_timeout_s
+        self.sweep_interval_s = sweep_interval_s
+        self.items = dict(items)
+        self.rng = random.Random(seed)
+        self.replays = None
+        if replays:
+            from replay import ReplayWriter
+
+            self.replays = ReplayWriter(replays)
+        self.matches = {}
+        self.queues = collections.defaultdict(collections.OrderedDict)  # queue -> ws -> Combatant
+        self.sessions = {}  # ws -> (match, slot)
+        self.records = {}
+        self._ids = itertools.count(1)
+        self.counters = collections.Counter()
+
+    # -----------------------
+    # Data
+    # -----------------------
+    async def roster(self):
+        if self._roster is None:
+            self._roster = await asyncio.to_thread(default_roster)
+        return self._roster
+
+    async def record(self, name):
+        rec = self.records.get(name)
+        if rec is None:
+            rec = self.records[name] = await asyncio.to_thread(self._load_record, name)
+        return rec
+
+    # -----------------------
+    # Connections
+    # -----------------------
+    async def handler(self, ws):
+        """websockets connection handler: one task per client."""
+        try:
+            async for raw in ws:
+                try:
+                    msg = json.loads(raw)
+                    reply = await self.dispatch(ws, msg)
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {"op": "error", "message": f"bad request: {e}"}
+                if reply is not None:
+                    await ws.send(_dumps(reply))
+        finally:
+            self.disconnect(ws)
+
+    async def dispatch(self, ws, msg):
+        op = msg["op"]
+        if op == "action":
+            return self.act(ws, tuple(msg["action"]))
+        if op == "queue":
+            species, queue = msg["pokemon"], msg.get("queue", "default")
+            if not isinstance(species, str) or not isinstance(queue, str):
+                return {"op": "error", "message": "bad request: pokemon and queue must be strings"}
+            return await self.enqueue(ws, species.lower(), queue)
+        if op == "resume":
+            return self.resume(ws, msg["match"], msg["token"])
+        if op == "leave":
+            for waiting in self.queues.values():
+                waiting.pop(ws, None)
+            session = self.sessions.get(ws)
+            if session is not None:
+                self.close_match(session[0], "left")
+            return None
+        if op == "roster":
+            return {"op": "roster", "names": await self.roster()}
+        return {"op": "error", "message": f"unknown op {op!r}"}
+
+    def disconnect(self, ws):
+        """Forget a closed connection; its match stays resumable until it goes idle."""
+        for waiting in self.queues.values():
+            waiting.pop(ws, None)
+        session = self.sessions.pop(ws, None)
+        if session is not None:
+            match, slot = session
+            if match.conns[slot] is ws:
+                match.conns[slot] = None
+
+    # -----------------------
+    # Matchmaking
+    # -----------------------
+    def _queued(self, ws):
+        return any(ws in waiting for waiting in self.queues.values())
+
+    async def enqueue(self, ws, species, queue):
+        if ws in self.sessions:
+            return {"op": "error", "message": "already in a match"}
+        if self._queued(ws):
+            return {"op": "error", "message": "already queued; leave first"}
+        try:
+            if species not in set(await self.roster()):
+                return {"op": "error", "message": f"{species} is not in the roster"}
+            record = await self.record(species)
+        except Exception as e:  # PokeAPIError or whatever the loader raises; the connection stays up
+            return {"op": "error", "message": f"couldn't load {species}: {e}"}
+        combatant = Combatant.from_record(record, name=species.title(), items=self.items)
+        waiting = self.queues[queue]
+        if self._queued(ws) or ws in self.sessions:
+            # it joined elsewhere while its record was loading
+            return {"op": "error", "message": "already queued; leave first"}
+        if not waiting:
+            waiting[ws] = combatant
+            return {"op": "queued", "queue": queue}
+        other, other_combatant = waiting.popitem(last=False)
+        self.start_match((other, other_combatant), (ws, combatant))
+        return None
+
+    def start_match(self, first, second):
+        battle = Battle({SLOTS[0]: first[1], SLOTS[1]: second[1]}, seed=self.rng.getrandbits(32))
+        match = Match(next(self._ids), battle)
+        self.matches[match.id] = match
+        self.counters["matches_started"] += 1
+        for slot, (ws, _) in zip(SLOTS, (first, second)):
+            self._bind(match, slot, ws)
+
+    def _bind(self, match, slot, ws):
+        match.conns[slot] = ws
+        self.sessions[ws] = (match, slot)
+        self._send(ws, {"op": "matched", "match": match.id, "slot": slot, "token": match.tokens[slot],
+                        "rev": match.rev, "state": match.state})
+
+    def resume(self, ws, match_id, token):
+        match = self.matches.get(match_id)
+        slot = next((s for s, t in match.tokens.items() if t == token), None) if match else None
+        if slot is None:
+            return {"op": "error", "message": "no such match (it may have been evicted)"}
+        seated = self.sessions.get(ws)
+        if seated is not None and seated[0] is not match:
+            return {"op": "error", "message": "already in another match"}
+        if self._queued(ws):
+            return {"op": "error", "message": "already queued; leave first"}
+        old = match.conns[slot]
+        if old is not None and old is not ws:
+            self.sessions.pop(old, None)
+        self._bind(match, slot, ws)
+        return None
+
+    # -----------------------
+    # Play
+    # -----------------------
+    def act(self, ws, action):
+        session = self.sessions.get(ws)
+        if session is None:
+            return {"op": "error", "message": "not in a match"}
+        match, slot = session
+        battle = match.battle
+        if action == ("forfeit",) and not battle.over:
+            # conceding: either player may, at any time, and the other one wins
+            self.close_match(match, "forfeit", winner=battle.other(slot))
+            return None
+        # once the battle is over either player may restart it; everything else only on your own turn
+        if action != ("forfeit",):
+            if battle.turn != slot:
+                self.counters["rejected"] += 1
+                return {"op": "error", "message": "not your turn"}
+            if action not in battle.legal_actions(slot):
+                self.counters["rejected"] += 1
+                return {"op": "error", "message": f"illegal action {list(action)}"}
+        try:
+            with metrics.span("engine.step"):
+                events = battle.step(action)
+        except InvalidAction as e:
+            self.counters["rejected"] += 1
+            return {"op": "error", "message": str(e)}
+        self.counters["actions"] += 1
+        match.actions.append(action)
+        match.last_active = time.monotonic()
+        new_state = match_state(battle)
+        diff = state_diff(match.state, new_state)
+        match.state = new_state
+        match.rev += 1
+        self._broadcast(match, {"op": "update", "match": match.id, "rev": match.rev, "by": slot, "diff": diff,
+                                "events": events})
+        return None
+
+    def _send(self, ws, msg):
+        from websockets.asyncio.server import broadcast
+
+        broadcast([ws], _dumps(msg))
+
+    def _broadcast(self, match, msg):
+        from websockets.asyncio.server import broadcast
+
+        # broadcast() writes without awaiting, so one slow client never holds up the other or the loop
+        broadcast(match.connected(), _dumps(msg))
+
+    def close_match(self, match, reason, winner=None):
+        """Close a match; `winner` is the slot credited with it when it didn't end in the battle (a concession)."""
+        if self.matches.pop(match.id, None) is None:
+            return
+        self.counters[f"matches_{reason}"] += 1
+        self._broadcast(match, {"op": "closed", "match": match.id, "reason": reason, "winner": winner})
+        for ws in match.connected():
+            self.sessions.pop(ws, None)
+        if self.replays is not None and match.actions:
+            self.replays.add({"seed": match.battle.seed, "cpu_slot": None, "growth": match.battle.growth,
+                              "party": match.start, "actions": match.actions, "cpu": [],
+                              "winner": match.battle.winner})
+
+    def evict_idle(self, now=None):
+        """Close matches nobody has acted in for idle_timeout_s. Returns how many were evicted."""
+        cutoff = (now or time.monotonic()) - self.idle_timeout_s
+        idle = [m for m in self.matches.values() if m.last_active < cutoff]
+        for match in idle:
+            self.close_match(match, "idle")
+        return len(idle)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_s)
+            self.evict_idle()
+
+    def stats(self):
+        return {"matches": len(self.matches), "waiting": sum(len(q) for q in self.queues.values()),
+                "players": len(self.sessions), **self.counters}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """Run until cancelled. `ready(port)` is called once the socket is listening."""
+        from websockets.asyncio.server import serve
+
+        sweeper = asyncio.create_task(self._sweep())
+        try:
+            async with serve(self.handler, host, port, compression=None, max_queue=64) as server:
+                if ready is not None:
+                    ready(server.sockets[0].getsockname()[1])
+                await asyncio.Future()
+        finally:
+            sweeper.cancel()
+            if self.replays is not None:
+                self.replays.close()
+
+
+def default_roster():
+    """Species names of the configured generations, from the snapshot when it covers them."""
+    import pokeapi
+    from roster import dex_limit, filter_entries, parse_generations
+    from snapshot import open_snapshot
+
+    gens = parse_generations()
+    limit = dex_limit(gens)
+    store = open_snapshot()
+    entries = store.list_pokemon(limit) if store is not None else []
+    if len(entries) < limit:
+        entries = pokeapi.fetch_pokemon_list(limit)
+    return [e["name"] for e in filter_entries(entries, gens)]
+
+
+def default_record_loader():
+    """name -> PokemonRecord from the snapshot (or PokeAPI), with its move stats."""
+    import pokeapi
+    from records import project_records
+    from snapshot import open_snapshot
+
+    store = open_snapshot()
+
+    def load(name):
+        doc = store.get(name) if store is not None else None
+        if doc is None:
+            doc = pokeapi.fetch_pokemon(name)
+        record = project_records([doc], store)[0]
+        if record is None:
+            raise RuntimeError(f"couldn't load the moves of {name}")
+        return record
+
+    return load
+
+
+# -----------------------
+# Client (for Streamlit sessions)
+# -----------------------
+class MatchClient:
+    """Blocking client with a reader thread; the UI polls `view()` on every rerun.
+
+    One per Streamlit session. The reader applies pushed diffs to a local copy of the match state, so
+    a rerun only reads memory and never waits on the network. The reader thread only holds a weak
+    reference, so a client its session dropped without close() is collected, and that closes the socket.
+    """
+
+    def __init__(self, url=DEFAULT_URL, open_timeout=3.0, log_size=50):
+        from websockets.sync.client import connect
+
+        self.url = url
+        self._ws = connect(url, open_timeout=open_timeout, compression=None)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.status = "idle"  # idle, queued, playing, closed
+        self.slot = None
+        self.match = None
+        self.token = None
+        self.state = None
+        self.error = None
+        self.closed_reason = None
+        self.closed_winner = None
+        self.events = collections.deque(maxlen=log_size)
+        self.rev = 0
+        self._finalizer = weakref.finalize(self, self._ws.close)
+        self._thread = threading.Thread(target=MatchClient._read, args=(weakref.ref(self), self._ws),
+                                        name="match-client", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _read(ref, ws):
+        from websockets.exceptions import ConnectionClosed
+
+        try:
+            for raw in ws:
+                client = ref()
+                if client is None:
+                    return
+                client._handle(json.loads(raw))
+                del client
+        except ConnectionClosed:
+            pass
+        client = ref()
+        if client is None:
+            return
+        with client._lock:
+            if client.status != "closed":
+                client.status, client.closed_reason = "closed", "disconnected"
+            client._changed.notify_all()
+
+    def _handle(self, msg):
+        op = msg["op"]
+        with self._lock:
+            if op == "queued":
+                self.status = "queued"
+            elif op == "matched":
+                self.status, self.slot, self.match, self.token = "playing", msg["slot"], msg["match"], msg["token"]
+                self.state, self.rev = msg["state"], msg["rev"]
+            elif op == "update" and self.state is not None:
+                apply_diff(self.state, msg["diff"])
+                self.rev = msg["rev"]
+                self.events.extend(msg["events"])
+            elif op == "closed":
+                self.status, self.closed_reason, self.closed_winner = "closed", msg["reason"], msg.get("winner")
+            elif op == "error":
+                self.error = msg["message"]
+            self._changed.notify_all()
+
+    def _send(self, msg):
+        self._ws.send(_dumps(msg))
+
+    def queue(self, species, queue="default"):
+        with self._lock:
+            self.error = None
+            self.events.clear()
+        self._send({"op": "queue", "pokemon": species, "queue": queue})
+
+    def act(self, action, wait_s=0.5):
+        """Send an action and wait up to `wait_s` for the server's answer, so the rerun that follows
+        already shows it (otherwise it arrives with the next poll)."""
+        with self._lock:
+            self.error = None
+            rev = self.rev
+        self._send({"op": "action", "action": list(action)})
+        with self._lock:
+            self._changed.wait_for(lambda: self.rev != rev or self.error or self.status == "closed", wait_s)
+
+    def resume(self, match, token):
+        self._send({"op": "resume", "match": match, "token": token})
+
+    def leave(self):
+        self._send({"op": "leave"})
+
+    def view(self):
+        """Consistent copy of everything the UI shows."""
+        with self._lock:
+            state = json.loads(_dumps(self.state)) if self.state is not None else None
+            return {"status": self.status, "slot": self.slot, "match": self.match, "state": state,
+                    "events": list(self.events), "error": self.error, "closed_reason": self.closed_reason,
+                    "closed_winner": self.closed_winner}
+
+    def close(self):
+        self._finalizer()
+
+
+# -----------------------
+# Load generator
+# -----------------------
+class _StartLine:
+    """Barrier for the load clients: play starts once every client is matched, has failed before being
+    matched, or is the one left alone in the queue because its partner failed. Matched clients come in
+    pairs, so an odd count means a `matched` message is still on its way."""
+
+    def __init__(self, clients):
+        self.clients = clients
+        self.matched = self.waiting = 0
+        self.errors = []
+        self.go = asyncio.Event()
+        self.started = None
+
+    def _check(self):
+        if (not self.go.is_set() and self.matched % 2 == 0
+                and self.matched + self.waiting + len(self.errors) == self.clients):
+            self.started = time.perf_counter()
+            self.go.set()
+
+    def queued(self):
+        self.waiting += 1
+        self._check()
+
+    def arrive(self, was_waiting):
+        self.waiting -= was_waiting
+        self.matched += 1
+        self._check()
+
+    def fail(self, error, was_waiting=False):
+        """A client that gave up before being matched (also one left waiting when play starts)."""
+        self.waiting -= was_waiting
+        self.errors.append(error)
+        self._check()
+
+
+async def _wait_for_match(ws, start):
+    """Read until `matched` and return it, or None when the client failed or was left unmatched (counted)."""
+    from websockets.exceptions import WebSocketException
+
+    waiting = False
+    while True:
+        recv = asyncio.ensure_future(ws.recv())
+        go = asyncio.ensure_future(start.go.wait())
+        await asyncio.wait((recv, go), return_when=asyncio.FIRST_COMPLETED)
+        go.cancel()
+        if not recv.done():
+            recv.cancel()
+            start.fail("left unmatched: its partner failed", waiting)
+            return None
+        try:
+            msg = json.loads(recv.result())
+        except (OSError, WebSocketException) as e:
+            start.fail(repr(e), waiting)
+            return None
+        if msg["op"] == "queued" and not waiting:
+            waiting = True
+            start.queued()
+        elif msg["op"] == "matched":
+            start.arrive(waiting)
+            return msg
+        elif msg["op"] in ("error", "closed"):
+            start.fail(msg.get("message") or msg.get("reason"), waiting)
+            return None
+
+
+async def _load_client(url, queue, species, turns, rng, latencies, done, start, think_s):
+    """One player: queue, then play random moves on its turns; after `turns` actions it leaves the match.
+
+    With `think_s` the player waits a random time (exponential, that mean) before each action, like a
+    person would; the latency measured is from sending the action to receiving its update. Nobody plays
+    until `start` (a _StartLine) lets them.
+    """
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import WebSocketException
+
+    matched = None
+    try:
+        async with connect(url, compression=None, max_queue=None) as ws:
+            await ws.send(_dumps({"op": "queue", "pokemon": species, "queue": queue}))
+            matched = await _wait_for_match(ws, start)
+            if matched is None:
+                return
+            await start.go.wait()
+            await _play_load(ws, matched, turns, rng, latencies, done, think_s)
+    except (OSError, WebSocketException) as e:
+        if matched is None:
+            start.fail(repr(e))  # failed connecting or queueing, before _wait_for_match counted it
+        else:
+            start.errors.append(repr(e))
+
+
+async def _play_load(ws, matched, turns, rng, latencies, done, think_s):
+    state, slot, sent_at, made = matched["state"], matched["slot"], None, 0
+    while True:
+        if state["turn"] == slot and sent_at is None:
+            if made >= turns:
+                await ws.send(_dumps({"op": "leave"}))  # closes the match for the opponent too
+                break
+            if state["winner"] is not None:
+                action = ["forfeit"]
+            else:
+                action = ["move", rng.choice(state["party"][slot]["moves"])]
+            if think_s:
+                await asyncio.sleep(rng.expovariate(1 / think_s))
+            sent_at = time.perf_counter()
+            made += 1
+            await ws.send(_dumps({"op": "action", "action": action}))
+        msg = json.loads(await ws.recv())
+        op = msg["op"]
+        if op == "update":
+            apply_diff(state, msg["diff"])
+            if msg["by"] == slot and sent_at is not None:
+                latencies.append(time.perf_counter() - sent_at)
+                sent_at = None
+        elif op in ("closed", "error"):
+            break
+    done.append(made)
+
+
+async def run_load(url, matches, turns, seed=0, think_ms=0, connect_batch=200):
+    """Play `matches` concurrent matches of up to `turns` actions per player against a running server.
+
+    With think_ms=0 every player acts as soon as it may (a saturation test: latency then mostly measures
+    queueing); a think time gives an open, human-paced load. Clients that fail are counted in `failed`
+    (with the first error) instead of holding the others up.
+    """
+    rng = random.Random(seed)
+    from websockets.asyncio.client import connect
+
+    async with connect(url) as ws:
+        await ws.send(_dumps({"op": "roster"}))
+        names = json.loads(await ws.recv())["names"]
+    latencies, done = [], []
+    queue = f"load-{seed}"
+    clients = matches * 2
+    start, connect_start = _StartLine(clients), time.perf_counter()
+    tasks = []
+    for i in range(clients):
+        tasks.append(asyncio.create_task(_load_client(
+            url, queue, rng.choice(names), turns, random.Random(rng.getrandbits(32)), latencies, done, start,
+            think_ms / 1000)))
+        if len(tasks) % connect_batch == 0:
+            await asyncio.sleep(0)  # let the handshakes in flight progress
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start.started
+    lat = sorted(latencies)
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else float("nan")  # noqa: E731
+    return {"matches": matches, "clients": len(done), "failed": len(start.errors),
+            "first_error": start.errors[0] if start.errors else None, "think_ms": think_ms,
+            "connect_s": round(start.started - connect_start, 3), "actions": len(lat), "elapsed_s": round(elapsed, 3),
+            "actions_per_s": round(len(lat) / elapsed, 1), "p50_ms": round(pct(0.50), 2),
+            "p99_ms": round(pct(0.99), 2), "max_ms": round(lat[-1] * 1000, 2) if lat else None,
+            "mean_ms": round(statistics.fmean(lat) * 1000, 2) if lat else None}
+
+
+def _serve_in_process(port_queue, replays):
+    def ready(port):
+        port_queue.put(port)
+
+    asyncio.run(MatchServer(replays=replays).serve(port=0, ready=ready))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online match server and its load generator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_p = sub.add_parser("serve")
+    serve_p.add_argument("--host", default=DEFAULT_HOST)
+    serve_p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_p.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT_S)
+    serve_p.add_argument("--replays", help="store finished matches in this replay.py archive")
+    serve_p.add_argument("--metrics-port", type=int, help="serve Prometheus metrics here (needs POKEMON_METRICS=1)")
+    load_p = sub.add_parser("load", help="measure throughput and turn latency")
+    load_p.add_argument("--url", help="server to load (default: start one in a child process)")
+    load_p.add_argument("--matches", type=int, default=1000)
+    load_p.add_argument("--turns", type=int, default=20, help="actions per player")
+    load_p.add_argument("--seed", type=int, default=0)
+    load_p.add_argument("--think-ms", type=float, default=0, help="mean pause before each action (0 = saturate)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = MatchServer(idle_timeout_s=args.idle_timeout, replays=args.replays)
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+        print(f"serving matches on ws://{args.host}:{args.port}")
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    child = None
+    url = args.url
+    if url is None:
+        import multiprocessing
+
+        ports = multiprocessing.Queue()
+        child = multiprocessing.Process(target=_serve_in_process, args=(ports, None), daemon=True)
+        child.start()
+        url = f"ws://{DEFAULT_HOST}:{ports.get(timeout=60)}"
+    try:
+        result = asyncio.run(run_load(url, args.matches, args.turns, args.seed, args.think_ms))
+    finally:
+        if child is not None:
+            child.terminate()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,206 @@
+# matchups.py
+"""Vectorized Monte Carlo win-probability matrix for every ordered pair of species.
+
+Runs the engine's damage rule (attack - 0.28 * defense + randint(5, 20), scaled by power and the
+move multiplier, floor 5, shield x0.6) over NumPy arrays for all pairs x trials at once instead of
+battle by battle. Move multipliers for every (attacker, move slot, defender) come from one gather
+over the type-effectiveness matrix (move_tables), and each turn picks a random move slot and rolls
+its accuracy, as the CPU does:
+
+    python matchups.py build --trials 2000     # writes matchups.npz
+    python matchups.py show pikachu
+
+`matrix[i, j]` is the probability that species i beats species j when i attacks first, as the
+player does against the CPU. Items and levels are not modelled.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+import pokeapi
+from moves import NO_TYPE, STAB, effectiveness_matrix, power_factor
+from records import MOVES_PER_POKEMON, load_roster_records
+
+DEFAULT_PATH = os.environ.get("POKEMON_MATCHUPS", "matchups.npz")
+DEFAULT_TRIALS = 1000
+CHUNK_ELEMENTS = 4_000_000  # pairs x trials simulated per chunk, bounds peak memory
+MAX_TURNS = 1000  # immune pairs can't hurt each other; a battle still going by then is a draw (not a win)
+
+
+def stat_arrays(records):
+    """(names, attack, defense, max_hp) arrays from records.PokemonRecord objects."""
+    names = np.array([r.name for r in records])
+    attack = np.array([r.attack for r in records], dtype=np.float64)
+    defense = np.array([r.defense for r in records], dtype=np.float64)
+    max_hp = np.array([r.max_hp for r in records], dtype=np.int32)
+    return names, attack, defense, max_hp
+
+
+def move_tables(records):
+    """(multiplier, hit) arrays for every record's moves against every record.
+
+    `multiplier[a, k, b]` is engine's move multiplier (power x same-type bonus x type chart) of record
+    a's k-th move against record b, and `hit[a, k]` its hit probability. Records with fewer than four
+    moves repeat theirs, so a uniform pick over the four slots is a uniform pick over their moves.
+    """
+    n, k = len(records), MOVES_PER_POKEMON
+    move_type = np.full((n, k), NO_TYPE, dtype=np.intp)
+    factor = np.ones((n, k), dtype=np.float32)
+    hit = np.ones((n, k), dtype=np.float32)
+    types = np.full((n, 2), NO_TYPE, dtype=np.intp)
+    for i, r in enumerate(records):
+        types[i, :len(r.types[:2])] = r.types[:2]
+        for j in range(k):
+            t, power, accuracy = r.move_stats[j % len(r.move_stats)]
+            move_type[i, j] = t
+            factor[i, j] = power_factor(power) * (STAB if t != NO_TYPE and t in r.types else 1.0)
+            hit[i, j] = accuracy / 100 if accuracy else 1.0
+    eff = effectiveness_matrix()
+    chart = eff[move_type[:, :, None], types[None, None, :, 0]] * eff[move_type[:, :, None], types[None, None, :, 1]]
+    return factor[:, :, None] * chart, hit
+
+
+def damage(base, roll, power_mod=1.0, shield=False, move_mod=None):
+    """Vectorized engine.calculate_damage for precomputed `base = attack - 0.28 * defense`."""
+    if move_mod is not None:
+        power_mod = power_mod * move_mod
+    dmg = np.maximum(5, np.trunc((base + roll) * power_mod)).astype(np.int32)
+    if move_mod is not None:
+        dmg[move_mod == 0] = 0
+    if shield:
+        dmg = (dmg * 0.6).astype(np.int32)
+    return dmg
+
+
+def _turn(base, pair, moves, rng, power_mod, shield):
+    """Damage of one attack for every live battle; `moves` is (multiplier, hit) per pair and move slot."""
+    roll = rng.integers(5, 21, size=base.size)
+    if moves is None:
+        return damage(base, roll, power_mod, shield)
+    mult, hit = moves
+    k = rng.integers(0, mult.shape[1], size=base.size)
+    dmg = damage(base, roll, power_mod, shield, mult[pair, k])
+    dmg[rng.random(base.size) >= hit[pair, k]] = 0
+    return dmg
+
+
+def simulate_pairs(atk_a, def_a, hp_a, atk_b, def_b, hp_b, trials, rng, power_mod=1.0, shield=False,
+                   moves_ab=None, moves_ba=None):
+    """Win rate of A over B (A attacks first) for each pair; inputs are equal-length 1-D arrays.
+
+    `moves_ab` / `moves_ba` are optional (multiplier, hit) arrays of shape (pairs, 4) for A's moves
+    against B and B's against A (rows of move_tables); without them every hit is a neutral one.
+    Battles that last MAX_TURNS turns count as draws.
+    """
+    pairs = len(atk_a)
+    # everything is flattened to pair-major (pairs * trials,) vectors and compacted as battles end
+    pair = np.repeat(np.arange(pairs), trials)
+    base_ab = (atk_a - 0.28 * def_b)[pair]
+    base_ba = (atk_b - 0.28 * def_a)[pair]
+    hpa = hp_a.astype(np.int32)[pair]
+    hpb = hp_b.astype(np.int32)[pair]
+    live = np.arange(pairs * trials)
+    wins = np.zeros(pairs * trials, dtype=bool)
+    for _ in range(MAX_TURNS):
+        if not live.size:
+            break
+        hpb -= _turn(base_ab, pair, moves_ab, rng, power_mod, shield)
+        a_won = hpb <= 0
+        wins[live[a_won]] = True
+        keep = ~a_won
+        live, pair, base_ab, base_ba, hpa, hpb = (live[keep], pair[keep], base_ab[keep], base_ba[keep], hpa[keep],
+                                                  hpb[keep])
+        hpa -= _turn(base_ba, pair, moves_ba, rng, power_mod, shield)
+        keep = hpa > 0
+        live, pair, base_ab, base_ba, hpa, hpb = (live[keep], pair[keep], base_ab[keep], base_ba[keep], hpa[keep],
+                                                  hpb[keep])
+    return wins.reshape(pairs, trials).mean(axis=1)
+
+
+def win_matrix(attack, defense, max_hp, trials=DEFAULT_TRIALS, seed=0, power_mod=1.0, shield=False, moves=None):
+    """N x N float32 matrix of P(row beats column), simulated in chunks of ordered pairs.
+
+    `moves` is the (multiplier, hit) pair from move_tables; leave it out to simulate neutral hits.
+    """
+    n = len(attack)
+    rng = np.random.default_rng(seed)
+    a_idx, b_idx = np.divmod(np.arange(n * n), n)
+    out = np.empty(n * n, dtype=np.float32)
+    step = max(1, CHUNK_ELEMENTS // trials)
+    for start in range(0, n * n, step):
+        ia, ib = a_idx[start:start + step], b_idx[start:start + step]
+        moves_ab = moves_ba = None
+        if moves is not None:
+            mult, hit = moves
+            moves_ab, moves_ba = (mult[ia, :, ib], hit[ia]), (mult[ib, :, ia], hit[ib])
+        out[start:start + step] = simulate_pairs(
+            attack[ia], defense[ia], max_hp[ia], attack[ib], defense[ib], max_hp[ib],
+            trials, rng, power_mod, shield, moves_ab, moves_ba,
+        )
+    return out.reshape(n, n)
+
+
+def save(path, names, matrix, trials):
+    np.savez_compressed(path, names=names, matrix=matrix, trials=trials)
+
+
+class Matchups:
+    """Loaded matrix with name lookups, for the UI."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        data = np.load(path)
+        self.names = [str(n) for n in data["names"]]
+        self.matrix = data["matrix"]
+        self.trials = int(data["trials"])
+        self._index = {n: i for i, n in enumerate(self.names)}
+
+    def win_probability(self, a, b):
+        """P(a beats b) with a attacking first, or None if either species isn't in the matrix."""
+        i, j = self._index.get(a.lower()), self._index.get(b.lower())
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    def best_against(self, b, k=5):
+        """The k species with the highest win probability against `b`."""
+        j = self._index[b.lower()]
+        order = np.argsort(-self.matrix[:, j])[:k]
+        return [(self.names[i], float(self.matrix[i, j])) for i in order]
+
+
+def load_matchups(path=DEFAULT_PATH):
+    """Matchups from a prebuilt file, or None when it hasn't been built."""
+    if not os.path.exists(path):
+        return None
+    return Matchups(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the matchup win-probability matrix.")
+    parser.add_argument("command", choices=["build", "show"])
+    parser.add_argument("name", nargs="?")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--limit", type=int, default=pokeapi.GEN1_LIMIT)
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        records = load_roster_records(args.limit)
+        names, attack, defense, max_hp = stat_arrays(records)
+        start = time.perf_counter()
+        matrix = win_matrix(attack, defense, max_hp, trials=args.trials, seed=args.seed, moves=move_tables(records))
+        elapsed = time.perf_counter() - start
+        save(args.path, names, matrix, args.trials)
+        battles = len(names) ** 2 * args.trials
+        print(f"{battles:,} battles in {elapsed:.1f}s ({battles / elapsed:,.0f}/s) -> {args.path}")
+    else:
+        m = Matchups(args.path)
+        for name, p in m.best_against(args.name):
+            print(f"{name:>15}  {p:.1%}")
+
+
+if __name__ == "__main__":
+    main()
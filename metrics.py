@@ -0,0 +1,284 @@
+# metrics.py
+"""Opt-in tracing: timed spans and counters, aggregated into latency histograms.
+
+Off unless POKEMON_METRICS=1; disabled, `span()` returns a shared no-op context manager, `count()`
+returns straight away and `traced()` leaves functions untouched, so instrumented code pays a flag check.
+
+    with span("render", section="arena"):
+        ...
+    count("cache.hit", cache="pokemon")
+
+    @traced("records.compute_base_stats")
+    def compute_base_stats(...): ...
+
+Every observation goes to the process registry (PROCESS) and, when one is bound to the current context
+with `bind_session`, to that session's registry as well (the app binds one per Streamlit session).
+The process registry is exported in the Prometheus text format:
+
+    POKEMON_METRICS=1 POKEMON_METRICS_PORT=9464 streamlit run app.py    # GET :9464/metrics
+    POKEMON_METRICS=1 POKEMON_METRICS_FILE=metrics.prom streamlit run app.py
+"""
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import re
+import threading
+import time
+
+ENABLED = os.environ.get("POKEMON_METRICS", "") not in ("", "0")
+PREFIX = "pokemon_"
+# interface the /metrics endpoint listens on; set POKEMON_METRICS_HOST=0.0.0.0 for a scraper on another host
+HOST = os.environ.get("POKEMON_METRICS_HOST", "127.0.0.1")
+# histogram bucket upper bounds, in seconds
+BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (the last bucket is +Inf)."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_S) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS_S, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear within a bucket), in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS_S[i - 1] if i else 0.0
+                hi = BUCKETS_S[i] if i < len(BUCKETS_S) else BUCKETS_S[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return BUCKETS_S[-1]
+
+
+class Registry:
+    """Histograms and counters keyed by (name, labels). Thread-safe."""
+
+    def __init__(self):
+        self._hists = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, labels=()):
+        key = (name, labels)
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = Histogram()
+            h.observe(seconds)
+
+    def inc(self, name, n=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def total(self, name, **labels):
+        """Seconds observed so far by the `name` histogram with exactly these labels (0.0 if none)."""
+        with self._lock:
+            h = self._hists.get((name, tuple(sorted(labels.items()))))
+            return h.sum if h is not None else 0.0
+
+    def summary(self):
+        """Rows for a debug table: spans with count, total, p50/p95/p99 (ms), then counters."""
+        with self._lock:
+            hists = [(k, h.count, h.sum, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                     for k, h in self._hists.items()]
+            counters = list(self._counters.items())
+        rows = [{"metric": _label_text(name, labels), "count": n, "total_ms": round(total * 1000, 1),
+                 "p50_ms": round(p50 * 1000, 2), "p95_ms": round(p95 * 1000, 2), "p99_ms": round(p99 * 1000, 2)}
+                for (name, labels), n, total, p50, p95, p99 in sorted(hists, key=lambda r: -r[2])]
+        rows += [{"metric": _label_text(name, labels), "count": n} for (name, labels), n in sorted(counters)]
+        return rows
+
+    def prometheus(self, prefix=PREFIX):
+        """Exposition in the Prometheus text format (spans as `<name>_seconds` histograms)."""
+        with self._lock:
+            hists = {k: (list(h.counts), h.sum, h.count) for k, h in self._hists.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name in sorted({n for n, _ in hists}):
+            metric = f"{prefix}{_sanitize(name)}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (n, labels), (counts, total, count) in sorted(hists.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(BUCKETS_S + (float("inf"),), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{_labels(labels)} {total}")
+                lines.append(f"{metric}_count{_labels(labels)} {count}")
+        for name in sorted({n for n, _ in counters}):
+            metric = f"{prefix}{_sanitize(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{metric}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _sanitize(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _label_text(name, labels):
+    return name + (" " + " ".join(f"{k}={v}" for k, v in labels) if labels else "")
+
+
+PROCESS = Registry()
+_session = contextvars.ContextVar("metrics_session", default=None)
+
+
+def bind_session(registry):
+    """Also record into `registry` for the rest of the current context (a Streamlit script run)."""
+    _session.set(registry)
+
+
+def _record(name, seconds, labels):
+    PROCESS.observe(name, seconds, labels)
+    session = _session.get()
+    if session is not None:
+        session.observe(name, seconds, labels)
+
+
+# -----------------------
+# Instrumentation API
+# -----------------------
+class _Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start, self.labels)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **labels):
+    """Context manager timing a block into the `name` histogram (a no-op when metrics are off)."""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(name, tuple(sorted(labels.items())))
+
+
+def count(name, n=1, **labels):
+    if not ENABLED:
+        return
+    labels = tuple(sorted(labels.items()))
+    PROCESS.inc(name, n, labels)
+    session = _session.get()
+    if session is not None:
+        session.inc(name, n, labels)
+
+
+def observe(name, seconds, **labels):
+    """Record a duration measured elsewhere (a no-op when metrics are off)."""
+    if ENABLED:
+        _record(name, seconds, tuple(sorted(labels.items())))
+
+
+def traced(name):
+    """Decorator form of span(); decided at import time, so disabled means the function is unchanged."""
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with _Span(name, ()):
+                return fn(*args, **kwargs)
+
+        return timed
+
+    return wrap
+
+
+# -----------------------
+# Exporters
+# -----------------------
+def serve(port, host=HOST, registry=PROCESS):
+    """Serve `registry` at http://host:port/metrics from a daemon thread. Returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    return httpd
+
+
+def write_file(path, registry=PROCESS):
+    """Write the exposition to `path` atomically (for node_exporter's textfile collector and the like)."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.prometheus())
+    os.replace(tmp, path)
+
+
+def start_file_writer(path, interval_s=15.0, registry=PROCESS):
+    """Rewrite `path` every `interval_s` seconds from a daemon thread; a failed write is logged and retried."""
+    def loop():
+        while True:
+            time.sleep(interval_s)
+            try:
+                write_file(path, registry)
+            except Exception:
+                logging.getLogger(__name__).exception("writing metrics to %s failed", path)
+
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,164 @@
+# moves.py
+"""Move data and type effectiveness as small integers and flat tables.
+
+A move is reduced to a `(type_id, power, accuracy)` tuple of ints (power 0 = status or unknown, treated
+as a standard hit; accuracy 0 = never misses) and a pokemon's types to a tuple of type ids. The 18x18
+effectiveness chart is precomputed into EFFECTIVENESS, a flat tuple indexed `attack * N_TYPES + defend`,
+so the damage multiplier of a move against a defender is a couple of table lookups (see multiplier).
+`effectiveness_matrix()` gives the same table as a NumPy array for vectorized simulations.
+
+Move details are loaded in bulk and cached for the life of the process: from the offline snapshot
+when it has them, otherwise with concurrent requests for just the moves that are missing.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import traced
+
+# PokeAPI type ids 1..18, shifted to 0..17
+TYPES = ("normal", "fighting", "flying", "poison", "ground", "rock", "bug", "ghost", "steel", "fire", "water",
+         "grass", "electric", "psychic", "ice", "dragon", "dark", "fairy")
+N_TYPES = len(TYPES)
+TYPE_IDS = {t: i for i, t in enumerate(TYPES)}
+NO_TYPE = N_TYPES  # unknown / typeless: neutral against everything, no same-type bonus
+
+# attacking type -> (super effective against, not very effective against, no effect against)
+_CHART = {
+    "normal": ((), ("rock", "steel"), ("ghost",)),
+    "fire": (("grass", "ice", "bug", "steel"), ("fire", "water", "rock", "dragon"), ()),
+    "water": (("fire", "ground", "rock"), ("water", "grass", "dragon"), ()),
+    "electric": (("water", "flying"), ("electric", "grass", "dragon"), ("ground",)),
+    "grass": (("water", "ground", "rock"), ("fire", "grass", "poison", "flying", "bug", "dragon", "steel"), ()),
+    "ice": (("grass", "ground", "flying", "dragon"), ("fire", "water", "ice", "steel"), ()),
+    "fighting": (("normal", "ice", "rock", "dark", "steel"), ("poison", "flying", "psychic", "bug", "fairy"),
+                 ("ghost",)),
+    "poison": (("grass", "fairy"), ("poison", "ground", "rock", "ghost"), ("steel",)),
+    "ground": (("fire", "electric", "poison", "rock", "steel"), ("grass", "bug"), ("flying",)),
+    "flying": (("grass", "fighting", "bug"), ("electric", "rock", "steel"), ()),
+    "psychic": (("fighting", "poison"), ("psychic", "steel"), ("dark",)),
+    "bug": (("grass", "psychic", "dark"), ("fire", "fighting", "poison", "flying", "ghost", "steel", "fairy"), ()),
+    "rock": (("fire", "ice", "flying", "bug"), ("fighting", "ground", "steel"), ()),
+    "ghost": (("psychic", "ghost"), ("dark",), ("normal",)),
+    "dragon": (("dragon",), ("steel",), ("fairy",)),
+    "dark": (("psychic", "ghost"), ("fighting", "dark", "fairy"), ()),
+    "steel": (("ice", "rock", "fairy"), ("fire", "water", "electric", "steel"), ()),
+    "fairy": (("fighting", "dragon", "dark"), ("fire", "poison", "steel"), ()),
+}
+
+
+def _build_table():
+    table = [1.0] * (N_TYPES * N_TYPES)
+    for attack, groups in _CHART.items():
+        a = TYPE_IDS[attack]
+        for factor, defenders in zip((2.0, 0.5, 0.0), groups):
+            for d in defenders:
+                table[a * N_TYPES + TYPE_IDS[d]] = factor
+    return tuple(table)
+
+
+EFFECTIVENESS = _build_table()
+
+STANDARD_POWER = 60  # a move of this power hits as hard as the old move-less formula
+POWER_RANGE = (0.5, 2.0)  # power / STANDARD_POWER is clamped to this
+STAB = 1.5  # same-type attack bonus
+NEUTRAL_MOVE = (NO_TYPE, 0, 0)
+
+
+def type_effectiveness(move_type, defender_types):
+    """Chart multiplier (0, 0.25 .. 4) of an attack type against a defender's types."""
+    if move_type == NO_TYPE:
+        return 1.0
+    row = move_type * N_TYPES
+    factor = 1.0
+    for t in defender_types:
+        factor *= EFFECTIVENESS[row + t]
+    return factor
+
+
+def power_factor(power):
+    if not power:
+        return 1.0
+    return min(POWER_RANGE[1], max(POWER_RANGE[0], power / STANDARD_POWER))
+
+
+def multiplier(move, attacker_types, defender_types):
+    """Damage multiplier of `move` (a stats tuple): power x same-type bonus x type effectiveness."""
+    move_type, power, _ = move
+    stab = STAB if move_type != NO_TYPE and move_type in attacker_types else 1.0
+    return power_factor(power) * stab * type_effectiveness(move_type, defender_types)
+
+
+def hit_chance(move):
+    return move[2] / 100 if move[2] else 1.0
+
+
+def effectiveness_matrix():
+    """(N_TYPES + 1) x (N_TYPES + 1) float32 NumPy array; the last row/column is NO_TYPE (all ones)."""
+    import numpy as np
+
+    m = np.ones((N_TYPES + 1, N_TYPES + 1), dtype=np.float32)
+    m[:N_TYPES, :N_TYPES] = np.array(EFFECTIVENESS, dtype=np.float32).reshape(N_TYPES, N_TYPES)
+    return m
+
+
+# -----------------------
+# Move data
+# -----------------------
+def move_key(name):
+    """PokeAPI slug of a display name: "Thunder Shock" -> "thunder-shock"."""
+    return name.lower().replace(" ", "-")
+
+
+def type_ids(names):
+    return tuple(TYPE_IDS.get(n, NO_TYPE) for n in names)
+
+
+def project_move(doc):
+    """The few fields of a /move/{name} document the game uses (stored as-is in the snapshot)."""
+    return {"name": doc["name"], "type": (doc.get("type") or {}).get("name"), "power": doc.get("power"),
+            "accuracy": doc.get("accuracy")}
+
+
+def move_stats(projection):
+    """(type_id, power, accuracy) ints from a projected move."""
+    return (TYPE_IDS.get(projection["type"], NO_TYPE), projection["power"] or 0, projection["accuracy"] or 0)
+
+
+_cache = {}  # move key -> stats tuple; there are under a thousand moves, so this is never evicted
+_lock = threading.Lock()
+MOVE_WORKERS = 8
+
+
+def _fetch_move(key):
+    import pokeapi  # only needed when the snapshot doesn't have the move
+
+    return project_move(pokeapi.fetch_url(f"{pokeapi.POKEAPI_BASE}/move/{key}"))
+
+
+@traced("moves.load_moves")
+def load_moves(keys, store=None, workers=MOVE_WORKERS):
+    """Stats for move `keys` in one batch: cache, then `store` (a SnapshotStore), then PokeAPI in parallel.
+
+    Moves that can't be loaded are left out of the result and not cached, so a later call tries them
+    again; callers decide what an incomplete movebook means (see records.project_records).
+    """
+    keys = set(keys)
+    with _lock:
+        found = {k: _cache[k] for k in keys if k in _cache}
+    missing = keys - found.keys()
+    loaded = {}
+    if missing and store is not None:
+        loaded.update({k: move_stats(p) for k, p in store.get_moves(missing).items()})
+        missing -= loaded.keys()
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(workers, len(missing)), thread_name_prefix="moves") as pool:
+            futures = {k: pool.submit(_fetch_move, k) for k in missing}
+        for k, fut in futures.items():
+            try:
+                loaded[k] = move_stats(fut.result())
+            except Exception:
+                pass
+    with _lock:
+        _cache.update(loaded)
+    found.update(loaded)
+    return found
@@ -0,0 +1,187 @@
+# pokeapi.py
+"""Plain PokeAPI client shared by the Streamlit app and the offline tooling (no Streamlit imports here).
+
+Every request goes through one fetch layer: concurrent requests for the same url are coalesced,
+transient failures are retried with jittered backoff, and a circuit breaker per host stops hammering
+the API when it is down, serving the last good copy of a resource instead when there is one. (Sprites
+come from a CDN host with its own breaker, so a sprite outage never blocks pokemon data.)
+`requests` is imported on the first request, not with this module.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from metrics import count, span
+from resilience import CircuitBreaker, RetryPolicy, SingleFlight
+from shared_cache import SharedCache
+
+POKEAPI_BASE = os.environ.get("POKEAPI_BASE", "https://pokeapi.co/api/v2")
+GEN1_LIMIT = 151
+
+# Connection pool shared by every fetch in the process
+POOL_SIZE = 32
+REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Last good JSON per url, served when the upstream is failing
+STALE_CACHE_BYTES = 16 * 1024 * 1024
+
+retry_policy = RetryPolicy(attempts=4, base_s=0.3, cap_s=5.0)
+breaker = CircuitBreaker(failure_threshold=5, reset_timeout_s=30.0)  # the PokeAPI host's
+_host_breakers = {}  # every other host (sprite CDNs) -> its own CircuitBreaker
+_host_breakers_lock = threading.Lock()
+_inflight = SingleFlight()
+_stale = SharedCache(max_bytes=STALE_CACHE_BYTES, name="stale")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class PokeAPIError(Exception):
+    """A PokeAPI request that failed for good.
+
+    `kind` is one of "timeout", "connection", "http", "circuit_open"; `status` is the HTTP status for
+    "http" errors; `retryable` tells the UI whether trying again later can help.
+    """
+
+    def __init__(self, kind, url, message, status=None, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.url = url
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    def to_dict(self):
+        return {"kind": self.kind, "url": self.url, "status": self.status, "retryable": self.retryable, "message": str(self)}
+
+
+def make_session(pool_size=POOL_SIZE):
+    """New requests.Session with a keep-alive pool (retries are handled by the fetch layer)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Process-wide pooled session, created on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def breaker_for(url):
+    """The circuit breaker of `url`'s host."""
+    host = urlsplit(url).netloc
+    if host == urlsplit(POKEAPI_BASE).netloc:
+        return breaker
+    with _host_breakers_lock:
+        if host not in _host_breakers:
+            _host_breakers[host] = CircuitBreaker(failure_threshold=breaker.failure_threshold,
+                                                  reset_timeout_s=breaker.reset_timeout_s)
+        return _host_breakers[host]
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_with_retries(url, session):
+    import requests
+
+    last_error = None
+    for attempt in range(retry_policy.attempts):
+        if attempt:
+            time.sleep(retry_policy.delay(attempt - 1, last_error.retry_after))
+        try:
+            resp = session.get(url, timeout=REQUEST_TIMEOUT)
+        except requests.Timeout as e:
+            last_error = PokeAPIError("timeout", url, f"Timed out fetching {url}: {e}")
+            continue
+        except requests.RequestException as e:
+            # connection errors, and the rest (a response cut short, a bad chunk...) count the same
+            last_error = PokeAPIError("connection", url, f"Could not connect to {url}: {e}")
+            continue
+        if resp.status_code in RETRY_STATUSES:
+            last_error = PokeAPIError(
+                "http", url, f"{resp.status_code} from {url}", status=resp.status_code, retry_after=_retry_after(resp)
+            )
+            continue
+        if resp.status_code >= 400:
+            # 404 and friends won't get better by retrying and say nothing about upstream health
+            raise PokeAPIError("http", url, f"{resp.status_code} from {url}", status=resp.status_code, retryable=False)
+        return resp
+    raise last_error
+
+
+def _fetch(url, session, parse):
+    host_breaker = breaker_for(url)
+    if not host_breaker.allow():
+        raise PokeAPIError("circuit_open", url, f"{urlsplit(url).netloc} is unavailable; not calling {url} for now.")
+    try:
+        with span("pokeapi.fetch"):
+            resp = _get_with_retries(url, session)
+    except PokeAPIError as e:
+        count("pokeapi.errors", kind=e.kind)
+        if e.retryable:
+            host_breaker.record_failure()
+        else:
+            host_breaker.record_success()  # the API answered; it's just not there
+        raise
+    except BaseException:
+        # anything else still has to settle the call, or a half-open trial would never finish
+        host_breaker.record_failure()
+        raise
+    host_breaker.record_success()
+    return parse(resp)
+
+
+def fetch_url(url, session=None):
+    """Fetch any PokeAPI resource by absolute url, falling back to the last good copy on failure."""
+    try:
+        data = _inflight.do(url, lambda: _fetch(url, session or get_session(), lambda r: r.json()))
+    except PokeAPIError as e:
+        stale = _stale.get(url) if e.retryable else None
+        if stale is None:
+            raise
+        count("pokeapi.stale_served")
+        return stale
+    _stale.put(url, data)
+    return data
+
+
+def fetch_bytes(url, session=None):
+    """Fetch raw bytes (sprites, artwork)."""
+    return _inflight.do(("bytes", url), lambda: _fetch(url, session or get_session(), lambda r: r.content))
+
+
+def fetch_pokemon_list(limit=GEN1_LIMIT, offset=0):
+    """Fetch `limit` pokemon list entries (name + url) starting at `offset`."""
+    return fetch_url(f"{POKEAPI_BASE}/pokemon?limit={limit}&offset={offset}")["results"]
+
+
+def fetch_pokemon(name):
+    """Fetch a single pokemon's details by name."""
+    return fetch_url(f"{POKEAPI_BASE}/pokemon/{name.lower()}")
+
+
+def health():
+    """Fetch-layer counters for the UI: breaker state, coalesced calls, stale cache usage."""
+    return {
+        "breaker": breaker.state,
+        "consecutive_failures": breaker.failures,
+        "other_hosts": {host: b.state for host, b in list(_host_breakers.items())},
+        "coalesced": _inflight.coalesced,
+        "stale": _stale.stats(),
+    }
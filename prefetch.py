@@ -0,0 +1,100 @@
+# prefetch.py
+"""Concurrent bulk prefetch of pokemon details (and sprites) over the pooled PokeAPI session.
+
+Warm a whole roster from the command line, e.g. against a local fixture server:
+
+    POKEAPI_BASE=http://127.0.0.1:8765/api/v2 python prefetch.py --workers 16 --sprites
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pokeapi
+
+DEFAULT_WORKERS = 16
+
+
+def iter_details(entries, workers=DEFAULT_WORKERS, session=None):
+    """Yield `(entry, details)` for list entries as fetches complete, with at most `workers` in flight.
+
+    The first fetch that still fails after the session's retries is re-raised and pending work is cancelled.
+    """
+    session = session or pokeapi.get_session()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+    try:
+        futures = {pool.submit(pokeapi.fetch_url, e["url"], session): e for e in entries}
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def sprite_urls(details):
+    """Artwork and default sprite urls of a details document, best first."""
+    sprites = details.get("sprites") or {}
+    artwork = ((sprites.get("other") or {}).get("official-artwork") or {}).get("front_default")
+    return [u for u in (artwork, sprites.get("front_default")) if u]
+
+
+def prefetch_all(entries, workers=DEFAULT_WORKERS, sprites=False, progress=None, session=None):
+    """Warm details for every entry (and their sprite bytes when `sprites` is set).
+
+    Returns a dict with `details` (name -> json), `sprites` (url -> bytes) and `errors` (name/url -> message).
+    `progress(done, total)` is called after each finished request.
+    """
+    session = session or pokeapi.get_session()
+    result = {"details": {}, "sprites": {}, "errors": {}}
+    total = len(entries)
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as pool:
+        futures = {pool.submit(pokeapi.fetch_url, e["url"], session): e["name"] for e in entries}
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                result["details"][name] = fut.result()
+            except Exception as e:
+                result["errors"][name] = str(e)
+            done += 1
+            if progress:
+                progress(done, total)
+
+        if sprites:
+            urls = sorted({u for d in result["details"].values() for u in sprite_urls(d)})
+            total += len(urls)
+            futures = {pool.submit(pokeapi.fetch_bytes, u, session): u for u in urls}
+            for fut in as_completed(futures):
+                url = futures[fut]
+                try:
+                    result["sprites"][url] = fut.result()
+                except Exception as e:
+                    result["errors"][url] = str(e)
+                done += 1
+                if progress:
+                    progress(done, total)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm every pokemon's details from PokeAPI concurrently.")
+    parser.add_argument("--limit", type=int, default=pokeapi.GEN1_LIMIT)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--sprites", action="store_true", help="also download sprite artwork")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    entries = pokeapi.fetch_pokemon_list(args.limit, args.offset)
+    result = prefetch_all(
+        entries,
+        workers=args.workers,
+        sprites=args.sprites,
+        progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True),
+    )
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(result['details'])} pokemon, {len(result['sprites'])} sprites in {elapsed:.2f}s")
+    for key, msg in result["errors"].items():
+        print(f"  failed {key}: {msg}")
+
+
+if __name__ == "__main__":
+    main()
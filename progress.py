@@ -0,0 +1,234 @@
+# progress.py
+"""Durable player progression: level, XP, stats and items per (trainer profile, species) in SQLite.
+
+Saves are write-behind: `save` updates the in-process cache and queues the row, and a background
+thread writes everything queued in one transaction every `flush_interval_s` (or sooner once
+`max_pending` rows are waiting). Repeated saves of the same pokemon between flushes collapse into one
+row, so XP awards and item use never wait on the disk. Loads are read-through: a profile is read from
+the database once and then served from a shared LRU until it is evicted.
+
+The database runs in WAL mode with a busy timeout, so one store shared by all sessions of a process
+(and several processes on one file) can read while another writes.
+
+    python progress.py show ash
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from shared_cache import SharedCache
+
+DEFAULT_PATH = os.environ.get("POKEMON_PROGRESS_DB", "pokemon_progress.sqlite3")
+FLUSH_INTERVAL_S = 1.0
+MAX_PENDING = 500
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress (
+    profile TEXT NOT NULL,
+    species TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    attack INTEGER NOT NULL,
+    defense INTEGER NOT NULL,
+    max_hp INTEGER NOT NULL,
+    items TEXT NOT NULL,        -- JSON object item -> quantity
+    updated REAL NOT NULL,
+    PRIMARY KEY (profile, species)
+) WITHOUT ROWID;
+"""
+
+_UPSERT = """
+INSERT INTO progress (profile, species, level, xp, attack, defense, max_hp, items, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (profile, species) DO UPDATE SET
+    level = excluded.level, xp = excluded.xp, attack = excluded.attack, defense = excluded.defense,
+    max_hp = excluded.max_hp, items = excluded.items, updated = excluded.updated
+"""
+
+
+def progress_state(combatant):
+    """The persisted part of an engine.Combatant (HP and one-shot statuses aren't kept)."""
+    return {"level": combatant.level, "xp": combatant.xp, "attack": combatant.attack,
+            "defense": combatant.defense, "max_hp": combatant.max_hp, "items": combatant.items}
+
+
+def restore(combatant, state):
+    """Apply saved progress to a fresh combatant, at full HP."""
+    combatant.level = state["level"]
+    combatant.xp = state["xp"]
+    combatant.attack = state["attack"]
+    combatant.defense = state["defense"]
+    combatant.max_hp = combatant.hp = state["max_hp"]
+    combatant.items = state["items"]
+    return combatant
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")  # durable at checkpoints; a crash loses at most the last flush
+    return conn
+
+
+class ProgressStore:
+    """Write-behind, read-through progression store. Thread-safe; share one per process."""
+
+    def __init__(self, path=DEFAULT_PATH, flush_interval_s=FLUSH_INTERVAL_S, max_pending=MAX_PENDING,
+                 cache_bytes=8 * 1024 * 1024):
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self.cache = SharedCache(cache_bytes)
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_errors = 0
+        self._pending = {}   # (profile, species) -> (state, time)
+        self._inflight = {}  # the batch being written by flush()
+        self._committed = 0  # batches committed so far; a read that straddles one is retried
+        self._lock = threading.Lock()        # guards _pending and cache updates
+        self._write_lock = threading.Lock()  # one flush at a time on the writer connection
+        self._local = threading.local()
+        self._writer = _connect(path)
+        self._writer.executescript(_SCHEMA)
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    # -----------------------
+    # Reads
+    # -----------------------
+    def _load(self, profile):
+        while True:
+            with self._lock:
+                committed = self._committed
+            rows = self._reader().execute(
+                "SELECT species, level, xp, attack, defense, max_hp, items FROM progress WHERE profile = ?",
+                (profile,),
+            ).fetchall()
+            with self._lock:
+                # a flush that committed after the SELECT has already left _inflight: its rows are in
+                # neither the result nor the overlay, so read again
+                if self._committed != committed:
+                    continue
+                out = {}
+                for species, level, xp, attack, defense, max_hp, items in rows:
+                    out[species] = {"level": level, "xp": xp, "attack": attack, "defense": defense,
+                                    "max_hp": max_hp, "items": json.loads(items)}
+                # rows still waiting for (or in the middle of) a flush are newer than the database
+                for batch in (self._inflight, self._pending):
+                    out.update({species: s for (p, species), (s, _) in batch.items() if p == profile})
+                return out
+
+    def load_profile(self, profile):
+        """species -> saved state for `profile` ({} for a new trainer). Treat the result as read-only."""
+        return self.cache.get_or_load(profile, self._load)
+
+    def get(self, profile, species):
+        """Saved state of one pokemon, or None if this trainer never played it."""
+        return self.load_profile(profile).get(species.lower())
+
+    # -----------------------
+    # Writes
+    # -----------------------
+    def save(self, profile, combatant):
+        """Queue the combatant's progress for `profile`. Returns immediately; the disk write is batched."""
+        species = combatant.name.lower()
+        state = progress_state(combatant)
+        base = self.load_profile(profile)  # outside the lock: a miss reads the database
+        with self._lock:
+            # copy-on-write so readers holding the cached dict never see it change
+            cached = dict(self.cache.get(profile) or base)
+            cached[species] = state
+            self.cache.put(profile, cached)
+            self._pending[(profile, species)] = (state, time.time())
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write every queued row now, in one transaction. Returns the number of rows written."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+            rows = [(profile, species, s["level"], s["xp"], s["attack"], s["defense"], s["max_hp"],
+                     json.dumps(s["items"], separators=(",", ":")), t)
+                    for (profile, species), (s, t) in batch.items()]
+            try:
+                with self._writer:
+                    self._writer.executemany(_UPSERT, rows)
+            except sqlite3.Error:
+                # put the rows back (newer saves win) and let the next flush retry
+                with self._lock:
+                    for key, value in batch.items():
+                        self._pending.setdefault(key, value)
+                    self._inflight = {}
+                self.flush_errors += 1
+                raise
+            with self._lock:
+                self._inflight = {}
+                self._committed += 1
+            self.flushes += 1
+            self.rows_written += len(rows)
+            return len(rows)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # counted in flush_errors; retried on the next tick
+
+    def close(self):
+        """Stop the background writer and flush what is left."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "flushes": self.flushes, "rows_written": self.rows_written,
+                "flush_errors": self.flush_errors, "cache": self.cache.stats()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect saved trainer progress.")
+    parser.add_argument("command", choices=["show"])
+    parser.add_argument("profile")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    with ProgressStore(args.path) as store:
+        for species, s in sorted(store.load_profile(args.profile).items()):
+            items = ", ".join(f"{k} x{v}" for k, v in s["items"].items())
+            print(f"{species:>15}  Lv {s['level']:>3}  XP {s['xp']:>4}  atk {s['attack']} def {s['defense']} "
+                  f"hp {s['max_hp']}  {items}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# records.py
+"""Compact pokemon records projected from raw PokeAPI documents.
+
+A raw /pokemon/{name} document is hundreds of KB (mostly the `moves` array); the game only needs
+a handful of numbers, its types, four moves (name plus moves.py stats) and a sprite url, so
+everything downstream works on these.
+"""
+import sys
+
+from metrics import traced
+from moves import NEUTRAL_MOVE, load_moves, type_ids
+
+DEFAULT_MOVES = ("Tackle", "Quick Attack")
+MOVES_PER_POKEMON = 4
+
+
+class PokemonRecord:
+    """Base stats for one species, already scaled for gameplay."""
+
+    __slots__ = ("name", "attack", "defense", "max_hp", "moves", "sprite", "types", "move_stats")
+
+    def __init__(self, name, attack, defense, max_hp, moves, sprite, types=(), move_stats=None):
+        self.name = name
+        self.attack = attack
+        self.defense = defense
+        self.max_hp = max_hp
+        self.moves = tuple(moves)
+        self.sprite = sprite
+        self.types = tuple(types)  # moves.TYPES ids
+        # (type_id, power, accuracy) per move, in the same order as `moves`
+        self.move_stats = tuple(tuple(m) for m in move_stats) if move_stats else (NEUTRAL_MOVE,) * len(self.moves)
+
+    def __repr__(self):
+        return f"PokemonRecord({self.name!r}, atk={self.attack}, def={self.defense}, hp={self.max_hp})"
+
+    def __eq__(self, other):
+        return isinstance(other, PokemonRecord) and all(
+            getattr(self, f) == getattr(other, f) for f in self.__slots__
+        )
+
+    def nbytes(self):
+        """Approximate memory held by this record and its fields."""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, f)) for f in self.__slots__) + sum(
+            sys.getsizeof(m) for m in self.moves
+        )
+
+    def to_dict(self):
+        d = {f: getattr(self, f) for f in self.__slots__}
+        d["moves"], d["types"], d["move_stats"] = list(self.moves), list(self.types), [list(m) for m in self.move_stats]
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        # records cached before move data existed have no types / move_stats: they fight as neutral
+        return cls(d["name"], d["attack"], d["defense"], d["max_hp"], d["moves"], d["sprite"], d.get("types", ()),
+                   d.get("move_stats"))
+
+
+def move_keys(poke):
+    """PokeAPI names of the moves compute_base_stats keeps (load their stats with moves.load_moves)."""
+    return [m['move']['name'] for m in poke['moves'][:MOVES_PER_POKEMON]]
+
+
+@traced("records.compute_base_stats")
+def compute_base_stats(poke, movebook=None):
+    """Project a raw PokeAPI document into a PokemonRecord: attack, defense, max_hp, moves, sprite, types.
+
+    `movebook` maps move keys to moves.py stats tuples (see moves.load_moves); moves missing from it,
+    or all of them when it isn't given, get neutral stats.
+    """
+    # We'll compute attack as attack + special-attack averaged with some weighting
+    stats = {s['stat']['name']: s['base_stat'] for s in poke['stats']}
+    atk = stats.get('attack', 50)
+    spatk = stats.get('special-attack', 50)
+    defense = stats.get('defense', 50)
+    hp = stats.get('hp', 100)
+    # first 4 moves only; the rest of the (huge) list is dropped here
+    keys = move_keys(poke)
+    moves = [k.replace('-', ' ').title() for k in keys]
+    movebook = movebook or {}
+    types = type_ids(t['type']['name'] for t in sorted(poke.get('types', ()), key=lambda t: t['slot']))
+    sprite = poke['sprites']['other']['official-artwork']['front_default'] or poke['sprites']['front_default']
+    return PokemonRecord(
+        name=poke.get('name', ''),
+        attack=int((atk + spatk) / 2),
+        defense=int(defense),
+        max_hp=int(hp * 1.5),  # scale HP visually for gameplay
+        moves=moves or DEFAULT_MOVES,
+        sprite=sprite,
+        types=types,
+        move_stats=[movebook.get(k, NEUTRAL_MOVE) for k in keys] or None,
+    )
+
+
+def project_records(docs, store=None):
+    """PokemonRecords for raw documents, with the stats of all their moves loaded in one batch.
+
+    `store` is a SnapshotStore to take move stats from before asking PokeAPI (see moves.load_moves).
+    A document some of whose moves couldn't be loaded gets None instead of a record: callers cache
+    records for the life of the process, so one with stand-in neutral moves would never be repaired,
+    while loading the species again later retries the moves.
+    """
+    movebook = load_moves({k for d in docs for k in move_keys(d)}, store=store)
+    return [compute_base_stats(d, movebook) if all(k in movebook for k in move_keys(d)) else None for d in docs]
+
+
+def load_roster_records(limit=151):
+    """PokemonRecords for the first `limit` species, from the offline snapshot when there is one.
+
+    The move stats of the whole roster are loaded in one batch.
+    """
+    from snapshot import open_snapshot  # lazily, like pokeapi/prefetch below: only roster loading needs them
+
+    store = open_snapshot()
+    if store is not None:
+        docs = [store.get(e["name"]) for e in store.list_pokemon(limit)]
+    else:
+        import pokeapi
+        import prefetch
+
+        docs = list(prefetch.prefetch_all(pokeapi.fetch_pokemon_list(limit))["details"].values())
+    records = project_records(docs, store)
+    incomplete = [d["name"] for d, r in zip(docs, records) if r is None]
+    if incomplete:
+        raise RuntimeError(f"Couldn't load the moves of {len(incomplete)} species ({', '.join(incomplete[:5])}...); "
+                           "try again.")
+    return records
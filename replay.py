@@ -0,0 +1,369 @@
+# replay.py
+"""Compact binary replay archive: tens of bytes per match instead of KBs of rendered log.
+
+A match is stored as its RNG seed, the starting state of both combatants (species, level, XP, stats,
+HP, types, moves with their type / power / accuracy, items) and the varint-encoded action stream, plus
+the CPU's recorded decisions. That is all the engine needs to re-simulate it exactly (see
+battlelog.replay_match).
+
+File layout:
+
+    b"PKRP" version
+    match*        varint length + payload, back to back
+    footer        string table: varint count, then varint length + UTF-8 bytes per string
+    trailer       footer offset (8 bytes, little endian) + b"PKRP"
+
+Names (species, moves, items, slots) are interned in the footer's string table, so each costs one or
+two bytes per use. ReplayArchive memory-maps a file and decodes a match only when it is asked for:
+
+    python replay.py pack battle_log.ndjson matches.pkr   # from a battlelog export
+    python replay.py info matches.pkr
+    python replay.py verify matches.pkr                   # re-simulate and check every stored result
+"""
+import argparse
+import mmap
+import struct
+
+from engine import LEVEL_UP_GROWTH
+from moves import NEUTRAL_MOVE
+
+MAGIC = b"PKRP"
+VERSION = 2  # v2: combatants carry types and move stats
+TRAILER = struct.Struct("<Q4s")
+
+# action stream: varint (string index << 2) | kind
+KIND_MOVE, KIND_ITEM, KIND_FORFEIT = 0, 1, 2
+# flag bits
+F_CPU_SLOT0, F_CPU_SLOT1, F_GROWTH = 1, 2, 4
+RESULT_SHIFT = 3  # two bits: 0 unfinished, 1 first slot won, 2 second slot won
+GROWTH = struct.Struct("<3d")
+
+
+class ReplayError(ValueError):
+    """Raised for malformed archives or matches that can't be encoded."""
+
+
+# -----------------------
+# Varints
+# -----------------------
+def write_varint(out, n):
+    if n < 0:
+        raise ReplayError(f"varints are unsigned, got {n}")
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(buf, pos):
+    """Decode a varint from `buf` at `pos`. Returns (value, new position)."""
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+# -----------------------
+# Matches
+# -----------------------
+def match_from_log(header, actions, events):
+    """Replay match dict from one battlelog.iter_matches group."""
+    return {
+        "seed": header["seed"],
+        "cpu_slot": header["cpu_slot"],
+        "growth": tuple(header["growth"]),
+        "party": header["party"],
+        "actions": [tuple(a["action"]) for a in actions],
+        "cpu": [(e["item"], e["move"]) for e in events if e["type"] == "cpu_turn"],
+        "winner": _final_winner(events),
+    }
+
+
+def _final_winner(events):
+    """Battle.winner after these events: the last win, unless a forfeit reset came after it."""
+    winner = None
+    for e in events:
+        if e["type"] == "win":
+            winner = e["slot"]
+        elif e["type"] == "reset":
+            winner = None
+    return winner
+
+
+class _Strings:
+    """Writer-side string interning."""
+
+    def __init__(self):
+        self.index = {}
+        self.table = []
+
+    def __call__(self, s):
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.table)
+            self.table.append(s)
+        return i
+
+
+def encode_match(match, intern):
+    """Payload bytes for one match; `intern` maps a string to its table index."""
+    seed = match["seed"]
+    if not isinstance(seed, int):
+        raise ReplayError("only seeded matches can be stored")
+    slots = tuple(match["party"])
+    out = bytearray()
+    flags = 0
+    if match["cpu_slot"] is not None:
+        flags |= F_CPU_SLOT0 if match["cpu_slot"] == slots[0] else F_CPU_SLOT1
+    growth = tuple(match["growth"])
+    if growth != tuple(LEVEL_UP_GROWTH):
+        flags |= F_GROWTH
+    winner = match.get("winner")
+    flags |= (0 if winner is None else 1 + slots.index(winner)) << RESULT_SHIFT
+    out.append(flags)
+    write_varint(out, seed)
+    if flags & F_GROWTH:
+        out += GROWTH.pack(*growth)
+    for slot in slots:
+        p = match["party"][slot]
+        write_varint(out, intern(slot))
+        types = p.get("types", ())
+        for v in (intern(p["name"]), p["level"], p["xp"], p["attack"], p["defense"], p["max_hp"], p["hp"],
+                  int(p["shield"]) | int(p["power"]) << 1, len(types), *types, len(p["moves"])):
+            write_varint(out, v)
+        move_stats = p.get("move_stats") or [NEUTRAL_MOVE] * len(p["moves"])
+        for m, stats in zip(p["moves"], move_stats):
+            write_varint(out, intern(m))
+            for v in stats:
+                write_varint(out, v)
+        write_varint(out, len(p["items"]))
+        for it, qty in p["items"].items():
+            write_varint(out, intern(it))
+            write_varint(out, qty)
+    write_varint(out, len(match["actions"]))
+    for action in match["actions"]:
+        if action[0] == "forfeit":
+            write_varint(out, KIND_FORFEIT)
+        else:
+            write_varint(out, intern(action[1]) << 2 | (KIND_MOVE if action[0] == "move" else KIND_ITEM))
+    # CPU decisions fill the rest of the payload: (item index + 1, or 0 for none), move index
+    for item, move in match["cpu"]:
+        write_varint(out, 0 if item is None else intern(item) + 1)
+        write_varint(out, intern(move))
+    return bytes(out)
+
+
+def decode_match(buf, pos, end, strings):
+    """Inverse of encode_match for the payload in buf[pos:end]. Sprites aren't stored (None)."""
+    flags = buf[pos]
+    pos += 1
+    seed, pos = read_varint(buf, pos)
+    growth = LEVEL_UP_GROWTH
+    if flags & F_GROWTH:
+        growth = GROWTH.unpack_from(buf, pos)
+        pos += GROWTH.size
+    party = {}
+    for _ in range(2):
+        slot, pos = read_varint(buf, pos)
+        values = []
+        for _ in range(9):
+            v, pos = read_varint(buf, pos)
+            values.append(v)
+        name, level, xp, attack, defense, max_hp, hp, status, n_types = values
+        types = []
+        for _ in range(n_types):
+            t, pos = read_varint(buf, pos)
+            types.append(t)
+        n_moves, pos = read_varint(buf, pos)
+        moves, move_stats = [], []
+        for _ in range(n_moves):
+            m, pos = read_varint(buf, pos)
+            moves.append(strings[m])
+            stats = []
+            for _ in range(3):
+                v, pos = read_varint(buf, pos)
+                stats.append(v)
+            move_stats.append(stats)
+        n_items, pos = read_varint(buf, pos)
+        items = {}
+        for _ in range(n_items):
+            it, pos = read_varint(buf, pos)
+            items[strings[it]], pos = read_varint(buf, pos)
+        party[strings[slot]] = {"name": strings[name], "level": level, "xp": xp, "attack": attack,
+                                "defense": defense, "max_hp": max_hp, "hp": hp, "moves": moves, "sprite": None,
+                                "items": items, "shield": bool(status & 1), "power": bool(status & 2),
+                                "types": types, "move_stats": move_stats}
+    slots = tuple(party)
+    n_actions, pos = read_varint(buf, pos)
+    actions = []
+    for _ in range(n_actions):
+        v, pos = read_varint(buf, pos)
+        kind = v & 3
+        if kind == KIND_FORFEIT:
+            actions.append(("forfeit",))
+        else:
+            actions.append(("move" if kind == KIND_MOVE else "item", strings[v >> 2]))
+    cpu = []
+    while pos < end:
+        item, pos = read_varint(buf, pos)
+        move, pos = read_varint(buf, pos)
+        cpu.append((strings[item - 1] if item else None, strings[move]))
+    cpu_slot = slots[0] if flags & F_CPU_SLOT0 else slots[1] if flags & F_CPU_SLOT1 else None
+    result = flags >> RESULT_SHIFT & 3
+    return {"seed": seed, "cpu_slot": cpu_slot, "growth": tuple(growth), "party": party, "actions": actions,
+            "cpu": cpu, "winner": slots[result - 1] if result else None}
+
+
+def simulate(match):
+    """Re-run a match with the engine. Returns the finished Battle and its events."""
+    from battlelog import replay_match
+
+    header = {k: match[k] for k in ("seed", "cpu_slot", "growth", "party")}
+    return replay_match(header, [{"action": a} for a in match["actions"]], match["cpu"])
+
+
+# -----------------------
+# Archive files
+# -----------------------
+class ReplayWriter:
+    """Appends matches to a new archive; the string table is written by close()."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "wb")
+        self._f.write(MAGIC + bytes([VERSION]))
+        self._strings = _Strings()
+        self.count = 0
+
+    def add(self, match):
+        payload = encode_match(match, self._strings)
+        head = bytearray()
+        write_varint(head, len(payload))
+        self._f.write(head + payload)
+        self.count += 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        footer_at = self._f.tell()
+        out = bytearray()
+        write_varint(out, len(self._strings.table))
+        for s in self._strings.table:
+            b = s.encode("utf-8")
+            write_varint(out, len(b))
+            out += b
+        self._f.write(out + TRAILER.pack(footer_at, MAGIC))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayArchive:
+    """Read-only, memory-mapped archive. Matches are decoded lazily, one at a time."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if len(mm) < len(MAGIC) + 1 + TRAILER.size or mm[:4] != MAGIC:
+            raise ReplayError(f"{path} is not a replay archive")
+        if mm[4] != VERSION:
+            raise ReplayError(f"{path} has format version {mm[4]}, expected {VERSION}")
+        self._end, magic = TRAILER.unpack_from(mm, len(mm) - TRAILER.size)
+        if magic != MAGIC:
+            raise ReplayError(f"{path} is truncated (no trailer)")
+        n, pos = read_varint(mm, self._end)
+        self.strings = []
+        for _ in range(n):
+            size, pos = read_varint(mm, pos)
+            self.strings.append(mm[pos:pos + size].decode("utf-8"))
+            pos += size
+        self._offsets = None
+
+    def _spans(self):
+        pos = len(MAGIC) + 1
+        while pos < self._end:
+            size, start = read_varint(self._mm, pos)
+            yield start, start + size
+            pos = start + size
+
+    def __iter__(self):
+        for start, end in self._spans():
+            yield decode_match(self._mm, start, end, self.strings)
+
+    def __len__(self):
+        return len(self._index())
+
+    def _index(self):
+        # payload spans, found by hopping over the length prefixes (payloads aren't decoded)
+        if self._offsets is None:
+            self._offsets = list(self._spans())
+        return self._offsets
+
+    def __getitem__(self, i):
+        start, end = self._index()[i]
+        return decode_match(self._mm, start, end, self.strings)
+
+    def nbytes(self):
+        return len(self._mm)
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack, inspect or verify binary replay archives.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack = sub.add_parser("pack", help="convert a battlelog NDJSON export")
+    pack.add_argument("src")
+    pack.add_argument("dest")
+    sub.add_parser("info").add_argument("path")
+    sub.add_parser("verify").add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        from battlelog import iter_matches, read_ndjson
+
+        skipped = 0
+        with ReplayWriter(args.dest) as w:
+            for group in iter_matches(read_ndjson(args.src)):
+                if group[0]["seed"] is None:
+                    skipped += 1
+                    continue
+                w.add(match_from_log(*group))
+        print(f"{w.count} matches -> {args.dest} ({skipped} without a seed skipped)")
+        return 0
+    with ReplayArchive(args.path) as archive:
+        if args.command == "info":
+            n = len(archive)
+            print(f"{n:,} matches, {archive.nbytes():,} bytes ({archive.nbytes() / max(n, 1):.1f} B/match), "
+                  f"{len(archive.strings)} strings")
+            return 0
+        ok = bad = 0
+        for i, match in enumerate(archive):
+            battle, _ = simulate(match)
+            if battle.winner == match["winner"]:
+                ok += 1
+            else:
+                bad += 1
+                print(f"match {i}: stored winner {match['winner']}, replay gives {battle.winner}")
+        print(f"{ok} matches re-simulated to the stored result, {bad} differ")
+        return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+# resilience.py
+"""Building blocks for talking to a flaky upstream: request coalescing, jittered retries, circuit breaker."""
+import random
+import threading
+import time
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key runs `fn`; callers arriving while it is running wait for and share
+    its result (or its exception). Once it finishes the key is forgotten, so later calls run again.
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "error", "waiters")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0  # callers that were served by someone else's call
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n sleeps uniformly in [0, min(cap, base * 2**n)]."""
+
+    def __init__(self, attempts=4, base_s=0.3, cap_s=5.0, rng=None):
+        self.attempts = attempts
+        self.base_s = base_s
+        self.cap_s = cap_s
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based); an upstream Retry-After wins if longer."""
+        backoff = self.rng.uniform(0, min(self.cap_s, self.base_s * (2 ** attempt)))
+        if retry_after is not None:
+            return min(self.cap_s, max(backoff, retry_after))
+        return backoff
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after `failure_threshold` consecutive failures.
+
+    While open, `allow()` is False for `reset_timeout_s`; after that a single trial call is let
+    through (half-open). A success closes the breaker, a failure re-opens it for another timeout.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout_s=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout_s:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_running = False
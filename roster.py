@@ -0,0 +1,146 @@
+# roster.py
+"""Which species are playable, and finding one by name without listing them all.
+
+The roster is a set of generations (national dex ranges), configured with POKEMON_GENERATIONS:
+"1" (the default, the original 151), "1-3", "1,4" or "all". NameIndex answers the pickers' searches
+from a prebuilt index, prefix matches first and then trigram fuzzy matches for typos, so a search
+costs the same whether the roster has 151 names or 1000+:
+
+    python roster.py search pikachu --generations all
+"""
+import argparse
+import bisect
+import collections
+import os
+
+# generation -> (first, last) national dex number
+GENERATIONS = {
+    1: (1, 151),
+    2: (152, 251),
+    3: (252, 386),
+    4: (387, 493),
+    5: (494, 649),
+    6: (650, 721),
+    7: (722, 809),
+    8: (810, 905),
+    9: (906, 1025),
+}
+DEFAULT_GENERATIONS = os.environ.get("POKEMON_GENERATIONS", "1")
+PAGE_SIZE = 25
+
+
+def parse_generations(spec=DEFAULT_GENERATIONS):
+    """Sorted generation numbers from a spec like "1", "1-3", "1,4" or "all"."""
+    spec = str(spec).strip().lower()
+    if spec in ("", "all"):
+        return sorted(GENERATIONS)
+    gens = set()
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        gens.update(range(int(first), int(last or first) + 1))
+    unknown = gens - set(GENERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown generation(s) {sorted(unknown)}; known: 1-{max(GENERATIONS)}")
+    return sorted(gens)
+
+
+def dex_limit(generations):
+    """How many list entries to fetch (from offset 0) to cover `generations`."""
+    return max(GENERATIONS[g][1] for g in generations)
+
+
+def dex_id(entry):
+    """National dex number of a list entry, from its .../pokemon/{id}/ url."""
+    return int(entry["url"].rstrip("/").rsplit("/", 1)[-1])
+
+
+def filter_entries(entries, generations):
+    """The list entries that belong to `generations`, in dex order."""
+    ranges = [GENERATIONS[g] for g in generations]
+    return [e for e in entries if any(lo <= dex_id(e) <= hi for lo, hi in ranges)]
+
+
+def page(items, number, size=PAGE_SIZE):
+    """Items on 1-based page `number`, and the page count."""
+    pages = max(1, -(-len(items) // size))
+    number = min(max(1, number), pages)
+    return items[(number - 1) * size:number * size], pages
+
+
+def _trigrams(s):
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class NameIndex:
+    """Immutable search index over species names (lower case, in roster order)."""
+
+    def __init__(self, names):
+        self.names = [n.lower() for n in names]
+        self._sorted = sorted((n, i) for i, n in enumerate(self.names))
+        self._keys = [n for n, _ in self._sorted]
+        postings = collections.defaultdict(list)
+        for i, n in enumerate(self.names):
+            for g in _trigrams(n):
+                postings[g].append(i)
+        self._postings = {g: tuple(ids) for g, ids in postings.items()}
+        self._sizes = [len(_trigrams(n)) for n in self.names]
+        self._ids = {n: i for i, n in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix(self, query):
+        """Indexes of names starting with `query`, in roster order."""
+        lo = bisect.bisect_left(self._keys, query)
+        hi = bisect.bisect_left(self._keys, query + "\uffff")
+        return sorted(i for _, i in self._sorted[lo:hi])
+
+    def fuzzy(self, query, limit, min_score=0.25):
+        """Indexes of the names most similar to `query` by trigram Jaccard similarity."""
+        grams = _trigrams(query)
+        shared = collections.Counter()
+        for g in grams:
+            shared.update(self._postings.get(g, ()))
+        scored = []
+        for i, n in shared.items():
+            score = n / (len(grams) + self._sizes[i] - n)
+            if score >= min_score:
+                scored.append((-score, i))
+        scored.sort()
+        return [i for _, i in scored[:limit]]
+
+    def search(self, query, limit=PAGE_SIZE):
+        """Up to `limit` names for a picker: prefix matches, then fuzzy ones (which catch typos)."""
+        query = query.strip().lower()
+        if not query:
+            return self.names[:limit]
+        hits = self.prefix(query)
+        exact = self._ids.get(query)
+        if exact is not None:
+            hits.remove(exact)
+            hits.insert(0, exact)
+        hits = hits[:limit]
+        if len(hits) < limit:
+            seen = set(hits)
+            hits += [i for i in self.fuzzy(query, limit) if i not in seen][:limit - len(hits)]
+        return [self.names[i] for i in hits]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the roster's name index.")
+    parser.add_argument("command", choices=["search"])
+    parser.add_argument("query")
+    parser.add_argument("--generations", default=DEFAULT_GENERATIONS)
+    args = parser.parse_args(argv)
+
+    import pokeapi
+
+    gens = parse_generations(args.generations)
+    entries = filter_entries(pokeapi.fetch_pokemon_list(dex_limit(gens)), gens)
+    for name in NameIndex([e["name"] for e in entries]).search(args.query):
+        print(name)
+
+
+if __name__ == "__main__":
+    main()
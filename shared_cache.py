@@ -0,0 +1,98 @@
+# shared_cache.py
+"""Process-wide LRU cache with a byte budget, shared by every Streamlit session.
+
+Values are stored once and handed out by reference, so callers must treat them as read-only.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from metrics import count, span
+
+
+def json_size(value):
+    """Approximate footprint of a JSON-like value: the length of its compact encoding."""
+    return len(json.dumps(value, separators=(",", ":")))
+
+
+class SharedCache:
+    """Thread-safe LRU keyed by string with a total size budget in bytes.
+
+    The least recently used entries are evicted once the sum of entry sizes exceeds `max_bytes`.
+    A single entry larger than the budget is returned to the caller but never stored. `name` labels
+    the cache's hit/miss counters and load timings in metrics.py.
+    """
+
+    def __init__(self, max_bytes, sizeof=json_size, name="cache"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_used -= old[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes_used -= evicted_size
+                self.evictions += 1
+        return value
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader(key)` and storing the result on a miss."""
+        value = self.get(key)
+        if value is None:
+            count("cache.misses", cache=self.name)
+            with span("cache.load", cache=self.name):
+                value = self.put(key, loader(key))
+        else:
+            count("cache.hits", cache=self.name)
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+    def stats(self):
+        """Counters for dashboards: entries, bytes used/budget, hits, misses, evictions and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes_used": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,244 @@
+# snapshot.py
+"""Offline PokeAPI snapshot: pull the roster once into SQLite, then serve every lookup locally.
+
+Build it with:
+
+    python snapshot.py build --limit 151
+    python snapshot.py info
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import pokeapi
+import prefetch
+from moves import project_move
+from records import move_keys
+
+SCHEMA_VERSION = 2
+READABLE_VERSIONS = (1, 2)  # v1 files have no moves table; their moves fight with neutral stats
+DEFAULT_PATH = os.environ.get("POKEMON_SNAPSHOT", "pokemon_snapshot.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE pokemon (
+    id INTEGER PRIMARY KEY,   -- position in the PokeAPI list (1-based national dex order)
+    name TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    data BLOB NOT NULL        -- zlib-compressed compact JSON of /pokemon/{name}
+);
+CREATE TABLE moves (
+    name TEXT PRIMARY KEY,    -- PokeAPI move name, e.g. "thunder-shock"
+    data TEXT NOT NULL        -- JSON of moves.project_move(/move/{name}): type, power, accuracy
+) WITHOUT ROWID;
+"""
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, unreadable or has a different schema version."""
+
+
+def _encode(details):
+    return zlib.compress(json.dumps(details, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+# -----------------------
+# Build
+# -----------------------
+def build_snapshot(path=DEFAULT_PATH, limit=pokeapi.GEN1_LIMIT, offset=0, fetch=None, progress=None,
+                   workers=prefetch.DEFAULT_WORKERS):
+    """Download `limit` pokemon, and the moves the game uses from them, into a fresh snapshot at `path`.
+
+    The file is written next to `path` and swapped in atomically, so readers never see a half-built store.
+    `fetch(entries)` may be given to supply the details (it must yield `(entry, details)` pairs, and is
+    also called with `/move/{name}` entries); by default they are downloaded concurrently by
+    `prefetch.iter_details` with `workers` in flight.
+    """
+    entries = pokeapi.fetch_pokemon_list(limit, offset)
+    if fetch is None:
+        fetch = lambda es: prefetch.iter_details(es, workers=workers)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        index = {e["name"]: offset + i + 1 for i, e in enumerate(entries)}
+        done = 0
+        used_moves = set()
+        for entry, details in fetch(entries):
+            conn.execute(
+                "INSERT INTO pokemon (id, name, url, data) VALUES (?, ?, ?, ?)",
+                (index[entry["name"]], entry["name"], entry["url"], _encode(details)),
+            )
+            used_moves.update(move_keys(details))
+            done += 1
+            if progress:
+                progress(done, len(entries))
+        move_entries = [{"name": m, "url": f"{pokeapi.POKEAPI_BASE}/move/{m}/"} for m in sorted(used_moves)]
+        for entry, details in fetch(move_entries):
+            conn.execute("INSERT INTO moves (name, data) VALUES (?, ?)",
+                         (entry["name"], json.dumps(project_move(details), separators=(",", ":"))))
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("schema_version", str(SCHEMA_VERSION)),
+                ("built_at", str(int(time.time()))),
+                ("source", pokeapi.POKEAPI_BASE),
+                ("offset", str(offset)),
+                ("limit", str(limit)),
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+# -----------------------
+# Load
+# -----------------------
+class SnapshotStore:
+    """Read-only view over a snapshot file. Safe to share between Streamlit script threads."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._generation = 0
+        self._refresh_thread = None
+        self.meta = self._read_meta()
+
+    def _connect(self):
+        if not os.path.exists(self.path):
+            raise SnapshotError(f"No snapshot at {self.path}; run `python snapshot.py build`.")
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _conn(self):
+        # one connection per thread, reopened after a background refresh swapped the file
+        cached = getattr(self._local, "conn", None)
+        if cached is None or cached[0] != self._generation:
+            if cached is not None:
+                cached[1].close()
+            cached = (self._generation, self._connect())
+            self._local.conn = cached
+        return cached[1]
+
+    def _read_meta(self):
+        try:
+            rows = self._conn().execute("SELECT key, value FROM meta").fetchall()
+        except sqlite3.DatabaseError as e:
+            raise SnapshotError(f"Unreadable snapshot {self.path}: {e}") from e
+        meta = dict(rows)
+        version = int(meta.get("schema_version", 0))
+        if version not in READABLE_VERSIONS:
+            raise SnapshotError(f"Snapshot {self.path} has schema v{version}, expected v{SCHEMA_VERSION}; rebuild it.")
+        self.version = version
+        return meta
+
+    def list_pokemon(self, limit=None, offset=0):
+        """Name + url entries in dex order, shaped like the PokeAPI list `results`."""
+        rows = self._conn().execute(
+            "SELECT name, url FROM pokemon WHERE id > ? ORDER BY id LIMIT ?",
+            (offset, -1 if limit is None else limit),
+        ).fetchall()
+        return [{"name": name, "url": url} for name, url in rows]
+
+    def get(self, name):
+        """Full details for `name`, or None when the species isn't in the snapshot."""
+        row = self._conn().execute("SELECT data FROM pokemon WHERE name = ?", (name.lower(),)).fetchone()
+        return _decode(row[0]) if row else None
+
+    def get_moves(self, names):
+        """Projected move data (moves.project_move) for the `names` in the snapshot, as name -> dict."""
+        names = list(names)
+        if self.version < 2 or not names:
+            return {}
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(names), 500):  # stay under SQLite's bound-parameter limit
+            batch = names[i:i + 500]
+            rows = conn.execute(
+                f"SELECT name, data FROM moves WHERE name IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            out.update((name, json.loads(data)) for name, data in rows)
+        return out
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM pokemon").fetchone()[0]
+
+    def refresh(self):
+        """Rebuild the snapshot from PokeAPI with the same range and switch readers over to it."""
+        build_snapshot(self.path, limit=int(self.meta["limit"]), offset=int(self.meta["offset"]))
+        self._generation += 1
+        self.meta = self._read_meta()
+
+    def start_background_refresh(self, interval_s):
+        """Refresh the snapshot every `interval_s` seconds in a daemon thread. Failures keep the old data."""
+        if self._refresh_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    self.refresh()
+                except Exception:
+                    pass  # offline or rate limited: keep serving the current snapshot
+
+        self._refresh_thread = threading.Thread(target=loop, name="snapshot-refresh", daemon=True)
+        self._refresh_thread.start()
+
+
+def open_snapshot(path=DEFAULT_PATH, refresh_interval=None):
+    """Return a SnapshotStore for `path`, or None when no usable snapshot exists."""
+    try:
+        store = SnapshotStore(path)
+    except SnapshotError:
+        return None
+    if refresh_interval:
+        store.start_background_refresh(refresh_interval)
+    return store
+
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the offline PokeAPI snapshot.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--limit", type=int, default=pokeapi.GEN1_LIMIT)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--generations", help='cover these generations instead of --limit, e.g. "1-3" or "all"')
+    parser.add_argument("--workers", type=int, default=prefetch.DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+    if args.generations:
+        from roster import dex_limit, parse_generations
+
+        args.limit, args.offset = dex_limit(parse_generations(args.generations)), 0
+
+    if args.command == "build":
+        def progress(done, total):
+            print(f"\r{done}/{total}", end="", flush=True)
+        build_snapshot(args.path, limit=args.limit, offset=args.offset, progress=progress, workers=args.workers)
+        print(f"\nwrote {args.path}")
+    else:
+        store = SnapshotStore(args.path)
+        n_moves = store._conn().execute("SELECT COUNT(*) FROM moves").fetchone()[0] if store.version >= 2 else 0
+        print(f"{args.path}: {len(store)} pokemon, {n_moves} moves")
+        for key, value in sorted(store.meta.items()):
+            print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# sprites.py
+"""Sprite pipeline: fetch artwork once, pre-render thumbnails to a disk cache, serve PNG bytes from memory.
+
+    python sprites.py warm              # pre-render every Gen-1 sprite at all THUMB_SIZES
+    python sprites.py atlas --width 96  # optional: one sheet + index for the whole roster
+
+PIL is only imported where an image is decoded or rendered; sprites already in the disk cache are
+served as bytes without it, so importing this module stays cheap.
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from io import BytesIO
+
+import pokeapi
+from shared_cache import SharedCache
+
+SPRITE_CACHE_DIR = os.environ.get("POKEMON_SPRITE_CACHE", ".sprite_cache")
+THUMB_SIZES = (220, 96, 48)  # arena, stats panel, lists
+MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+FAILURE_TTL_S = 60.0  # a sprite that couldn't be fetched isn't tried again for this long
+MAX_FAILURES = 1024  # failed urls remembered at once; the least recently seen are forgotten first
+
+_memory = SharedCache(max_bytes=MEMORY_BUDGET_BYTES, sizeof=len)
+# url -> monotonic time until which it counts as unavailable; one "byte" per entry bounds it by count
+_failed = SharedCache(max_bytes=MAX_FAILURES, sizeof=lambda _: 1, name="sprite_failures")
+
+
+def image_from_sprite(url):
+    """Download and decode a sprite into an RGBA PIL image (None if it can't be loaded)."""
+    if not url:
+        return None
+    from PIL import Image
+
+    try:
+        return Image.open(BytesIO(pokeapi.fetch_bytes(url))).convert("RGBA")
+    except Exception:
+        return None
+
+
+def _cache_path(url, width):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(SPRITE_CACHE_DIR, f"{digest}-{width}.png")
+
+
+def _render(img, width):
+    from PIL import Image
+
+    height = max(1, round(img.height * width / img.width))
+    out = BytesIO()
+    img.resize((width, height), Image.LANCZOS).save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def _write_cache(path, data):
+    # a temp file per writer: sessions rendering the same sprite at once each replace the file with
+    # identical bytes, and one that can't write at all still has the bytes in hand
+    fd, tmp = tempfile.mkstemp(dir=SPRITE_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def render_thumbnails(url, sizes=THUMB_SIZES):
+    """Fetch `url` once and write every size to the disk cache. Returns {width: png bytes} ({} on failure).
+
+    A failed fetch is remembered for FAILURE_TTL_S, so a dead url isn't fetched again on every rerun.
+    """
+    if _failed.get(url, 0) > time.monotonic():
+        return {}
+    img = image_from_sprite(url)
+    if img is None:
+        _failed.put(url, time.monotonic() + FAILURE_TTL_S)
+        return {}
+    os.makedirs(SPRITE_CACHE_DIR, exist_ok=True)
+    rendered = {}
+    for width in sizes:
+        data = _render(img, width)
+        _write_cache(_cache_path(url, width), data)
+        rendered[width] = data
+    return rendered
+
+
+def sprite_bytes(url, width=220):
+    """PNG bytes of `url` scaled to `width`: memory, then disk, then a one-time fetch + render.
+
+    Returns None when the sprite can't be fetched, so callers can fall back to the remote url.
+    """
+    if not url:
+        return None
+    key = f"{width}:{url}"
+    data = _memory.get(key)
+    if data is not None:
+        return data
+    try:
+        with open(_cache_path(url, width), "rb") as f:
+            data = f.read()
+    except OSError:
+        sizes = THUMB_SIZES if width in THUMB_SIZES else THUMB_SIZES + (width,)
+        data = render_thumbnails(url, sizes).get(width)
+        if data is None:
+            return None
+    return _memory.put(key, data)
+
+
+# -----------------------
+# Atlas
+# -----------------------
+def build_atlas(urls, width=96, path=os.path.join(SPRITE_CACHE_DIR, "atlas")):
+    """Pack every sprite at `width` into one PNG sheet (`<path>.png`) plus a `<path>.json` url -> box index."""
+    from PIL import Image
+
+    tiles = [(u, sprite_bytes(u, width)) for u in urls]
+    tiles = [(u, Image.open(BytesIO(b))) for u, b in tiles if b]
+    if not tiles:
+        return None
+    cols = max(1, int(len(tiles) ** 0.5))
+    cell_h = max(img.height for _, img in tiles)
+    rows = -(-len(tiles) // cols)
+    sheet = Image.new("RGBA", (cols * width, rows * cell_h), (0, 0, 0, 0))
+    index = {}
+    for i, (url, img) in enumerate(tiles):
+        x, y = (i % cols) * width, (i // cols) * cell_h
+        sheet.paste(img, (x, y))
+        index[url] = [x, y, img.width, img.height]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sheet.save(f"{path}.png", optimize=True)
+    with open(f"{path}.json", "w") as f:
+        json.dump({"width": width, "sprites": index}, f)
+    return path
+
+
+def _roster_sprite_urls(limit):
+    import prefetch  # only needed by the CLI
+
+    warmed = prefetch.prefetch_all(pokeapi.fetch_pokemon_list(limit))
+    return [u for d in warmed["details"].values() for u in prefetch.sprite_urls(d)[:1]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render sprite thumbnails or build a sprite atlas.")
+    parser.add_argument("command", choices=["warm", "atlas"])
+    parser.add_argument("--limit", type=int, default=pokeapi.GEN1_LIMIT)
+    parser.add_argument("--width", type=int, default=96, help="atlas tile width")
+    args = parser.parse_args(argv)
+
+    urls = _roster_sprite_urls(args.limit)
+    if args.command == "warm":
+        done = sum(1 for u in urls if render_thumbnails(u))
+        print(f"rendered {done}/{len(urls)} sprites into {SPRITE_CACHE_DIR}")
+    else:
+        print(f"wrote {build_atlas(urls, args.width)}.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# tournament.py
+"""Multi-core tournament / ladder simulator over the battle engine, for balancing items and level-ups.
+
+    python tournament.py round-robin --games 20 --workers 8 --out rr.ndjson
+    python tournament.py swiss --rounds 7
+    python tournament.py elimination --items '{"Potion": 2, "Shield": 1, "Power Boost": 1}' --growth 1.1 1.05 1.1
+    python tournament.py round-robin --replays rr.pkr    # also keep every match as a binary replay
+
+Matches are cut into chunks and spread over a process pool; every match gets its own RNG seeded from
+(seed, round, match number), so results are identical whatever the worker count. Each finished
+match is appended to an NDJSON file as soon as its chunk comes back, and a standings table is printed
+at the end. In swiss and elimination formats XP and level-ups carry over from round to round.
+With --replays, every match's starting state, seed and actions are also stored in a replay.py archive.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pokeapi
+from engine import ITEMS, LEVEL_UP_GROWTH, STARTING_ITEMS, Battle, Combatant, auto_action
+from records import load_roster_records
+from replay import ReplayWriter
+
+MAX_STEPS = 1000  # safety net; a battle that hasn't ended by then is a draw
+CHUNK_MATCHES = 64
+
+# worker-process globals, set once by _init_worker so tasks only carry small tuples
+_config = None
+
+
+def _init_worker(config):
+    global _config
+    _config = config
+
+
+def _combatant(state):
+    name, level, xp, attack, defense, max_hp, moves, types, move_stats = state
+    return Combatant(name, level, xp, attack, defense, max_hp, max_hp, moves, None, _config["items"], types,
+                     move_stats)
+
+
+def _state(c):
+    return (c.name, c.level, c.xp, c.attack, c.defense, c.max_hp, c.moves, c.types, c.move_stats)
+
+
+def match_seed(key):
+    """64-bit engine seed for a match key such as "0:3:17" (tournament seed, round, match)."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def play_match(match_id, a_state, b_state, seed):
+    """Play one battle between two participant states; both sides use the CPU policy."""
+    a, b = _combatant(a_state), _combatant(b_state)
+    battle = Battle({"a": a, "b": b}, seed=seed, growth=_config["growth"])
+    start = {"a": a.to_dict(), "b": b.to_dict()} if _config.get("replays") else None
+    actions = []
+    while not battle.over and len(actions) < MAX_STEPS:
+        action = auto_action(battle)
+        battle.step(action)
+        actions.append(action)
+    winner = {"a": a_state[0], "b": b_state[0]}.get(battle.winner)
+    result = {"match": match_id, "a": a_state[0], "b": b_state[0], "winner": winner, "steps": len(actions),
+              "a_after": _state(a), "b_after": _state(b)}
+    if start is not None:
+        result["_replay"] = {"seed": seed, "cpu_slot": None, "growth": battle.growth, "party": start,
+                             "actions": actions, "cpu": [], "winner": battle.winner}
+    return result
+
+
+def _run_chunk(chunk):
+    return [play_match(*spec) for spec in chunk]
+
+
+class Tournament:
+    """Runs rounds of matches on a process pool and keeps standings + carried-over participant state."""
+
+    def __init__(self, records, workers=None, seed=0, items=STARTING_ITEMS, growth=LEVEL_UP_GROWTH, level=5,
+                 out=None, chunk=CHUNK_MATCHES, replays=None):
+        self.seed = seed
+        self.chunk = chunk
+        self.config = {"items": dict(items), "growth": tuple(growth), "replays": bool(replays)}
+        self.states = {r.name: (r.name, level, 0, r.attack, r.defense, r.max_hp, r.moves, r.types, r.move_stats)
+                       for r in records}
+        self.standings = {name: {"wins": 0, "losses": 0, "draws": 0} for name in self.states}
+        self.played = set()
+        self.round = 0
+        self.out = open(out, "w") if out else None
+        self.replays = ReplayWriter(replays) if replays else None
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                        initargs=(self.config,))
+
+    def close(self):
+        self.pool.shutdown()
+        if self.out:
+            self.out.close()
+        if self.replays:
+            self.replays.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def play_round(self, pairs, games=1, carry=False):
+        """Play `games` matches for each (a, b) pair, alternating who moves first. Returns the results."""
+        self.round += 1
+        specs = []
+        for a, b in pairs:
+            for g in range(games):
+                first, second = (a, b) if g % 2 == 0 else (b, a)
+                match_id = f"{self.round}:{len(specs)}"
+                specs.append((match_id, self.states[first], self.states[second], match_seed(f"{self.seed}:{match_id}")))
+        chunks = [specs[i:i + self.chunk] for i in range(0, len(specs), self.chunk)]
+        results = []
+        # map() yields chunks in submission order as they finish: stream them out straight away
+        for chunk_results in self.pool.map(_run_chunk, chunks):
+            for r in chunk_results:
+                self._record(r, carry)
+                if self.replays:
+                    self.replays.add(r.pop("_replay"))
+                if self.out:
+                    self.out.write(json.dumps({k: v for k, v in r.items() if not k.endswith("_after")}) + "\n")
+            results.extend(chunk_results)
+        if self.out:
+            self.out.flush()
+        return results
+
+    def _record(self, r, carry):
+        self.played.add(frozenset((r["a"], r["b"])))
+        if r["winner"] is None:
+            self.standings[r["a"]]["draws"] += 1
+            self.standings[r["b"]]["draws"] += 1
+        else:
+            loser = r["b"] if r["winner"] == r["a"] else r["a"]
+            self.standings[r["winner"]]["wins"] += 1
+            self.standings[loser]["losses"] += 1
+        if carry:
+            self.states[r["a"]] = tuple(r["a_after"])
+            self.states[r["b"]] = tuple(r["b_after"])
+
+    def ranking(self):
+        """Names ordered by wins, then fewest losses, then name."""
+        return sorted(self.standings, key=lambda n: (-self.standings[n]["wins"], self.standings[n]["losses"], n))
+
+    # -----------------------
+    # Formats
+    # -----------------------
+    def round_robin(self, games=2):
+        names = list(self.states)
+        pairs = [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+        return self.play_round(pairs, games)
+
+    def swiss(self, rounds=7):
+        for _ in range(rounds):
+            # pair neighbours in the current ranking, skipping rematches where possible
+            pool = self.ranking()
+            pairs = []
+            while len(pool) > 1:
+                a = pool.pop(0)
+                b = next((x for x in pool if frozenset((a, x)) not in self.played), pool[0])
+                pool.remove(b)
+                pairs.append((a, b))
+            self.play_round(pairs, carry=True)
+        return self.ranking()
+
+    def elimination(self):
+        """Single elimination seeded by dex order; odd players out get a bye. Returns the champion."""
+        alive = list(self.states)
+        while len(alive) > 1:
+            pairs = [(alive[i], alive[i + 1]) for i in range(0, len(alive) - 1, 2)]
+            byes = alive[len(pairs) * 2:]
+            winners = []
+            for r in self.play_round(pairs, carry=True):
+                # a draw goes to the player who moved second (the underdog in the pairing)
+                winners.append(r["winner"] or r["b"])
+            alive = winners + byes
+        return alive[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate tournaments over the roster on all cores.")
+    parser.add_argument("format", choices=["round-robin", "swiss", "elimination"])
+    parser.add_argument("--limit", type=int, default=pokeapi.GEN1_LIMIT)
+    parser.add_argument("--games", type=int, default=2, help="games per pairing (round-robin)")
+    parser.add_argument("--rounds", type=int, default=7, help="rounds (swiss)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--items", type=json.loads, default=STARTING_ITEMS, help="starting items as JSON")
+    parser.add_argument("--growth", type=float, nargs=3, default=LEVEL_UP_GROWTH, metavar=("ATK", "DEF", "HP"))
+    parser.add_argument("--out", default="tournament.ndjson")
+    parser.add_argument("--replays", default=None, help="also write every match to this replay archive")
+    args = parser.parse_args(argv)
+    unknown = set(args.items) - set(ITEMS)
+    if unknown:
+        parser.error(f"unknown items {', '.join(sorted(unknown))}; the items are {', '.join(ITEMS)}")
+
+    records = load_roster_records(args.limit)
+    start = time.perf_counter()
+    with Tournament(records, workers=args.workers, seed=args.seed, items=args.items, growth=args.growth,
+                    out=args.out, replays=args.replays) as t:
+        if args.format == "round-robin":
+            t.round_robin(args.games)
+        elif args.format == "swiss":
+            t.swiss(args.rounds)
+        else:
+            print(f"champion: {t.elimination()}")
+        elapsed = time.perf_counter() - start
+        matches = sum(s["wins"] + s["losses"] + s["draws"] for s in t.standings.values()) // 2
+        print(f"{matches:,} matches in {elapsed:.1f}s ({matches / elapsed:,.0f}/s) -> {args.out}")
+        for name in t.ranking()[:10]:
+            s = t.standings[name]
+            print(f"{name:>15}  {s['wins']:>4}W {s['losses']:>4}L {s['draws']:>3}D")
+
+
+if __name__ == "__main__":
+    main()